@@ -0,0 +1,7 @@
+"""
+eArm library for MicroPython
+Reusable drivers and applications for the siyeenove eArm robotic arm
+
+Modules are imported on demand (e.g. from earm.arm import eArm), so
+importing the package itself costs almost nothing.
+"""
@@ -0,0 +1,110 @@
+"""
+eArm ADC capture
+Samples the joystick channels at a fixed rate into a preallocated buffer
+and writes it as a compact binary dump for Host_Tools/adc_analyse.py
+
+Dump layout (little endian):
+    header  "<4sBBHIIHH"  magic b"EADC", version, channels, burst,
+                          frames, period_us, late frames, reserved
+    data    uint16 * frames * channels * burst
+
+Each frame reads every channel burst times back to back, the same
+pattern JoyStick uses, so the analyser can see both the noise between
+frames and the settling after each channel switch.
+"""
+
+from machine import Pin, ADC
+from array import array
+import struct
+import time
+
+MAGIC = b"EADC"
+VERSION = 1
+HEADER = "<4sBBHIIHH"
+
+# xL, yL, xR, yR as wired on eArm
+JOYSTICK_PINS = (0, 1, 2, 3)
+
+
+class AdcCapture:
+    """Fixed rate capture of several ADC channels"""
+    def __init__(self, pins=JOYSTICK_PINS, frames=2048, burst=1):
+        """
+        Parameters:
+            pins: ADC pins, one channel each
+            frames: Number of frames, the buffer is allocated once here
+            burst: Consecutive reads per channel and frame
+        """
+        self.pins = pins
+        self.frames = frames
+        self.burst = burst
+        self.adcs = None  # Opened by the first capture
+        self.buf = array('H', bytes(2 * frames * len(pins) * burst))
+        self.period_us = 0
+        self.late = 0  # Frames that started after their deadline
+
+    def _open(self):
+        self.adcs = []
+        for p in self.pins:
+            adc = ADC(Pin(p))
+            adc.atten(ADC.ATTN_11DB)  # 0-3.3V range, as JoyStick
+            self.adcs.append(adc)
+
+    def _frame(self, pos):
+        """Read one frame into buf[pos:], return the next position"""
+        buf = self.buf
+        burst = self.burst
+        for adc in self.adcs:
+            read = adc.read
+            for _ in range(burst):
+                buf[pos] = read()
+                pos += 1
+        return pos
+
+    def max_rate_period(self, frames=64):
+        """Free running frame time in us, measured over a few frames"""
+        if self.adcs is None:
+            self._open()
+        t0 = time.ticks_us()
+        for _ in range(frames):
+            self._frame(0)
+        return time.ticks_diff(time.ticks_us(), t0) // frames + 1
+
+    def capture(self, period_us=0):
+        """
+        Fill the buffer, one frame every period_us
+
+        With period_us=0 the fastest stable period is used: the measured
+        free running frame time plus 25% margin, so frames stay evenly
+        spaced even when an interrupt steals some time.
+        """
+        if self.adcs is None:
+            self._open()
+        if period_us <= 0:
+            period_us = self.max_rate_period() * 5 // 4
+        self.period_us = period_us
+        self.late = 0
+        pos = 0
+        deadline = time.ticks_us()
+        for _ in range(self.frames):
+            # Busy wait, sleep_us is not precise enough at these rates
+            while time.ticks_diff(deadline, time.ticks_us()) > 0:
+                pass
+            if time.ticks_diff(time.ticks_us(), deadline) > period_us // 2:
+                self.late += 1
+            pos = self._frame(pos)
+            deadline = time.ticks_add(deadline, period_us)
+        return self.period_us
+
+    def header(self):
+        return struct.pack(HEADER, MAGIC, VERSION, len(self.pins), self.burst,
+                           self.frames, self.period_us, min(self.late, 65535), 0)
+
+    def size(self):
+        """Size of the dump in bytes"""
+        return struct.calcsize(HEADER) + 2 * len(self.buf)
+
+    def write(self, stream):
+        """Write header and samples to a stream (file, socket, sys.stdout.buffer)"""
+        stream.write(self.header())
+        stream.write(memoryview(self.buf))
@@ -0,0 +1,200 @@
+"""
+eArm mechanical arm
+Four servos (A base, B upper arm, C forearm, D claw) and two joysticks
+"""
+
+from machine import Pin, PWM
+from array import array
+import time
+
+from earm.joystick import JoyStick
+from earm.buttons import Button, BTN_L, BTN_R
+from earm.servo import angle_to_duty_u16
+
+
+class ArmServo:
+    """Servo driven by eArm, 16-bit PWM duty"""
+    def __init__(self, pin, min_us=500, max_us=2400, freq=50):
+        self.pin = pin
+        self.freq = freq
+        self.pwm = None  # Created by the first write
+        self.min_us = min_us
+        self.max_us = max_us
+        self.period_us = 1000000 // freq
+        self.current_angle = 90
+    
+    def _write_duty(self, duty):
+        """Write 16-bit duty to PWM"""
+        if self.pwm is None:
+            self.pwm = PWM(Pin(self.pin), freq=self.freq, duty_u16=duty)
+        else:
+            self.pwm.duty_u16(duty)
+    
+    def write(self, angle):
+        """Set servo angle"""
+        self.current_angle = max(0, min(180, angle))
+        self._write_duty(angle_to_duty_u16(self.current_angle, self.min_us, self.max_us, self.period_us))
+    
+    def read(self):
+        """Read current angle"""
+        return self.current_angle
+    
+    def release(self):
+        """Release servo (stop PWM)"""
+        if self.pwm is not None:
+            self.pwm.duty_u16(0)
+
+
+class eArm:
+    """Mechanical arm control class"""
+    def __init__(self):
+        self.servo_current_angle = array('h', (90, 120, 60, 90))  # A, B, C, D servos
+        self.target = array('h', (0, 0, 0, 0))  # Scratch buffer for execution_action
+        self.servos = None  # [A, B, C, D] once attached
+        self.jog_t = array('l', (0, 0, 0, 0))  # ticks_ms of the last jog step per servo
+        self.A_servo = None
+        self.B_servo = None
+        self.C_servo = None
+        self.D_servo = None
+        self.JoyStickL = None
+        self.JoyStickR = None
+        self.ButtonL = None
+        self.ButtonR = None
+    
+    def joy_stick_attach(self, xpin1, ypin1, zpin1, xpin2, ypin2, zpin2, samples=20, trim=5):
+        """Attach joysticks with Z-axis buttons, samples / trim set the read filter"""
+        self.JoyStickL = JoyStick(samples, trim)
+        self.JoyStickR = JoyStick(samples, trim)
+        self.JoyStickL.attach(xpin1, ypin1, zpin1)
+        self.JoyStickR.attach(xpin2, ypin2, zpin2)
+    
+    def button_attach(self, queue):
+        """Turn the joystick Z-axis buttons into interrupt driven buttons"""
+        self.ButtonL = Button(self.JoyStickL.pin_z, BTN_L, 0, queue)
+        self.ButtonR = Button(self.JoyStickR.pin_z, BTN_R, 1, queue)
+    
+    def servo_attach(self, A_pin, B_pin, C_pin, D_pin):
+        """Attach servo motors"""
+        # Initialize all servos
+        self.A_servo = ArmServo(A_pin)
+        self.B_servo = ArmServo(B_pin)
+        self.C_servo = ArmServo(C_pin)
+        self.D_servo = ArmServo(D_pin)
+        self.servos = [self.A_servo, self.B_servo, self.C_servo, self.D_servo]
+        
+        # Set initial angles
+        self.A_servo.write(self.servo_current_angle[0])
+        self.B_servo.write(self.servo_current_angle[1])
+        self.C_servo.write(self.servo_current_angle[2])
+        self.D_servo.write(self.servo_current_angle[3])
+    
+    def _jog(self, i, delta, speed):
+        """
+        Move servo i one degree in direction delta, at most once per speed ms
+        
+        Returns at once, a step that is not due yet is skipped, so the pace
+        no longer depends on how long the rest of the loop takes. speed is
+        at least 1 ms, 0 would step on every call at the loop's pace.
+        """
+        if speed < 1:
+            speed = 1
+        now = time.ticks_ms()
+        late = time.ticks_diff(now, self.jog_t[i])
+        if late < speed:
+            return
+        # Keep an exact pace while jogging, restart it after a pause
+        self.jog_t[i] = time.ticks_add(self.jog_t[i], speed) if late < 2 * speed else now
+        angle = self.servo_current_angle[i] + delta
+        if 0 <= angle <= 180:
+            self.servo_current_angle[i] = angle
+            self.servos[i].write(angle)
+    
+    # Upper Arm
+    def ua_up(self, speed):
+        """Move arm up, speed in ms per degree"""
+        self._jog(1, 1, speed)
+     
+    # Forearm
+    def fa_up(self, speed):
+        """Move arm up, speed in ms per degree"""
+        self._jog(2, -1, speed)
+    
+    # Upper Arm
+    def ua_down(self, speed):
+        """Move arm down, speed in ms per degree"""
+        self._jog(1, -1, speed)
+    
+    # Forearm
+    def fa_down(self, speed):
+        """Move arm down, speed in ms per degree"""
+        self._jog(2, 1, speed)
+    
+    def left(self, speed):
+        """Rotate arm left, speed in ms per degree"""
+        self._jog(0, 1, speed)
+    
+    def right(self, speed):
+        """Rotate arm right, speed in ms per degree"""
+        self._jog(0, -1, speed)
+    
+    def claw_open(self, speed):
+        """Open claw, speed in ms per degree"""
+        self._jog(3, 1, speed)
+    
+    def claw_close(self, speed):
+        """Close claw, speed in ms per degree"""
+        self._jog(3, -1, speed)
+    
+    def claw_release(self):
+        """Release claw servo to prevent overheating"""
+        if self.D_servo:
+            self.D_servo.release()
+    
+    def record_action(self, buf=None, offset=0):
+        """
+        Record current action
+        
+        Copies the 4 angles into buf[offset:offset + 4] without allocating,
+        or returns a new array when no buffer is given.
+        """
+        if buf is None:
+            return array('h', self.servo_current_angle)
+        buf[offset:offset + 4] = self.servo_current_angle
+        return buf
+    
+    def execution_action(self, angles, speed, offset=0):
+        """Execute recorded action angles[offset:offset + 4]"""
+        # Copy target angles to the preallocated buffer
+        target_angles = self.target
+        for i in range(4):
+            target_angles[i] = angles[offset + i]
+        
+        moving = True
+        while moving:
+            moving = False
+            # Update each servo angle
+            for i in range(4):
+                if self.servo_current_angle[i] != target_angles[i]:
+                    moving = True
+                    # Move one step in the direction of the target
+                    if target_angles[i] > self.servo_current_angle[i]:
+                        self.servo_current_angle[i] += 1
+                    else:
+                        self.servo_current_angle[i] -= 1
+            
+            # Write to servos
+            self.A_servo.write(self.servo_current_angle[0])
+            self.B_servo.write(self.servo_current_angle[1])
+            self.C_servo.write(self.servo_current_angle[2])
+            self.D_servo.write(self.servo_current_angle[3])
+            
+            time.sleep_ms(speed)
+        
+        time.sleep_ms(speed * 20)
+    
+    def write_angle(self, i, angle):
+        """Set one servo (0-3 = A-D) without delay"""
+        angle = max(0, min(180, angle))
+        if self.servo_current_angle[i] != angle:
+            self.servo_current_angle[i] = angle
+            self.servos[i].write(angle)
@@ -0,0 +1,86 @@
+"""
+eArm button events
+Interrupt driven buttons that post events into a ring buffer
+"""
+
+from machine import Pin, Timer
+import time
+
+# Button event codes: (button_id << 4) | event kind
+EV_PRESS = 1
+EV_RELEASE = 2
+EV_LONG = 3
+BTN_L = 1 << 4
+BTN_R = 2 << 4
+
+
+class EventQueue:
+    """Fixed-size ring buffer of button events, safe to post from IRQ context"""
+    def __init__(self, size=16):
+        self.buf = bytearray(size)
+        self.size = size
+        self.head = 0
+        self.tail = 0
+    
+    def post(self, event):
+        """Add an event, dropped silently when the queue is full"""
+        nxt = (self.head + 1) % self.size
+        if nxt != self.tail:
+            self.buf[self.head] = event
+            self.head = nxt
+    
+    def get(self):
+        """Return the oldest event, or 0 when the queue is empty"""
+        if self.head == self.tail:
+            return 0
+        event = self.buf[self.tail]
+        self.tail = (self.tail + 1) % self.size
+        return event
+    
+    def clear(self):
+        """Drop all pending events"""
+        self.tail = self.head
+
+
+class Button:
+    """Interrupt driven push button with timer debounce and long press"""
+    DEBOUNCE_MS = 20
+    LONG_PRESS_MS = 2000
+    
+    def __init__(self, pin, button_id, timer_id, queue):
+        self.pin = Pin(pin, Pin.IN, Pin.PULL_UP)
+        self.id = button_id
+        self.queue = queue
+        self.timer = Timer(timer_id)
+        self.pressed = False
+        self.long_sent = False
+        self.press_t = 0
+        # Keep one bound method so re-arming the timer does not allocate
+        self._timer_cb = self._on_timer
+        self.pin.irq(handler=self._on_edge, trigger=Pin.IRQ_FALLING | Pin.IRQ_RISING)
+    
+    def _on_edge(self, pin):
+        """Every edge restarts the debounce window"""
+        self.timer.init(mode=Timer.ONE_SHOT, period=self.DEBOUNCE_MS, callback=self._timer_cb)
+    
+    def _on_timer(self, timer):
+        """Pin is stable: post press/release, or long press when held long enough"""
+        down = not self.pin.value()  # Pull-up resistor, 0 when pressed
+        if down and not self.pressed:
+            self.pressed = True
+            self.long_sent = False
+            self.press_t = time.ticks_ms()
+            self.queue.post(self.id | EV_PRESS)
+        elif not down:
+            if self.pressed:
+                self.pressed = False
+                self.queue.post(self.id | EV_RELEASE)
+            return
+        
+        if not self.long_sent:
+            remain = self.LONG_PRESS_MS - time.ticks_diff(time.ticks_ms(), self.press_t)
+            if remain <= 0:
+                self.long_sent = True
+                self.queue.post(self.id | EV_LONG)
+            else:
+                self.timer.init(mode=Timer.ONE_SHOT, period=remain, callback=self._timer_cb)
@@ -0,0 +1,92 @@
+"""
+eArm buzzer drivers
+Passive buzzer on a PWM pin, the PWM is created on first use
+"""
+
+from machine import Pin, PWM
+import time
+
+
+class Beeper:
+    """Non-blocking buzzer, the tone is stopped later by update()"""
+    def __init__(self, pin):
+        self.pin = pin
+        self.pwm = None  # Created on first beep
+        self.end_t = 0
+        self.active = False
+
+    def beep(self, freq, duration):
+        """Start a tone of freq Hz for duration ms and return immediately"""
+        if self.pwm is None:
+            # The buzzer is active low, so 100% duty keeps it silent
+            self.pwm = PWM(Pin(self.pin), freq=1000, duty_u16=65535)
+        self.pwm.freq(freq)
+        self.pwm.duty_u16(32768)
+        self.end_t = time.ticks_add(time.ticks_ms(), duration)
+        self.active = True
+
+    def update(self):
+        """Stop the tone once its duration has elapsed"""
+        if self.active and time.ticks_diff(time.ticks_ms(), self.end_t) >= 0:
+            self.off()
+
+    def off(self):
+        """Silence the buzzer"""
+        if self.pwm is not None:
+            self.pwm.duty_u16(65535)
+        self.active = False
+
+
+class Buzzer:
+    """
+    Simple buzzer controller using PWM for passive buzzers
+
+    Passive buzzers require PWM signals to generate sound at different frequencies.
+    This class provides basic beep functionality for user feedback.
+    """
+
+    def __init__(self, pin=9):
+        """
+        Remember the buzzer pin, the PWM is only created by the first sound
+
+        Args:
+            pin (int): GPIO pin number connected to buzzer positive terminal.
+                      Buzzer negative terminal should be connected to GND.
+                      Default is GPIO9.
+        """
+        self.pin = pin
+        self.pwm = None
+
+    def on(self, freq=1000):
+        """
+        Turn on buzzer with specified frequency
+
+        Args:
+            freq (int): Frequency in Hertz (Hz). Higher values produce higher pitch.
+                       Default is 1000 Hz (typical beep frequency).
+
+        Note:
+            Passive buzzers require continuous PWM signal to produce sound.
+            Duty cycle of 512 (50%) provides good volume without overloading.
+        """
+        if self.pwm is None:
+            self.pwm = PWM(Pin(self.pin))
+        self.pwm.freq(freq)
+        self.pwm.duty(512)
+
+    def off(self):
+        """Turn off buzzer (stop sound)"""
+        if self.pwm is not None:
+            self.pwm.duty(0)
+
+    def beep(self, freq=1000, duration=200):
+        """
+        Play a single beep
+
+        Args:
+            freq (int): Frequency in Hertz (Hz). Default is 1000 Hz.
+            duration (int): Duration in milliseconds (ms). Default is 200 ms.
+        """
+        self.on(freq)
+        time.sleep_ms(duration)
+        self.off()
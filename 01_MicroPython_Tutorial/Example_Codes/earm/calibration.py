@@ -0,0 +1,138 @@
+"""
+eArm joystick calibration
+Per-stick centre and range stored on flash, turned into lookup tables
+
+Each axis maps its raw ADC reading (0-4095) to a signed speed level:
+0 inside the dead zone, 1 just outside it and LEVELS at full deflection,
+negative below the centre. The tables are built once from the profile,
+so the control loop only does raw >> TABLE_SHIFT and one index.
+"""
+
+from array import array
+import json
+import os
+import time
+
+PROFILE_FILE = "joystick.json"
+
+# Axis order in the profile and in JoystickApp
+AXES = ("xL", "yL", "xR", "yR")
+
+# min, centre, max of an uncalibrated axis
+DEFAULT_AXIS = (0, 2048, 4095)
+
+LEVELS = 5  # Speed levels on each side of the centre
+DEAD_ZONE = 268  # Permille of the half range, the old 1500..2595 band
+TABLE_SHIFT = 4  # 4096 raw values -> 256 table entries
+
+# A stick that moves less than this from its centre is not calibrated
+MIN_SPAN = 500
+
+
+def axis_table(axis, dead_zone=DEAD_ZONE):
+    """Lookup table raw >> TABLE_SHIFT -> signed level for (min, centre, max)"""
+    lo, centre, hi = axis
+    size = 4096 >> TABLE_SHIFT
+    table = array('b', bytes(size))
+    band = (1000 - dead_zone) // LEVELS + 1
+    for k in range(size):
+        raw = (k << TABLE_SHIFT) + (1 << TABLE_SHIFT) // 2  # Middle of the entry
+        # Deflection in permille of each half range
+        if raw >= centre:
+            p = (raw - centre) * 1000 // max(1, hi - centre)
+        else:
+            p = (raw - centre) * 1000 // max(1, centre - lo)
+        level = 0
+        if abs(p) > dead_zone:
+            level = min(LEVELS, 1 + (abs(p) - dead_zone) // band)
+        table[k] = level if p > 0 else -level
+    return table
+
+
+class JoystickProfile:
+    """Centre and range of the four joystick axes, saved as JSON"""
+
+    def __init__(self, path=PROFILE_FILE):
+        self.path = path
+        self.axes = {name: list(DEFAULT_AXIS) for name in AXES}
+        self.dead_zone = DEAD_ZONE
+        self.calibrated = False
+
+    def load(self):
+        """Read the profile, keeps the defaults when there is none"""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            for name in AXES:
+                if name in data.get("axes", {}):
+                    self.axes[name] = list(data["axes"][name])
+            self.dead_zone = data.get("dead_zone", DEAD_ZONE)
+            self.calibrated = True
+        except (OSError, ValueError):
+            self.calibrated = False
+        return self.calibrated
+
+    def save(self):
+        """Write the profile to a temporary file, then swap it in"""
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"axes": self.axes, "dead_zone": self.dead_zone}, f)
+        os.rename(tmp, self.path)
+
+    def tables(self):
+        """Lookup tables in AXES order"""
+        return [axis_table(self.axes[name], self.dead_zone) for name in AXES]
+
+    def calibrate(self, stick_l, stick_r, beeper=None, rest_ms=1000, sweep_ms=6000):
+        """
+        Measure the sticks and update the profile
+
+        The sticks must be left alone while the centre is sampled, then
+        moved around their full range until the second beep. An axis that
+        did not move far enough keeps its previous range.
+
+        Parameters:
+            stick_l, stick_r: JoyStick objects
+            beeper: Optional Beeper for the prompts
+        """
+        readers = (stick_l.read_x, stick_l.read_y, stick_r.read_x, stick_r.read_y)
+
+        # Centre, averaged at rest
+        sums = [0, 0, 0, 0]
+        n = 0
+        end = time.ticks_add(time.ticks_ms(), rest_ms)
+        while time.ticks_diff(end, time.ticks_ms()) > 0:
+            for i in range(4):
+                sums[i] += readers[i]()
+            n += 1
+            if beeper:
+                beeper.update()
+        centres = [s // max(1, n) for s in sums]
+
+        # Extremes, tracked while the user sweeps the sticks
+        if beeper:
+            beeper.beep(1500, 100)
+        lo = list(centres)
+        hi = list(centres)
+        end = time.ticks_add(time.ticks_ms(), sweep_ms)
+        while time.ticks_diff(end, time.ticks_ms()) > 0:
+            for i in range(4):
+                v = readers[i]()
+                if v < lo[i]:
+                    lo[i] = v
+                elif v > hi[i]:
+                    hi[i] = v
+            if beeper:
+                beeper.update()
+        if beeper:
+            beeper.beep(1500, 300)
+
+        for i, name in enumerate(AXES):
+            axis = self.axes[name]
+            axis[1] = centres[i]
+            if centres[i] - lo[i] >= MIN_SPAN:
+                axis[0] = lo[i]
+            if hi[i] - centres[i] >= MIN_SPAN:
+                axis[2] = hi[i]
+        self.calibrated = True
+        return self.axes
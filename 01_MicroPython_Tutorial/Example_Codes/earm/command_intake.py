@@ -0,0 +1,128 @@
+"""
+eArm web command intake
+Latest-wins coalescing of the hold-to-move commands of the web page
+
+The page stamps every jog request with a sequence number (n) and its
+session token (t). On a weak link the requests can wait in the listen
+backlog and arrive out of order, so instead of applying them one by one
+the server offers every request of a burst to the intake:
+
+    - per axis only the newest command is kept (coalescing)
+    - a command older than the last one taken for its axis is dropped,
+      so a late "start" can no longer undo its "stop"
+    - apply() then touches each servo at most once
+    - only commands of the current page (set_page()) are taken, a late
+      request of a page that was reloaded or lost control is dropped
+
+While a button is held the page repeats its command; an axis that was
+not refreshed for HOLD_TIMEOUT_MS stops, in case the release was lost.
+"""
+
+import time
+from array import array
+
+# Query key -> (axis, direction of Servo auto adjust), as wired on the page
+JOG_KEYS = {
+    'a_minus': (0, 1), 'a_plus': (0, -1),
+    'b_minus': (1, 1), 'b_plus': (1, -1),
+    'c_minus': (2, -1), 'c_plus': (2, 1),
+    'd_minus': (3, 1), 'd_plus': (3, -1),
+}
+
+# A held axis stops when its command was not repeated for this long
+HOLD_TIMEOUT_MS = 1000
+
+
+class CommandIntake:
+    """Per-axis latest-wins slots for jog commands"""
+    def __init__(self, axes=4):
+        self.axes = axes
+        self.page = None  # Session token whose commands are taken
+        self.seq = array('l', [0] * axes)  # Newest seq taken per axis
+        self.pending = array('b', [0] * axes)  # Direction waiting for apply()
+        self.dirty = 0  # Bit per axis with a pending direction
+        self.active = array('b', [0] * axes)  # Direction last applied
+        self.refresh_t = array('l', [0] * axes)  # ticks_ms of the last command per axis
+        # Statistics
+        self.taken = 0
+        self.coalesced = 0
+        self.stale = 0
+        self.foreign = 0
+        self.expired = 0
+
+    def set_page(self, page):
+        """Take the commands of session token page from now on, its sequence starts over"""
+        if page != self.page:
+            self.page = page
+            for i in range(self.axes):
+                self.seq[i] = 0
+
+    def offer(self, params):
+        """
+        Take a jog command from parsed query parameters
+
+        Returns False if params is not a jog command, True otherwise
+        (also when it was dropped as out of date or from another page).
+        """
+        for key in params:
+            if key in JOG_KEYS:
+                break
+        else:
+            return False
+        axis, direction = JOG_KEYS[key]
+        if params[key] != '1':
+            direction = 0
+
+        if params.get('t') != self.page:
+            self.foreign += 1
+            return True
+        try:
+            seq = int(params['n'])
+        except (KeyError, ValueError):
+            seq = None
+        if seq is None:
+            seq = self.seq[axis] + 1
+        elif seq <= self.seq[axis]:
+            self.stale += 1
+            return True
+
+        self.seq[axis] = seq
+        self.refresh_t[axis] = time.ticks_ms()
+        bit = 1 << axis
+        if self.dirty & bit:
+            self.coalesced += 1
+        self.pending[axis] = direction
+        self.dirty |= bit
+        self.taken += 1
+        return True
+
+    def apply(self, servos):
+        """Hand the pending directions to the servos and stop expired holds"""
+        now = time.ticks_ms()
+        for i in range(self.axes):
+            if self.dirty & (1 << i):
+                direction = self.pending[i]
+            elif self.active[i] and time.ticks_diff(now, self.refresh_t[i]) > HOLD_TIMEOUT_MS:
+                direction = 0
+                self.expired += 1
+            else:
+                continue
+            if direction > 0:
+                servos[i].start_increase()
+            elif direction < 0:
+                servos[i].start_decrease()
+            else:
+                servos[i].stop_adjust()
+            self.active[i] = direction
+        self.dirty = 0
+
+    def stop_all(self, servos):
+        """Stop every axis, e.g. when the controller is gone"""
+        for i in range(self.axes):
+            servos[i].stop_adjust()
+            self.active[i] = 0
+        self.dirty = 0
+
+    def report(self):
+        return "Jog: %d taken, %d coalesced, %d stale, %d other page, %d hold timeouts" % (
+            self.taken, self.coalesced, self.stale, self.foreign, self.expired)
@@ -0,0 +1,80 @@
+"""
+eArm garbage collection policy
+Keeps collections out of the control tick: the heap is collected in the
+idle time between ticks and the automatic threshold is only a safety net
+"""
+
+import gc
+import time
+import micropython
+
+
+class GcPolicy:
+    """Collect in idle slots and measure how long each collection takes"""
+    def __init__(self, budget=8192, debug=False):
+        """
+        Parameters:
+            budget: Bytes allocated before the next idle collection is due
+            debug: True = lock the heap during the audited part of each tick,
+                   any allocation there raises MemoryError
+        """
+        self.budget = budget
+        self.debug = debug
+        self.base = 0  # gc.mem_alloc() after the last collection
+        self.last_pause_us = 0
+        self.max_pause_us = 0
+        self.collections = 0
+        self.locked = False
+
+    def begin(self):
+        """Collect once and raise the automatic threshold above the budget"""
+        self.collect()
+        # The firmware only collects by itself if idle slots were too short
+        gc.threshold(4 * self.budget)
+
+    def due(self):
+        """True once the budget has been allocated since the last collection"""
+        return gc.mem_alloc() - self.base >= self.budget
+
+    def collect(self):
+        """Collect now and record the pause"""
+        t0 = time.ticks_us()
+        gc.collect()
+        pause = time.ticks_diff(time.ticks_us(), t0)
+        self.last_pause_us = pause
+        if pause > self.max_pause_us:
+            self.max_pause_us = pause
+        self.collections += 1
+        self.base = gc.mem_alloc()
+        return pause
+
+    def idle(self, slot_us):
+        """
+        Spend an idle slot of slot_us
+
+        Collects when due and the last measured pause fits into the slot,
+        then sleeps for whatever is left of it.
+        """
+        t0 = time.ticks_us()
+        if self.due() and self.last_pause_us < slot_us:
+            self.collect()
+        left = slot_us - time.ticks_diff(time.ticks_us(), t0)
+        if left > 0:
+            time.sleep_us(left)
+
+    def lock(self):
+        """Start the audited part of a tick (debug mode only)"""
+        if self.debug:
+            micropython.heap_lock()
+            self.locked = True
+
+    def unlock(self):
+        """End the audited part of a tick"""
+        if self.locked:
+            micropython.heap_unlock()
+            self.locked = False
+
+    def report(self):
+        """Summary line for the console"""
+        return "GC: %d collections, last %d us, max %d us, %d bytes in use" % (
+            self.collections, self.last_pause_us, self.max_pause_us, gc.mem_alloc())
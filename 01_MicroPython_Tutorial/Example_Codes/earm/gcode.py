@@ -0,0 +1,403 @@
+"""
+eArm G-code
+Incremental parser and look-ahead motion planner for a G-code subset
+
+    G0 A90 B120        rapid move, every joint limited by JOINT_MAX_VEL
+    G1 A60 C80 F1800   linear move in joint space, feed in deg/min (modal)
+    G4 P500            dwell 500 ms (or S0.5 for seconds)
+    M3 / M3 S100       close the claw (joint D), optionally to an angle
+    M5                 open the claw
+    G90 / G91          absolute / relative angles
+    M114               report the position (before the ok)
+    M400               wait until every queued move has finished
+
+Axes A, B, C, D are the joints in degrees, decimals are allowed. N line
+numbers, *checksums and comments (; and parentheses) are ignored.
+
+Lines are parsed into fixed arrays as they arrive and queued as segments
+in a ring of LOOKAHEAD entries; the sender is held back while the ring
+is full, so programs of any length stream through a few hundred bytes.
+Consecutive moves blend: every time a segment is queued, the speed at
+which each junction may be crossed is worked out backwards from the end
+of the queue (where the arm must be able to stop), limited by the
+change of direction between the two segments. The arm only slows down
+where the path turns or the queue runs dry.
+
+Positions are kept in tenths of a degree and all arithmetic is integer,
+with every product kept below 2**30 so nothing is allocated per tick.
+"""
+
+from array import array
+
+from earm.motion_script import GRIP_OPEN, GRIP_CLOSE
+from earm.playback import JOINT_MAX_VEL, JOINT_MAX_ACC, isqrt
+
+# Segments queued ahead of the one being executed
+LOOKAHEAD = 16
+# Longest accepted line, longer ones are an error
+MAX_LINE = 96
+# Digits before the decimal point, value * 1000 stays a small int
+MAX_DIGITS = 6
+# G1 feed before the first F word, deg/min
+DEFAULT_FEED = 3000
+# Slowest speed while approaching a stop, tenths/s, so a segment always ends
+MIN_SPEED = 10
+# No limit, the largest small int
+_NONE = 0x3FFFFFFF
+
+# Segment kinds
+SEG_MOVE = 1
+SEG_DWELL = 2
+
+# Parser results
+LINE_OK = 0
+LINE_WAIT = 1  # M400 with moves still queued, offer the line again
+LINE_ERROR = 2
+
+_A = ord("A")
+_AXES = (0, 1, 2, 3)  # Letters A-D as word indices
+
+
+class GcodePlanner:
+    """Look-ahead queue of G-code segments, executed by step() each tick"""
+    def __init__(self, arm, size=LOOKAHEAD):
+        self.arm = arm
+        self.size = size
+        self.kind = bytearray(size)
+        self.end = array('h', [0] * (4 * size))  # Target per segment, tenths
+        self.length = array('l', [0] * size)  # Tenths of a degree, or ms of a dwell
+        self.vmax = array('l', [0] * size)  # Cruise speed, tenths/s
+        self.acc = array('l', [0] * size)  # Acceleration, tenths/s^2
+        self.vjunction = array('l', [0] * size)  # Fastest entry the turn allows
+        self.vexit = array('l', [0] * size)  # Exit speed from the backward pass
+        self.head = 0
+        self.count = 0
+        self.start = array('h', (0, 0, 0, 0))  # Where the current segment began
+        self.plan = array('h', (0, 0, 0, 0))  # End of the last queued segment
+        self.last_d = array('l', (0, 0, 0, 0))  # Direction of the last queued move
+        self.last_len = 0  # 0 = the next move starts from rest
+        self.last_v = 0
+        self.pos = 0  # Progress along the current segment, tenths * ms / s
+        self.v = 0
+        self.segments = 0  # Segments completed
+
+    def reset(self):
+        """Drop the queue and plan from the arm's present pose"""
+        a = self.arm.servo_current_angle
+        for i in range(4):
+            self.start[i] = a[i] * 10
+            self.plan[i] = a[i] * 10
+        self.head = 0
+        self.count = 0
+        self.pos = 0
+        self.v = 0
+        self.last_len = 0
+
+    def full(self):
+        return self.count == self.size
+
+    def _tail(self):
+        k = self.head + self.count
+        return k - self.size if k >= self.size else k
+
+    def add_move(self, target, feed):
+        """
+        Queue a move to target (4 x tenths), at feed tenths/s or 0 for a
+        rapid move, the caller checks full() first
+        """
+        plan = self.plan
+        d0 = target[0] - plan[0]
+        d1 = target[1] - plan[1]
+        d2 = target[2] - plan[2]
+        d3 = target[3] - plan[3]
+        length = isqrt(d0 * d0 + d1 * d1 + d2 * d2 + d3 * d3)
+        if length == 0:
+            return
+        v = feed if feed else _NONE
+        a = _NONE
+        last = self.last_d
+        dot = 0
+        for i in range(4):
+            d = target[i] - plan[i]
+            if d:
+                ad = abs(d)
+                v = min(v, JOINT_MAX_VEL[i] * 10 * length // ad)
+                a = min(a, JOINT_MAX_ACC[i] * 10 * length // ad)
+            dot += d * last[i]
+            last[i] = d
+        # Junction speed from the angle between the two moves: full speed
+        # straight on, nothing at a right angle or sharper
+        vj = 0
+        if self.last_len and dot > 0:
+            norm = self.last_len * length
+            while norm > 0xFFFFF:
+                # dot <= norm, keep dot * 1000 a small int
+                norm >>= 1
+                dot >>= 1
+            vj = min(v, self.last_v) * (dot * 1000 // norm) // 1000
+        self.last_len = length
+        self.last_v = v
+        k = self._tail()
+        self.kind[k] = SEG_MOVE
+        for i in range(4):
+            self.end[4 * k + i] = target[i]
+            plan[i] = target[i]
+        self.length[k] = length
+        self.vmax[k] = v
+        self.acc[k] = a
+        self.vjunction[k] = vj
+        self.count += 1
+        self._backward()
+
+    def add_dwell(self, ms):
+        k = self._tail()
+        self.kind[k] = SEG_DWELL
+        for i in range(4):
+            self.end[4 * k + i] = self.plan[i]
+        self.length[k] = ms
+        self.vjunction[k] = 0
+        self.last_len = 0
+        self.count += 1
+        self._backward()
+
+    def _backward(self):
+        """Exit speeds from the end of the queue back, the last one stops"""
+        size = self.size
+        k = self._tail() - 1
+        if k < 0:
+            k += size
+        v_next = 0  # Highest entry speed of the segment after k
+        for _ in range(self.count):
+            self.vexit[k] = v_next
+            if self.kind[k] == SEG_MOVE:
+                reach = isqrt(v_next * v_next + 2 * self.acc[k] * self.length[k])
+                v_next = min(self.vjunction[k], self.vmax[k], reach)
+            else:
+                v_next = 0
+            k -= 1
+            if k < 0:
+                k += size
+
+    def _pop(self):
+        k = self.head
+        for i in range(4):
+            self.start[i] = self.end[4 * k + i]
+        self.head = k + 1 if k + 1 < self.size else 0
+        self.count -= 1
+        self.segments += 1
+
+    def step(self, dt):
+        """Advance along the queue by dt ms and write the servos"""
+        if not self.count:
+            return
+        k = self.head
+        while True:
+            if self.kind[k] == SEG_DWELL:
+                self.v = 0
+                self._write(-1, 0)
+                self.pos += dt * 1000
+                if self.pos < self.length[k] * 1000:
+                    return
+                self.pos = 0
+                self._pop()
+            else:
+                total = self.length[k] * 1000
+                v = self.v
+                a = self.acc[k]
+                ve = self.vexit[k]
+                # Fastest speed from which the exit speed is still reachable
+                v_new = min(self.vmax[k], v + a * dt // 1000,
+                            isqrt(ve * ve + 2 * a * ((total - self.pos) // 1000)))
+                if v_new < MIN_SPEED:
+                    v_new = MIN_SPEED
+                self.pos += (v + v_new) // 2 * dt
+                self.v = v_new
+                if self.pos < total:
+                    self._write(k, self.length[k])
+                    return
+                # Carry the overshoot into the next segment, no stop in between
+                self.pos -= total
+                self._pop()
+            if not self.count:
+                self.pos = 0
+                self.v = 0
+                self._write(-1, 0)
+                return
+            k = self.head
+            if self.kind[k] != SEG_MOVE:
+                self.pos = 0
+            dt = 0
+
+    def _write(self, k, length):
+        """Servo angles at the current progress of segment k, -1 = at rest"""
+        start = self.start
+        write = self.arm.write_angle
+        f = self.pos * 10 // length if k >= 0 else 0  # 1/10000 of the segment
+        for i in range(4):
+            p = start[i]
+            if f:
+                p += (self.end[4 * k + i] - p) * f // 10000
+            write(i, (p + 5) // 10)
+
+
+class GcodeInterpreter:
+    """Parses G-code lines into a GcodePlanner, one line per execute()"""
+    def __init__(self, planner):
+        self.planner = planner
+        self.words = array('l', [0] * 26)  # Value * 1000 per letter
+        self.seen = 0  # Bit per letter present in the line
+        self.target = array('h', (0, 0, 0, 0))
+        self.feed = DEFAULT_FEED * 10 // 60  # tenths/s
+        self.relative = False
+        self.linear = False  # Motion mode of axis words without G
+        self.error = ""
+        self.reply = ""  # Extra output of the last line (M114)
+        self.lines = 0
+        self.errors = 0
+
+    def _parse(self, line, n):
+        """Fill words / seen from line[:n], False on a syntax error"""
+        words = self.words
+        self.seen = 0
+        i = 0
+        while i < n:
+            c = line[i]
+            i += 1
+            if c == 59 or c == 42:  # ; comment, * checksum
+                break
+            if c == 40:  # ( comment )
+                while i < n and line[i] != 41:
+                    i += 1
+                i += 1
+                continue
+            if c <= 32:
+                continue
+            if 97 <= c <= 122:
+                c -= 32
+            if not 65 <= c <= 90:
+                self.error = "unexpected character"
+                return False
+            while i < n and line[i] == 32:
+                i += 1
+            neg = False
+            if i < n and (line[i] == 45 or line[i] == 43):
+                neg = line[i] == 45
+                i += 1
+            value = 0
+            digits = 0
+            frac = -1  # Decimals seen after the point, -1 = no point yet
+            while i < n:
+                d = line[i]
+                if 48 <= d <= 57:
+                    if frac < 0 and digits == MAX_DIGITS:
+                        self.error = "number too long after %s" % chr(c)
+                        return False
+                    if frac < 3:
+                        value = value * 10 + d - 48
+                        if frac >= 0:
+                            frac += 1
+                    digits += 1
+                elif d == 46 and frac < 0:
+                    frac = 0
+                else:
+                    break
+                i += 1
+            if not digits:
+                self.error = "missing number after %s" % chr(c)
+                return False
+            for _ in range(3 - max(frac, 0)):
+                value *= 10
+            words[c - _A] = -value if neg else value
+            self.seen |= 1 << (c - _A)
+        return True
+
+    def _has(self, letter):
+        return self.seen >> (ord(letter) - _A) & 1
+
+    def _value(self, letter):
+        return self.words[ord(letter) - _A]
+
+    def execute(self, line, n):
+        """Run one line, returns LINE_OK, LINE_WAIT or LINE_ERROR (see self.error)"""
+        self.reply = ""
+        result = self._execute(line, n)
+        if result == LINE_OK:
+            self.lines += 1
+        elif result == LINE_ERROR:
+            self.errors += 1
+        return result
+
+    def _execute(self, line, n):
+        if not self._parse(line, n):
+            return LINE_ERROR
+        if not self.seen:
+            return LINE_OK
+        planner = self.planner
+        if self._has("G"):
+            g = self._value("G")
+            if g == 0 or g == 1000:
+                self.linear = g == 1000
+                return self._move()
+            if g == 4000:
+                ms = self._value("P") // 1000 if self._has("P") else self._value("S")
+                if not 0 <= ms <= 600000:
+                    self.error = "dwell out of range"
+                    return LINE_ERROR
+                planner.add_dwell(ms)
+                return LINE_OK
+            if g == 90000 or g == 91000:
+                self.relative = g == 91000
+                return LINE_OK
+            self.error = "unsupported G%d" % (g // 1000)
+            return LINE_ERROR
+        if self._has("M"):
+            m = self._value("M")
+            if m == 3000 or m == 5000:
+                angle = GRIP_CLOSE if m == 3000 else GRIP_OPEN
+                if m == 3000 and self._has("S"):
+                    angle = self._value("S") // 1000
+                if not 0 <= angle <= 180:
+                    self.error = "claw angle out of range"
+                    return LINE_ERROR
+                target = self.target
+                for i in range(4):
+                    target[i] = planner.plan[i]
+                target[3] = angle * 10
+                planner.add_move(target, 0)
+                return LINE_OK
+            if m == 400000:
+                return LINE_WAIT if planner.count else LINE_OK
+            if m == 114000:
+                a = planner.arm.servo_current_angle
+                self.reply = "A:%d B:%d C:%d D:%d" % (a[0], a[1], a[2], a[3])
+                return LINE_OK
+            if m == 2000 or m == 30000:
+                return LINE_OK
+            self.error = "unsupported M%d" % (m // 1000)
+            return LINE_ERROR
+        # Axis words alone repeat the last motion mode, as G-code allows
+        return self._move()
+
+    def _move(self):
+        planner = self.planner
+        target = self.target
+        words = self.words
+        for i in _AXES:
+            if self.seen >> i & 1:
+                t = (words[i] + 50) // 100
+                if self.relative:
+                    t += planner.plan[i]
+                # Checked before the store, target is an array('h')
+                if not 0 <= t <= 1800:
+                    self.error = "%s out of range" % chr(_A + i)
+                    return LINE_ERROR
+                target[i] = t
+            else:
+                target[i] = planner.plan[i]
+        if self._has("F"):
+            if words[ord("F") - _A] <= 0:
+                self.error = "feed must be positive"
+                return LINE_ERROR
+            self.feed = max(1, words[ord("F") - _A] // 6000)
+        planner.add_move(target, self.feed if self.linear else 0)
+        return LINE_OK
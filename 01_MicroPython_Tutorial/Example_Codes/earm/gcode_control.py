@@ -0,0 +1,336 @@
+"""
+eArm G-code control application
+The arm runs G-code (earm.gcode) streamed over a serial port, TCP or
+HTTP, for CAM and automation tools
+
+Serial and TCP use the usual send and wait protocol of G-code senders:
+every line is answered with "ok" or "error:<reason>" once it is queued,
+and no line is read while the look-ahead queue is full. Senders may
+keep up to RX_WINDOW bytes in flight (character counting).
+
+Over HTTP a program is POSTed to /gcode in one request. The body is read
+only as fast as the queue drains, so TCP itself holds the sender back,
+and the reply counts the lines run and the first error. GET / returns
+the position and queue state as text.
+"""
+
+import errno
+import socket
+import time
+
+from earm.arm import eArm
+from earm.gc_policy import GcPolicy
+from earm.gcode import GcodePlanner, GcodeInterpreter, MAX_LINE, LINE_OK, LINE_WAIT, LINE_ERROR
+from earm.loop import LoopRunner
+from earm.serial_proto import StdioPort
+
+# Bytes a character counting sender may have unanswered
+RX_WINDOW = 128
+
+# HTTP connection states
+HTTP_IDLE = 0
+HTTP_HEADER = 1
+HTTP_BODY = 2
+HTTP_DONE = 3  # Body read, waiting for its last line to be queued
+
+_OK = b"ok\n"
+
+
+class LineReader:
+    """Lines from a port with readinto(), handed out one at a time"""
+    def __init__(self, port, reply, size=64):
+        """
+        Parameters:
+            port: Object with readinto(), returning 0 or None when idle
+            reply: reply(result, interpreter) called for every executed line
+        """
+        self.port = port
+        self.reply = reply
+        self.rx = bytearray(size)
+        self.rx_n = 0
+        self.rx_i = 0
+        self.line = bytearray(MAX_LINE)
+        self.n = 0
+        self.overflow = False  # Line longer than MAX_LINE, rejected whole
+        self.ready = False  # line[:n] is complete
+
+    def clear(self):
+        self.rx_n = 0
+        self.rx_i = 0
+        self.done()
+
+    def done(self):
+        self.ready = False
+        self.n = 0
+        self.overflow = False
+
+    def finish(self):
+        """End of input, a last line without newline is complete too"""
+        if self.n or self.overflow:
+            self.ready = True
+
+    def next(self):
+        """True when self.line[:self.n] holds a complete line"""
+        if self.ready:
+            return True
+        rx = self.rx
+        line = self.line
+        while True:
+            if self.rx_i >= self.rx_n:
+                n = self.port.readinto(rx)
+                if not n:
+                    return False
+                self.rx_n = n
+                self.rx_i = 0
+            c = rx[self.rx_i]
+            self.rx_i += 1
+            if c == 10 or c == 13:
+                if self.n or self.overflow:
+                    self.ready = True
+                    return True
+            elif self.n < MAX_LINE:
+                line[self.n] = c
+                self.n += 1
+            else:
+                self.overflow = True
+
+
+class HttpGcode:
+    """One HTTP client at a time, POST /gcode bodies are run as G-code"""
+    def __init__(self, port=80):
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(socket.getaddrinfo("0.0.0.0", port)[0][-1])
+        self.server.listen(2)
+        self.server.setblocking(False)
+        self.conn = None
+        self.state = HTTP_IDLE
+        self.head = bytearray(512)
+        self.head_n = 0
+        self.remaining = 0  # Body bytes still to read, -1 = until the client closes
+        # Room for the body bytes that arrive with the head
+        self.reader = LineReader(self, self.count, len(self.head))
+        self.lines = 0
+        self.errors = 0
+        self.first_error = ""
+        self.requests = 0
+
+    def count(self, result, interp):
+        if result == LINE_OK:
+            self.lines += 1
+        else:
+            if not self.errors:
+                self.first_error = "line %d: %s" % (self.lines + self.errors + 1, interp.error)
+            self.errors += 1
+
+    def readinto(self, buf):
+        """Body bytes for the LineReader, 0 when none are waiting"""
+        if self.state != HTTP_BODY:
+            return 0
+        want = len(buf) if self.remaining < 0 else min(len(buf), self.remaining)
+        n = self._recv(buf, want)
+        if n is None:
+            return 0
+        if n == 0 or n == self.remaining:
+            self.state = HTTP_DONE
+        if self.remaining > 0:
+            self.remaining -= n
+        return n
+
+    def _recv(self, buf, size):
+        """Bytes read, None when nothing is waiting, 0 when the client closed"""
+        try:
+            return self._readinto(buf, size)
+        except OSError as e:
+            if e.args[0] == errno.EAGAIN:
+                return None
+            return 0
+
+    def _send(self, text):
+        conn = self.conn
+        self.conn = None
+        self.state = HTTP_IDLE
+        try:
+            conn.setblocking(True)
+            conn.send(("HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                       "Connection: close\r\n\r\n" + text).encode())
+        except OSError:
+            pass
+        conn.close()
+
+    def _header(self, app):
+        """Read the request head, then answer it or start reading the body"""
+        n = self._recv(memoryview(self.head)[self.head_n:], len(self.head) - self.head_n)
+        if n is None:
+            return
+        if n == 0:
+            self.conn.close()
+            self.conn = None
+            self.state = HTTP_IDLE
+            return
+        self.head_n += n
+        head = bytes(self.head[:self.head_n])
+        end = head.find(b"\r\n\r\n")
+        if end < 0:
+            if self.head_n == len(self.head):
+                self._send("error: request head too long\n")
+            return
+        self.requests += 1
+        text = head[:end].decode()
+        first = text.split("\r\n", 1)[0].split(" ")
+        if len(first) < 2 or first[0] != "POST":
+            self._send(app.status())
+            return
+        if not first[1].startswith("/gcode"):
+            self._send("error: POST to /gcode\n")
+            return
+        self.remaining = -1
+        for line in text.split("\r\n")[1:]:
+            line = line.lower()
+            if line.startswith("content-length:"):
+                try:
+                    self.remaining = int(line[15:])
+                except ValueError:
+                    pass
+            elif line.startswith("expect:") and "100-continue" in line:
+                try:
+                    self.conn.send(b"HTTP/1.1 100 Continue\r\n\r\n")
+                except OSError:
+                    pass
+        # Body bytes that came with the head
+        body = head[end + 4:]
+        reader = self.reader
+        reader.clear()
+        reader.rx[:len(body)] = body
+        reader.rx_n = len(body)
+        if self.remaining > 0:
+            self.remaining -= len(body)
+        self.lines = 0
+        self.errors = 0
+        self.first_error = ""
+        self.state = HTTP_DONE if self.remaining == 0 else HTTP_BODY
+
+    def poll(self, app):
+        """Serve the connection, called every tick"""
+        if self.conn is None:
+            try:
+                conn, addr = self.server.accept()
+            except OSError:
+                return
+            conn.setblocking(False)
+            self.conn = conn
+            # MicroPython streams have readinto(), CPython sockets recv_into()
+            self._readinto = conn.readinto if hasattr(conn, "readinto") else conn.recv_into
+            self.head_n = 0
+            self.state = HTTP_HEADER
+        if self.state == HTTP_HEADER:
+            self._header(app)
+        if self.state == HTTP_BODY or self.state == HTTP_DONE:
+            reader = self.reader
+            app.execute_lines(reader)
+            if self.state == HTTP_DONE and not reader.ready and reader.rx_i >= reader.rx_n:
+                # Body used up, a last line without newline still runs
+                reader.finish()
+                app.execute_lines(reader)
+                if reader.ready:
+                    return
+                text = "ok %d\n" % self.lines
+                if self.errors:
+                    text += "errors %d, first at %s\n" % (self.errors, self.first_error)
+                self._send(text)
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.server.close()
+
+
+class GcodeControl:
+    """G-code over serial, TCP or HTTP drives the mechanical arm"""
+    def __init__(self, servo_pins=(4, 5, 6, 7), port=None, http_port=None, rate_hz=100):
+        """
+        Parameters:
+            servo_pins: A, B, C, D servo pins (adjust according to actual wiring)
+            port: Object with readinto() / write(), e.g. machine.UART or
+                  TcpPort(), None = the USB serial REPL
+            http_port: Also accept programs over HTTP on this port, None = no
+            rate_hz: Control loop rate
+        """
+        self.servo_pins = servo_pins
+        self.port = port
+        self.http_port = http_port
+        self.arm = eArm()
+        self.planner = GcodePlanner(self.arm)
+        self.interp = GcodeInterpreter(self.planner)
+        self.gc_policy = GcPolicy()
+        self.loop = LoopRunner(1000000 // rate_hz, self.gc_policy)
+        self.reader = None  # Opened by begin()
+        self.http = None
+        self.last_t = 0
+
+    def begin(self):
+        """Attach the servos and open the port"""
+        self.arm.servo_attach(*self.servo_pins)
+        if self.port is None:
+            self.port = StdioPort()
+        self.reader = LineReader(self.port, self.reply)
+        if self.http_port is not None:
+            self.http = HttpGcode(self.http_port)
+        self.planner.reset()
+        self.gc_policy.begin()
+        self.last_t = time.ticks_ms()
+
+    def reply(self, result, interp):
+        """Answer a line on the serial port"""
+        port = self.port
+        if interp.reply:
+            port.write(interp.reply.encode() + b"\n")
+        if result == LINE_OK:
+            port.write(_OK)
+        else:
+            port.write(b"error:" + interp.error.encode() + b"\n")
+
+    def execute_lines(self, reader):
+        """Run the lines waiting in reader while the planner has room"""
+        planner = self.planner
+        interp = self.interp
+        while not planner.full() and reader.next():
+            if reader.overflow:
+                interp.error = "line too long"
+                interp.errors += 1
+                result = LINE_ERROR
+            else:
+                result = interp.execute(reader.line, reader.n)
+                if result == LINE_WAIT:
+                    return
+            reader.done()
+            reader.reply(result, interp)
+
+    def status(self):
+        a = self.arm.servo_current_angle
+        p = self.planner
+        i = self.interp
+        return ("A:%d B:%d C:%d D:%d\nqueued %d\nspeed %d\nsegments %d\nlines %d\nerrors %d\n"
+                % (a[0], a[1], a[2], a[3], p.count, p.v // 10, p.segments, i.lines, i.errors))
+
+    def tick(self):
+        """One pass of the control loop"""
+        now = time.ticks_ms()
+        dt = time.ticks_diff(now, self.last_t)
+        self.last_t = now
+        self.execute_lines(self.reader)
+        if self.http is not None:
+            self.http.poll(self)
+        self.planner.step(dt)
+
+    def run(self):
+        """Main loop"""
+        self.begin()
+        try:
+            self.loop.run(self.tick)
+        finally:
+            close = getattr(self.port, "close", None)
+            if close is not None:
+                close()
+            if self.http is not None:
+                self.http.close()
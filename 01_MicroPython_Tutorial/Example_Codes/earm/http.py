@@ -0,0 +1,225 @@
+"""
+eArm minimal HTTP helpers
+
+The servers take each accepted client to a RequestReader. It reads the
+request head without blocking and hands the complete head to the
+server's handler. A client that sends its request slowly, or never
+(slowloris), only holds a slot until REQUEST_TIMEOUT_MS, while the
+accept loop keeps serving the others.
+
+Responses are written in full with a send timeout. Every failure is
+counted in stats and logged, instead of being swallowed:
+
+    ST_REQUESTS    request heads handed to the server
+    ST_TIMEOUTS    clients dropped before their head was complete
+    ST_CLOSED      clients that closed without sending a request
+    ST_MALFORMED   heads answered 400 / 414 (bad first line, not UTF-8,
+                   longer than the buffer)
+    ST_EVICTED     slow clients dropped for a new one, every slot was busy
+    ST_SEND_ERRORS responses that could not be written
+"""
+
+from array import array
+import errno
+import time
+
+from earm.log import log, define, WARN
+
+REQUEST_MAX = 1024  # Longest request head, the first line must fit
+REQUEST_TIMEOUT_MS = 2000  # Time a client gets to send its request head
+SEND_TIMEOUT_S = 2
+
+ST_REQUESTS = 0
+ST_TIMEOUTS = 1
+ST_CLOSED = 2
+ST_MALFORMED = 3
+ST_EVICTED = 4
+ST_SEND_ERRORS = 5
+STAT_NAMES = ("requests", "timeouts", "closed", "malformed", "evicted", "send errors")
+stats = array('l', [0] * len(STAT_NAMES))
+
+EV_HTTP_DROP = define(WARN, "http: dropped client (%s)")
+EV_HTTP_SEND = define(WARN, "http: response not sent: %s")
+
+
+def parse_request(req):
+    """Extract URL parameters from HTTP request, {} when the first line has none"""
+    end = req.find('\n')
+    first = (req if end < 0 else req[:end]).rstrip('\r').split(' ')
+    if len(first) < 2:
+        return {}
+    q = first[1].find('?')
+    if q < 0:
+        return {}
+    params = {}
+    for p in first[1][q + 1:].split('&'):
+        i = p.find('=')
+        if i > 0:
+            params[p[:i]] = p[i + 1:]
+    return params
+
+def close_client(client):
+    """Close a client socket, ignoring a connection that is already gone"""
+    try:
+        client.close()
+    except OSError:
+        pass
+
+def _head(status, ctype):
+    return ("HTTP/1.1 %s\r\nContent-Type: %s\r\nConnection: close\r\n\r\n"
+            % (status, ctype)).encode()
+
+def send_response(client, content, ctype="text/html", status="200 OK"):
+    """Send HTTP response and close the client, False if it was not sent"""
+    ok = True
+    try:
+        client.settimeout(SEND_TIMEOUT_S)
+        client.sendall(_head(status, ctype) + content.encode())
+    except OSError as e:
+        stats[ST_SEND_ERRORS] += 1
+        log.event(EV_HTTP_SEND, e)
+        ok = False
+    close_client(client)
+    return ok
+
+def send_binary(client, data, ctype="application/octet-stream"):
+    """Send a binary HTTP response, data is any buffer or an object with write(stream)"""
+    ok = True
+    try:
+        client.settimeout(SEND_TIMEOUT_S)
+        client.sendall(_head("200 OK", ctype))
+        if hasattr(data, "write"):
+            data.write(client)
+        else:
+            client.sendall(data)
+    except OSError as e:
+        stats[ST_SEND_ERRORS] += 1
+        log.event(EV_HTTP_SEND, e)
+        ok = False
+    close_client(client)
+    return ok
+
+def report():
+    """Summary line for the console"""
+    return "HTTP: " + ", ".join("%d %s" % (stats[i], STAT_NAMES[i])
+                                for i in range(len(STAT_NAMES)))
+
+
+class RequestReader:
+    """Request heads of several non-blocking clients, read as they arrive"""
+    def __init__(self, handler, slots=8, size=REQUEST_MAX, timeout_ms=REQUEST_TIMEOUT_MS):
+        """
+        Parameters:
+            handler: handler(client, req) answers a request, req is the
+                     decoded head; the client is closed if it raises
+            slots: Clients whose head is still arriving
+            size: Head buffer per slot in bytes
+            timeout_ms: Time a client gets to send its head
+        """
+        self.handler = handler
+        self.slots = slots
+        self.timeout_ms = timeout_ms
+        self.clients = [None] * slots
+        self.reads = [None] * slots  # readinto / recv_into of each client
+        self.bufs = [bytearray(size) for _ in range(slots)]
+        self.n = array('H', bytes(2 * slots))
+        self.t = array('l', [0] * slots)  # ticks_ms each client was accepted
+        self.count = 0
+
+    def add(self, client):
+        """Take a newly accepted client, answered at once when its head has arrived"""
+        client.setblocking(False)
+        i = self.clients.index(None) if self.count < self.slots else self._oldest()
+        if self.clients[i] is not None:
+            self._drop(i, ST_EVICTED, "evicted")
+        self.clients[i] = client
+        # MicroPython streams have readinto(), CPython sockets recv_into()
+        self.reads[i] = client.readinto if hasattr(client, "readinto") else client.recv_into
+        self.n[i] = 0
+        self.t[i] = time.ticks_ms()
+        self.count += 1
+        self._read(i)
+
+    def poll(self):
+        """Read what arrived from the waiting clients, returns the requests handled"""
+        handled = 0
+        if self.count:
+            now = time.ticks_ms()
+            for i in range(self.slots):
+                if self.clients[i] is None:
+                    continue
+                if self._read(i):
+                    handled += 1
+                elif self.clients[i] is not None and time.ticks_diff(now, self.t[i]) > self.timeout_ms:
+                    self._drop(i, ST_TIMEOUTS, "timeout")
+        return handled
+
+    def _oldest(self):
+        oldest = 0
+        for i in range(1, self.slots):
+            if time.ticks_diff(self.t[i], self.t[oldest]) < 0:
+                oldest = i
+        return oldest
+
+    def _free(self, i):
+        client = self.clients[i]
+        self.clients[i] = None
+        self.reads[i] = None
+        self.count -= 1
+        return client
+
+    def _drop(self, i, stat, why=None):
+        stats[stat] += 1
+        if why is not None:
+            log.event(EV_HTTP_DROP, why)
+        close_client(self._free(i))
+
+    def _answer(self, i, status, text):
+        stats[ST_MALFORMED] += 1
+        log.event(EV_HTTP_DROP, text)
+        send_response(self._free(i), text, "text/plain", status)
+
+    def _read(self, i):
+        """Read slot i, True when its request was handed to the handler"""
+        buf = self.bufs[i]
+        n = self.n[i]
+        try:
+            got = self.reads[i](memoryview(buf)[n:], len(buf) - n)
+        except OSError as e:
+            if e.args[0] == errno.EAGAIN:
+                return False
+            got = 0
+        if got is None:
+            return False
+        if got == 0:
+            # Normal for a browser's spare connections, not logged
+            self._drop(i, ST_CLOSED)
+            return False
+        n += got
+        self.n[i] = n
+        head = bytes(buf[:n])
+        if head.find(b"\r\n\r\n") < 0 and head.find(b"\n\n") < 0:
+            if n < len(buf):
+                return False
+            # Head longer than the buffer, the first line is enough
+            if head.find(b"\n") < 0:
+                self._answer(i, "414 URI Too Long", "Request line too long")
+                return False
+        try:
+            req = head.decode()
+        except UnicodeError:
+            self._answer(i, "400 Bad Request", "Request not UTF-8")
+            return False
+        first = req.split("\n", 1)[0].split(" ")
+        if len(first) < 2 or not first[1].startswith("/"):
+            self._answer(i, "400 Bad Request", "Bad request line")
+            return False
+        stats[ST_REQUESTS] += 1
+        client = self._free(i)
+        try:
+            self.handler(client, req)
+        except Exception:
+            close_client(client)
+            raise
+        return True
+
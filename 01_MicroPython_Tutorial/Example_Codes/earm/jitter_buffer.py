@@ -0,0 +1,117 @@
+"""
+eArm jitter buffer
+Plays streamed poses at the control rate from a PoseQueue, riding out
+gaps in the link instead of stopping at every late chunk
+
+Playback starts once prefill poses are queued, and not before the
+start time if one was given (so several arms can start together). When
+the queue runs low the buffer plays at half speed, interpolating between
+poses, so a short hiccup only slows the arm down. If it still runs dry
+the arm holds the last pose and buffering starts again (an underrun).
+"""
+
+import time
+from array import array
+
+from earm.pose_queue import PoseQueue
+
+# States
+JB_IDLE = 0
+JB_BUFFERING = 1
+JB_PLAYING = 2
+
+STRETCH_RATE = 500  # Permille of a pose per tick while the queue is low
+
+
+class JitterBuffer:
+    """Pose queue with prefill, low water stretching and underrun recovery"""
+    def __init__(self, arm, size=128):
+        self.arm = arm
+        self.queue = PoseQueue(size)
+        self.state = JB_IDLE
+        self.prefill = 0
+        self.low = 0  # Stretch below this many queued poses
+        self.ending = False  # No more poses will come, play out and stop
+        self.start_t = 0  # ticks_ms to start playing at, if timed
+        self.timed = False
+        self.from_pose = array('h', (0, 0, 0, 0))
+        self.to_pose = array('h', (0, 0, 0, 0))
+        self.phase = 0  # Permille of the way from from_pose to to_pose
+        self.underruns = 0
+        self.stretched = 0  # Ticks played at STRETCH_RATE
+
+    def start(self, prefill=0, start_t=None):
+        """
+        Begin a new stream
+
+        prefill=0 plays as soon as poses arrive and stops when the queue
+        runs dry, for single trajectory chunks. start_t (ticks_ms) holds
+        the first pose until that time.
+        """
+        self.queue.clear()
+        self.prefill = min(prefill, self.queue.size)
+        self.low = self.prefill // 4
+        self.ending = prefill == 0
+        current = self.arm.servo_current_angle
+        for i in range(4):
+            self.to_pose[i] = current[i]
+        self.phase = 0
+        self.timed = start_t is not None
+        self.start_t = start_t or 0
+        self.state = JB_BUFFERING
+
+    def end(self):
+        """The host has sent the last pose"""
+        self.ending = True
+
+    def stop(self):
+        self.queue.clear()
+        self.state = JB_IDLE
+
+    def step(self):
+        """Advance one control tick and write the servos"""
+        queue = self.queue
+        if self.state == JB_BUFFERING:
+            if self.timed:
+                if time.ticks_diff(self.start_t, time.ticks_ms()) > 0:
+                    return
+                self.timed = False
+            if queue.count == 0 or (queue.count < self.prefill and not self.ending):
+                if self.ending and queue.count == 0:
+                    self.state = JB_IDLE
+                return
+            self.state = JB_PLAYING
+        elif self.state != JB_PLAYING:
+            return
+
+        rate = 1000
+        if queue.count <= self.low and not self.ending:
+            rate = STRETCH_RATE
+            self.stretched += 1
+        self.phase += rate
+        while self.phase >= 1000:
+            base = queue.pop()
+            if base < 0:
+                # Ran dry, hold the last pose
+                for i in range(4):
+                    self.from_pose[i] = self.to_pose[i]
+                self.phase = 0
+                self._write(0)
+                if self.ending:
+                    self.state = JB_IDLE
+                else:
+                    self.underruns += 1
+                    self.state = JB_BUFFERING
+                return
+            buf = queue.buf
+            for i in range(4):
+                self.from_pose[i] = self.to_pose[i]
+                self.to_pose[i] = buf[base + i]
+            self.phase -= 1000
+        self._write(self.phase)
+
+    def _write(self, phase):
+        a = self.from_pose
+        b = self.to_pose
+        for i in range(4):
+            self.arm.write_angle(i, a[i] + (b[i] - a[i]) * phase // 1000)
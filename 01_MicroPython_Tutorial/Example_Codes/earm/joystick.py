@@ -0,0 +1,75 @@
+"""
+eArm joystick reader
+Two analog axes and an optional push button per joystick
+"""
+
+from machine import Pin, ADC
+
+
+class JoyStick:
+    """Joystick class"""
+    def __init__(self, samples=20, trim=5):
+        """
+        Parameters:
+            samples: ADC reads per axis reading
+            trim: Reads dropped at each end of the burst, the rest is averaged
+                  (Host_Tools/adc_analyse.py recommends both from a capture)
+        """
+        if samples <= 2 * trim:
+            raise ValueError("samples must be larger than 2 * trim")
+        self.samples = samples
+        self.trim = trim
+        self.pin_x = None
+        self.pin_y = None
+        self.pin_z = None
+        self.adc_x = None
+        self.adc_y = None
+        self.btn_z = None
+        self.buf = [0] * samples
+    
+    def attach(self, x_pin, y_pin, z_pin=None):
+        """Attach joystick pins, the ADCs are opened by the first read"""
+        self.pin_x = x_pin
+        self.pin_y = y_pin
+        self.pin_z = z_pin
+    
+    def _open(self):
+        """Create the ADC and button objects"""
+        self.adc_x = ADC(Pin(self.pin_x))
+        self.adc_y = ADC(Pin(self.pin_y))
+        self.adc_x.atten(ADC.ATTN_11DB)  # 0-3.3V range
+        self.adc_y.atten(ADC.ATTN_11DB)
+        
+        if self.pin_z is not None:
+            self.btn_z = Pin(self.pin_z, Pin.IN, Pin.PULL_UP)
+    
+    def _eliminate_jitter(self):
+        """Eliminate jitter, average the reads between the trimmed ends"""
+        total = 0
+        for i in range(self.trim, self.samples - self.trim):
+            total += self.buf[i]
+        return total // (self.samples - 2 * self.trim)
+    
+    def read_x(self):
+        """Read X-axis value"""
+        if self.adc_x is None:
+            self._open()
+        for i in range(self.samples):
+            self.buf[i] = self.adc_x.read()
+        return self._eliminate_jitter()
+    
+    def read_y(self):
+        """Read Y-axis value"""
+        if self.adc_y is None:
+            self._open()
+        for i in range(self.samples):
+            self.buf[i] = self.adc_y.read()
+        return self._eliminate_jitter()
+    
+    def read_z(self):
+        """Read Z-axis button (False when pressed, True when released)"""
+        if self.btn_z is None and self.pin_z is not None:
+            self._open()
+        if self.btn_z:
+            return self.btn_z.value()  # Pull-up resistor, 0 when pressed
+        return 1
@@ -0,0 +1,441 @@
+"""
+eArm joystick control application
+Two joysticks move the arm, the joystick buttons record, save and replay actions
+"""
+
+from array import array
+import time
+
+from earm.arm import eArm
+from earm.buttons import EventQueue, BTN_L, BTN_R, EV_RELEASE, EV_LONG
+from earm.buzzer import Beeper
+from earm.calibration import JoystickProfile, TABLE_SHIFT
+from earm.gc_policy import GcPolicy
+from earm.log import (log, EV_LOOP_ERROR, EV_NO_ACTIONS, EV_PROGRAM_LOADED, EV_PROGRAM_SAVED,
+                      EV_PLAYBACK_TUNED)
+from earm.loop import LoopRunner
+from earm.path import smooth_path
+from earm.playback import Player, PLAY_RUN, PLAY_PAUSE
+from earm.programs import ProgramLibrary, FLAG_FASTEST, FLAG_SMOOTH
+from earm.trace import TraceRecorder, SRC_JOYSTICK, JOYSTICK_MODULES, profile_values
+
+# Jog pace in ms per degree for speed levels 1 (just outside the dead
+# zone) to 5 (full deflection), index 0 is unused. None is below 5 ms,
+# the period at the default rate, so every level is reached in time
+UA_SPEED = bytes((0, 35, 30, 25, 20, 10))  # Upper arm
+FA_SPEED = bytes((0, 35, 30, 25, 20, 10))  # Forearm
+LR_SPEED = bytes((0, 25, 20, 15, 10, 5))  # Base rotation
+CLAW_SPEED = bytes((0, 20, 15, 10, 7, 5))  # Claw
+
+# Sequence speeds (percent) stepped through by a long left press during playback
+PLAY_SPEEDS = (100, 150, 200, 50)
+
+
+class JoystickApp:
+    """Joystick control of the mechanical arm with action recording"""
+    def __init__(self, servo_pins=(4, 5, 6, 7), joystick_pins=(0, 1, 10, 2, 3, 8),
+                 buzzer_pin=9, act_max=20, gc_debug=False, rate_hz=200,
+                 joystick_filter=(20, 5), trace=None):
+        """
+        Parameters:
+            servo_pins: A, B, C, D servo pins (adjust according to actual wiring)
+            joystick_pins: xL, yL, zL, xR, yR, zR (adjust according to actual wiring)
+            buzzer_pin: Buzzer pin
+            act_max: Number of actions that can be recorded, 4 angles each
+            gc_debug: True = raise MemoryError if the control part of a tick allocates
+            rate_hz: Control loop rate, jog speeds do not depend on it up
+                     to a period of 5 ms, the fastest jog pace
+            joystick_filter: (samples, trim) ADC reads per axis and reads dropped at each end
+            trace: File on flash to record the inputs to, e.g. "trace.bin", for
+                   Host_Tools/trace_replay.py, None = no trace
+        """
+        self.servo_pins = servo_pins
+        self.joystick_pins = joystick_pins
+        self.joystick_filter = joystick_filter
+        
+        # Hardware is attached by begin(), so creating the app grabs no pins
+        self.arm = eArm()
+        self.events = EventQueue()
+        self.beeper = Beeper(buzzer_pin)
+        
+        # Recorded actions are replayed in the background by the main loop
+        self.player = Player(self.arm)
+        
+        # Collections and log writes run between ticks, never in the middle of a move
+        self.gc_policy = GcPolicy(debug=gc_debug)
+        self.loop = LoopRunner(1000000 // rate_hz, self.gc_policy, log)
+        
+        # Joystick profile, maps raw readings to signed speed levels
+        self.profile = JoystickProfile()
+        self.maps = None  # Lookup tables xL, yL, xR, yR, built by begin()
+        
+        # Raw joystick readings xL, yL, xR, yR of the current tick
+        self.raw = array('H', bytes(8))
+        
+        # Input trace, opened by begin()
+        self.trace_path = trace
+        self.trace = None
+        
+        # Joystick speed levels, -5..5 with 0 in the dead zone
+        self.xL = 0
+        self.yL = 0
+        self.xR = 0
+        self.yR = 0
+        
+        # Action recording array
+        self.act_max = act_max
+        self.act = array('h', bytes(8 * act_max))  # 4 angles per action, flat
+        self.act_speed = bytearray([100] * act_max)  # Per action speed factor, 100 = recorded pace
+        self.act_dwell = [300] * act_max  # Per action dwell (ms) after reaching the pose
+        self.play_speed = 100  # Speed factor of the whole sequence (percent)
+        self.play_fastest = False  # True = derive timing from JOINT_MAX_VEL / JOINT_MAX_ACC
+        self.smooth = False  # True = replay one blended spline without stopping at each action
+        self.smooth_tol = 2  # Degrees, closer actions count as duplicate / collinear
+        self.smooth_cache = None  # (path, path_speed, path_dwell), rebuilt after recording
+        self.num = 0  # Current action index
+        self.num_do = 0  # Number of recorded actions
+        self.t_claw = 0  # Timestamp for claw operation
+        self.r_long = False  # Right button long press seen, ignore its release
+        self.l_long = False  # Left button long press seen, ignore its release
+        self.fresh = False  # Next record starts a new sequence instead of appending
+        self.program = None  # Saved program the actions came from, gets the timing changes
+        
+        # Saved programs, only the index is read and only when first needed
+        self.library = ProgramLibrary()
+    
+    # Upper Arm
+    def turn_ua_ud(self):
+        """Up/Down control"""
+        if self.xL > 0:
+            self.arm.ua_down(UA_SPEED[self.xL])
+        elif self.xL < 0:
+            self.arm.ua_up(UA_SPEED[-self.xL])
+    
+    # Forearm
+    def turn_fa_ud(self):
+        """Up/Down control"""
+        if self.xR > 0:
+            self.arm.fa_down(FA_SPEED[self.xR])
+        elif self.xR < 0:
+            self.arm.fa_up(FA_SPEED[-self.xR])
+            
+    def turn_lr(self):
+        """Left/Right control"""
+        if self.yL > 0:
+            self.arm.left(LR_SPEED[self.yL])
+        elif self.yL < 0:
+            self.arm.right(LR_SPEED[-self.yL])
+    
+    def claw(self, now):
+        """Claw control"""
+        if self.yR:
+            if self.yR > 0:
+                self.arm.claw_open(CLAW_SPEED[self.yR])
+            else:
+                self.arm.claw_close(CLAW_SPEED[-self.yR])
+            self.t_claw = now
+    
+        # Prevent claw servo from overheating
+        if self.t_claw != 0 and time.ticks_diff(now, self.t_claw) > 40000:
+            self.arm.claw_release()
+    
+    def data_processing(self):
+        """Data processing, prioritize axis with larger deflection (in place, no tuples)"""
+        if abs(self.xL) > abs(self.yL):
+            self.yL = 0
+        else:
+            self.xL = 0
+        if abs(self.xR) > abs(self.yR):
+            self.yR = 0
+        else:
+            self.xR = 0
+    
+    def record_action(self):
+        """Record action"""
+        # After a replay or a program load, start a new sequence
+        if self.fresh:
+            self.fresh = False
+            self.num = 0
+            self.num_do = 0
+            self.program = None
+            for i in range(self.act_max):
+                self.act_speed[i] = 100
+                self.act_dwell[i] = 300
+    
+        # Memory already full, repeat the long beep and ignore the press
+        if self.num >= self.act_max:
+            self.beeper.beep(1000, 2000)
+            return
+    
+        self.beeper.beep(1000, 100)
+    
+        # Record current action straight into the preallocated buffer
+        self.arm.record_action(self.act, 4 * self.num)
+    
+        self.num += 1
+        self.num_do = self.num
+        self.smooth_cache = None
+    
+        # Check if maximum actions reached
+        if self.num >= self.act_max:
+            # Long beep to indicate full memory
+            self.beeper.beep(1000, 2000)
+    
+    def load_program(self, name):
+        """Load a saved program into the action arrays"""
+        loaded = self.library.load(name, self.act, self.act_speed, self.act_dwell)
+        if loaded is None:
+            return False
+        self.num_do, self.play_speed, flags = loaded
+        self.play_fastest = bool(flags & FLAG_FASTEST)
+        self.smooth = bool(flags & FLAG_SMOOTH)
+        self.program = name
+        self.num = self.num_do
+        self.smooth_cache = None
+        self.fresh = True
+        log.event(EV_PROGRAM_LOADED, name, self.num_do)
+        return True
+    
+    def save_program(self):
+        """Save the recorded actions as a new program"""
+        if self.num_do == 0:
+            self.beeper.beep(2000, 1000)
+            return
+        name = self.library.new_name()
+        self.library.save(name, self.act, self.num_do, self.act_speed, self.act_dwell,
+                          self.play_speed, self.play_flags())
+        self.program = name
+        self.fresh = True
+        log.event(EV_PROGRAM_SAVED, name)
+        self.beeper.beep(1500, 300)
+    
+    def play_flags(self):
+        """FLAG_FASTEST / FLAG_SMOOTH of the current settings"""
+        return (FLAG_FASTEST if self.play_fastest else 0) | (FLAG_SMOOTH if self.smooth else 0)
+    
+    def tune_playback(self):
+        """
+        Long left press during playback: while running, step the sequence
+        speed through PLAY_SPEEDS; while paused, step the mode through
+        paced, fastest, smooth and smooth fastest (smooth from the next
+        replay on). The change is stored with the loaded or saved program.
+        """
+        if self.player.state == PLAY_RUN:
+            speeds = PLAY_SPEEDS
+            i = speeds.index(self.play_speed) + 1 if self.play_speed in speeds else 0
+            self.play_speed = speeds[i % len(speeds)]
+            self.player.seq_speed = self.play_speed
+            self.beeper.beep(1500, 100)
+        else:
+            flags = (self.play_flags() + 1) & (FLAG_FASTEST | FLAG_SMOOTH)
+            self.play_fastest = bool(flags & FLAG_FASTEST)
+            self.smooth = bool(flags & FLAG_SMOOTH)
+            self.player.set_fastest(self.play_fastest)
+            self.beeper.beep(1000 + 250 * flags, 100)
+        if self.program is not None:
+            self.library.tune(self.program, self.play_speed, self.play_flags())
+        log.event(EV_PLAYBACK_TUNED, self.play_speed, self.play_flags())
+    
+    def select_next_program(self):
+        """Load the next saved program"""
+        name = self.library.next_name(self.library.selected)
+        if name is None or not self.load_program(name):
+            self.beeper.beep(2000, 1000)
+            return
+        self.beeper.beep(1500, 100)
+    
+    def execute_action(self):
+        """Start replaying the recorded actions"""
+        # Nothing recorded yet, fall back to the last selected program
+        if self.num_do == 0 and self.library.count() and self.library.selected:
+            self.load_program(self.library.selected)
+    
+        self.fresh = True
+        self.player.set_fastest(self.play_fastest)
+        if self.smooth and self.num_do:
+            # Preprocess once, replays reuse the blended path until the next record
+            if self.smooth_cache is None:
+                self.smooth_cache = smooth_path(self.act, self.num_do, self.act_speed,
+                                                self.act_dwell, self.smooth_tol)
+            path, path_speed, path_dwell = self.smooth_cache
+            started = self.player.play(path, len(path_speed), self.play_speed, path_speed, path_dwell)
+        else:
+            started = self.player.play(self.act, self.num_do, self.play_speed, self.act_speed, self.act_dwell)
+    
+        # If no actions are recorded, return.
+        if not started:
+            log.event(EV_NO_ACTIONS)
+            # exit beep and return
+            self.beeper.beep(2000, 1000)
+            return
+        self.beeper.beep(2000, 100)
+    
+    def joystick_moving(self):
+        """True when any joystick axis is outside its dead zone"""
+        return self.xL != 0 or self.yL != 0 or self.xR != 0 or self.yR != 0
+    
+    def handle_events(self):
+        """Drain the button event queue"""
+        event = self.events.get()
+        while event:
+            if self.trace is not None:
+                self.trace.button(event)
+            if event == BTN_L | EV_RELEASE:
+                if self.l_long:
+                    self.l_long = False
+                elif self.player.active():
+                    # During playback the left button single-steps
+                    self.player.step_once()
+                else:
+                    self.record_action()
+            elif event == BTN_L | EV_LONG:
+                if self.player.active():
+                    self.tune_playback()
+                else:
+                    self.save_program()
+                self.l_long = True
+            elif event == BTN_R | EV_LONG:
+                if self.player.active():
+                    # Long press - exit beep and stop playback
+                    self.player.stop()
+                    self.beeper.beep(2000, 1000)
+                else:
+                    self.select_next_program()
+                self.r_long = True
+            elif event == BTN_R | EV_RELEASE:
+                # Act on release so the press that ends a replay is not reused
+                if self.r_long:
+                    self.r_long = False
+                elif self.player.state == PLAY_RUN:
+                    self.player.pause()
+                elif self.player.state == PLAY_PAUSE:
+                    self.player.resume()
+                else:
+                    self.execute_action()
+            event = self.events.get()
+
+    def begin(self):
+        """Attach servos, joysticks and buttons"""
+        # Initialize mechanical arm
+        self.arm.servo_attach(*self.servo_pins)
+        self.arm.joy_stick_attach(*(tuple(self.joystick_pins) + tuple(self.joystick_filter)))
+        
+        # Button events are posted from interrupts and drained by the main loop
+        self.arm.button_attach(self.events)
+        
+        # Left button held at start-up runs the calibration
+        self.profile.load()
+        if self.arm.JoyStickL.read_z() == 0:
+            self.calibrate()
+        self.maps = self.profile.tables()
+        if self.trace_path is not None:
+            # From here on the control path reads one time per tick
+            self.trace = TraceRecorder(self.trace_path, SRC_JOYSTICK, self.arm.servo_current_angle,
+                                       profile_values(self.profile))
+            self.trace.install(JOYSTICK_MODULES)
+        self.gc_policy.begin()
+    
+    def calibrate(self):
+        """Measure the joystick centres and ranges and save the profile"""
+        print("Calibration: leave both joysticks centred")
+        self.beeper.beep(1000, 500)
+        while self.beeper.active:
+            self.beeper.update()
+        # Wait for the button that started the calibration to be released
+        while self.arm.JoyStickL.read_z() == 0:
+            time.sleep_ms(10)
+        time.sleep_ms(500)
+        self.events.clear()
+        print("Calibration: after the beep, move both joysticks around their full range")
+        self.profile.calibrate(self.arm.JoyStickL, self.arm.JoyStickR, self.beeper)
+        self.profile.save()
+        self.maps = self.profile.tables()
+        print("Calibration saved:", self.profile.axes)
+    
+    def control(self):
+        """
+        Joystick moves and playback, allocates nothing
+        
+        Only small ints, preallocated arrays and existing attributes are
+        used here, so it runs under micropython.heap_lock() in debug mode.
+        """
+        now = time.ticks_ms()
+        
+        # Read joystick values, straight through the calibration tables
+        maps = self.maps
+        raw = self.raw
+        raw[0] = self.arm.JoyStickL.read_x()
+        raw[1] = self.arm.JoyStickL.read_y()
+        raw[2] = self.arm.JoyStickR.read_x()
+        raw[3] = self.arm.JoyStickR.read_y()
+        self.xL = maps[0][raw[0] >> TABLE_SHIFT]
+        self.yL = maps[1][raw[1] >> TABLE_SHIFT]
+        self.xR = maps[2][raw[2] >> TABLE_SHIFT]
+        self.yR = maps[3][raw[3] >> TABLE_SHIFT]
+        
+        # Data processing
+        self.data_processing()
+        
+        # Execute controls
+        self.turn_lr()
+        self.turn_ua_ud()
+        self.turn_fa_ud()
+        self.claw(now)
+        
+        # Action execution
+        self.player.set_override(self.joystick_moving())
+        self.player.step()
+        self.beeper.update()
+    
+    def tick(self):
+        """One pass of the control loop"""
+        trace = self.trace
+        if trace is not None:
+            trace.latch()
+        # Button actions may log, write flash or build paths, they stay
+        # outside the audited part
+        self.handle_events()
+        
+        self.gc_policy.lock()
+        try:
+            self.control()
+        finally:
+            self.gc_policy.unlock()
+        if trace is not None:
+            trace.tick(self.raw, self.arm.servo_current_angle)
+            if trace.pending():
+                trace.flush()
+    
+    def run(self):
+        """Main loop"""
+        self.begin()
+        
+        print("Mechanical Arm Control System Started")
+        print("Use joysticks to control the arm")
+        print("Left joystick button: Record action (hold 2 s to save as a program)")
+        print("Right joystick button: Play / pause recorded actions (hold 2 s to stop)")
+        print("Right joystick button held while stopped: Load next saved program")
+        print("Left joystick button while playing: Single step")
+        print("Left joystick button held while playing: Next speed, while paused: next mode")
+        
+        while True:
+            try:
+                # Fixed rate, the idle part of each period is used for GC
+                self.loop.run(self.tick)
+                
+            except KeyboardInterrupt:
+                print("\nProgram stopped")
+                print(self.loop.report())
+                print(self.gc_policy.report())
+                log.drain()
+                print(log.report())
+                if self.trace is not None:
+                    self.trace.flush()
+                    print(self.trace.report())
+                break
+            except Exception as e:
+                if self.gc_policy.debug:
+                    # An allocation inside control() is a bug, do not hide it
+                    raise
+                log.event(EV_LOOP_ERROR, e)
+                time.sleep_ms(100)
@@ -0,0 +1,255 @@
+"""
+eArm event log
+Levelled, rate limited events for the control loops and servers
+
+print() on the USB REPL blocks for milliseconds, and much longer when
+no host reads the port. Events are instead stored as a code and up to
+two arguments in a preallocated ring, which allocates nothing, and are
+formatted and written by flush() from the application's idle time, to
+the console or to a file on flash.
+
+Every event code has a level, a preformatted message and a repeat
+time: the same code is recorded at most once per repeat time, the
+events in between are counted and reported with its next record. For
+state changes (a button pressed, then released) the limit only applies
+to repeats of the same arguments, so no edge is lost.
+Applications add their own codes with define().
+
+    from earm.log import log, EV_LOOP_ERROR
+    log.event(EV_LOOP_ERROR, e)  # control loop, no formatting, no I/O
+    log.flush()                  # idle time, writes a few lines
+"""
+
+from array import array
+import os
+import sys
+import time
+
+# Levels
+DEBUG = 0
+INFO = 1
+WARN = 2
+ERROR = 3
+LEVEL_NAMES = "DIWE"
+
+MAX_CODES = 48
+
+# A console write slower than this means nobody reads the port, the log
+# then holds back for HOLD_MS instead of stalling every idle slot
+SLOW_US = 5000
+HOLD_MS = 2000
+
+# Event code table, filled by define()
+_formats = []
+_nargs = bytearray(MAX_CODES)
+_levels = bytearray(MAX_CODES)
+_repeat = array('H', bytes(2 * MAX_CODES))
+_edge = bytearray(MAX_CODES)
+
+
+def define(level, fmt, repeat_ms=1000, edge=False):
+    """
+    Add an event code, returns it
+
+    Parameters:
+        level: DEBUG, INFO, WARN or ERROR
+        fmt: Message, with a %s or %d for each of the event's arguments
+        repeat_ms: Shortest time between two records of the code
+        edge: State change, only a repeat of the last record's
+              arguments is rate limited
+    """
+    code = len(_formats)
+    if code == MAX_CODES:
+        raise ValueError("too many event codes")
+    _formats.append(fmt)
+    _nargs[code] = fmt.count("%") - 2 * fmt.count("%%")
+    _levels[code] = level
+    _repeat[code] = repeat_ms
+    _edge[code] = edge
+    return code
+
+
+EV_TEXT = define(INFO, "%s", 0)
+EV_LOOP_ERROR = define(ERROR, "control loop error: %s")
+EV_SERVER_ERROR = define(ERROR, "server error: %s")
+EV_NO_ACTIONS = define(WARN, "no actions recorded")
+EV_PROGRAM_LOADED = define(INFO, "program %s (%d actions)", 0)
+EV_PROGRAM_SAVED = define(INFO, "saved program %s", 0)
+EV_PLAYBACK_TUNED = define(INFO, "playback speed %d%%, mode %d", 0)
+EV_BUTTON = define(INFO, "button %s = %s", 100, edge=True)
+EV_BUZZER = define(INFO, "buzzer %s", 100, edge=True)
+
+
+class EventLog:
+    """Ring of events, written out from idle time"""
+    def __init__(self, size=32, level=INFO):
+        """
+        Parameters:
+            size: Events kept until flush(), the oldest are overwritten
+            level: Events below this level are dropped at once
+        """
+        self.size = size
+        self.level = level
+        self.t = array('l', [0] * size)  # ticks_ms
+        self.codes = bytearray(size)
+        self.repeats = array('H', bytes(2 * size))  # Suppressed before each record
+        self.args = [None] * (2 * size)
+        self.head = 0  # Next record to write
+        self.count = 0
+        # Per code rate limit
+        self.last_t = array('l', [0] * MAX_CODES)
+        self.seen = bytearray(MAX_CODES)
+        self.pending = array('H', bytes(2 * MAX_CODES))
+        self.last_args = [None] * (2 * MAX_CODES)  # Of the last record, for edge codes
+        self.path = None
+        self.max_bytes = 0
+        self.file_size = -1
+        self.hold_t = 0
+        self.holding = False
+        # Statistics
+        self.events = 0
+        self.suppressed = 0
+        self.overwritten = 0
+        self.lost = 0  # Overwritten since the last flush
+        self.slow = 0
+
+    def set_output(self, path=None, max_bytes=16384):
+        """
+        Write to a file on flash instead of the console, None = console
+
+        The file is renamed to path + ".1" once it reaches max_bytes.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.file_size = -1
+
+    def event(self, code, a=None, b=None):
+        """Record an event, True unless it was filtered or rate limited"""
+        if _levels[code] < self.level:
+            return False
+        now = time.ticks_ms()
+        last = self.last_args
+        if (self.seen[code] and time.ticks_diff(now, self.last_t[code]) < _repeat[code]
+                and not (_edge[code] and (a != last[2 * code] or b != last[2 * code + 1]))):
+            if self.pending[code] < 65535:
+                self.pending[code] += 1
+            self.suppressed += 1
+            return False
+        self.seen[code] = 1
+        self.last_t[code] = now
+        if _edge[code]:
+            last[2 * code] = a
+            last[2 * code + 1] = b
+        i = self.head
+        self.t[i] = now
+        self.codes[i] = code
+        self.repeats[i] = self.pending[code]
+        self.pending[code] = 0
+        self.args[2 * i] = a
+        self.args[2 * i + 1] = b
+        self.head = i + 1 if i + 1 < self.size else 0
+        if self.count < self.size:
+            self.count += 1
+        else:
+            self.overwritten += 1
+            self.lost += 1
+        self.events += 1
+        return True
+
+    def text(self, message):
+        """Record a ready-made message, for code that is not time critical"""
+        return self.event(EV_TEXT, message)
+
+    def format(self, i):
+        """Text line of record i"""
+        code = self.codes[i]
+        n = _nargs[code]
+        args = self.args
+        if n == 0:
+            msg = _formats[code]
+        elif n == 1:
+            msg = _formats[code] % (args[2 * i],)
+        else:
+            msg = _formats[code] % (args[2 * i], args[2 * i + 1])
+        line = "%d %s %s" % (self.t[i], LEVEL_NAMES[_levels[code]], msg)
+        if self.repeats[i]:
+            line += " (+%d repeats)" % self.repeats[i]
+        return line + "\n"
+
+    def flush(self, lines=4):
+        """
+        Write up to lines records, from idle time; returns the records written
+
+        Holds back for HOLD_MS after a write slower than SLOW_US.
+        """
+        if self.count == 0:
+            return 0
+        if self.holding:
+            if time.ticks_diff(time.ticks_ms(), self.hold_t) < 0:
+                return 0
+            self.holding = False
+        f = None
+        if self.path is None:
+            out = sys.stdout
+        else:
+            out = f = self._open()
+        n = 0
+        try:
+            if self.lost:
+                out.write("%d events overwritten\n" % self.lost)
+                self.lost = 0
+            while self.count and n < lines:
+                i = self.head - self.count
+                if i < 0:
+                    i += self.size
+                line = self.format(i)
+                # Taken off the ring first, a failing write is not retried
+                self.count -= 1
+                self.args[2 * i] = None
+                self.args[2 * i + 1] = None
+                t0 = time.ticks_us()
+                out.write(line)
+                n += 1
+                if f is not None:
+                    self.file_size += len(line)
+                elif time.ticks_diff(time.ticks_us(), t0) > SLOW_US:
+                    self.slow += 1
+                    self.holding = True
+                    self.hold_t = time.ticks_add(time.ticks_ms(), HOLD_MS)
+                    break
+        finally:
+            if f is not None:
+                f.close()
+        return n
+
+    def _open(self):
+        """Open the log file for appending, rotated once it is full"""
+        if self.file_size < 0:
+            try:
+                self.file_size = os.stat(self.path)[6]
+            except OSError:
+                self.file_size = 0
+        if self.file_size >= self.max_bytes:
+            try:
+                os.remove(self.path + ".1")
+            except OSError:
+                pass
+            os.rename(self.path, self.path + ".1")
+            self.file_size = 0
+        return open(self.path, "a")
+
+    def drain(self):
+        """Write everything, e.g. before a reset; ignores the hold"""
+        while self.count:
+            self.holding = False
+            if not self.flush(self.size):
+                break
+
+    def report(self):
+        """Summary line for the console"""
+        return "Log: %d events, %d rate limited, %d overwritten, %d slow writes" % (
+            self.events, self.suppressed, self.overwritten, self.slow)
+
+
+# The board's log, shared by all modules
+log = EventLog()
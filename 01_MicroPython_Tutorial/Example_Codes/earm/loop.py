@@ -0,0 +1,107 @@
+"""
+eArm fixed-rate loop
+Calls a tick function every period_us with absolute deadlines, so the
+rate does not drift, and keeps overrun and lateness statistics. Idle
+time writes out the event log and then goes to the GC policy.
+"""
+
+import time
+
+
+class LoopRunner:
+    """Run tick() at a fixed rate, idle time goes to the GC policy"""
+    def __init__(self, period_us=5000, gc_policy=None, log=None):
+        """
+        Parameters:
+            period_us: Loop period in microseconds, 5000 = 200 Hz
+            gc_policy: GcPolicy that spends the idle time, or None to sleep
+            log: EventLog written one line per idle slot, None = not flushed
+        """
+        self.period_us = period_us
+        self.gc_policy = gc_policy
+        self.log = log
+        self.deadline = 0  # ticks_us at which the current period ends
+        self.running = False
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clear the statistics"""
+        self.ticks = 0
+        self.overruns = 0  # Ticks that ended after their deadline
+        self.skipped = 0  # Whole periods dropped to resynchronise
+        self.max_late_us = 0  # Worst time past a deadline
+        self.max_busy_us = 0  # Longest tick
+        self.avg_busy_us = 0  # Moving average of the tick time (1/16 weight)
+
+    def set_rate(self, hz):
+        """Change the loop rate"""
+        self.period_us = 1000000 // hz
+
+    def stats(self):
+        """Statistics dict, load and headroom in percent of the period"""
+        avg = self.avg_busy_us
+        return {
+            "period_us": self.period_us,
+            "ticks": self.ticks,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "max_late_us": self.max_late_us,
+            "max_busy_us": self.max_busy_us,
+            "avg_busy_us": avg,
+            "load": avg * 100 // self.period_us,
+            "headroom": 100 - self.max_busy_us * 100 // self.period_us,
+        }
+
+    def report(self):
+        """Summary line for the console"""
+        st = self.stats()
+        return ("Loop: %d Hz, %d ticks, %d overruns, %d skipped, max late %d us, "
+                "busy avg %d / max %d us, headroom %d%%") % (
+            1000000 // st["period_us"], st["ticks"], st["overruns"], st["skipped"],
+            st["max_late_us"], st["avg_busy_us"], st["max_busy_us"], st["headroom"])
+
+    def run_once(self, tick):
+        """Run one tick and wait for the end of its period"""
+        if self.ticks == 0:
+            self.deadline = time.ticks_add(time.ticks_us(), self.period_us)
+        t0 = time.ticks_us()
+        tick()
+        now = time.ticks_us()
+        busy = time.ticks_diff(now, t0)
+        self.ticks += 1
+        # Moving average, a running sum would grow into a heap allocated int
+        self.avg_busy_us += (busy - self.avg_busy_us) // 16
+        if busy > self.max_busy_us:
+            self.max_busy_us = busy
+
+        slack = time.ticks_diff(self.deadline, now)
+        if slack < 0:
+            self.overruns += 1
+            if -slack > self.max_late_us:
+                self.max_late_us = -slack
+            if -slack >= self.period_us:
+                # More than a period behind, drop the missed periods
+                # instead of running a burst of back to back ticks
+                self.skipped += -slack // self.period_us
+                self.deadline = now
+        else:
+            if self.log is not None and self.log.count:
+                self.log.flush(1)
+                slack = time.ticks_diff(self.deadline, time.ticks_us())
+            if slack <= 0:
+                pass
+            elif self.gc_policy is not None:
+                self.gc_policy.idle(slack)
+            else:
+                time.sleep_us(slack)
+        # The next deadline follows the previous one, not the wake-up time
+        self.deadline = time.ticks_add(self.deadline, self.period_us)
+
+    def run(self, tick):
+        """Call tick() every period until stop() or an exception"""
+        self.running = True
+        while self.running:
+            self.run_once(tick)
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,207 @@
+"""
+eArm motion scripts
+A small text language for arm routines, compiled to compact bytecode
+
+    # Pick up a part and put it down twice
+    speed 60
+    movej 90 120 60 _      # _ keeps a joint where it is
+    grip open
+    loop 2
+        movel 60 100 80 _
+        grip close
+        wait 300
+        movej 120 120 60 _
+        grip open
+        beep 100
+    end
+
+Statements, one per line, # starts a comment:
+
+    move A B C D    every joint at its own top speed, they arrive one by one
+    movej A B C D   all joints start and arrive together, trapezoid profile
+    movel A B C D   all joints together at constant speed, no ramps, for
+                    chaining short segments (a straight line in joint space)
+    grip open | close | ANGLE   move the claw (joint D)
+    wait MS
+    beep MS [HZ]
+    speed PERCENT   1-200 % of the joint limits for the following moves
+    set-speed       same as speed
+    loop [N]        repeat the block up to "end" N times, forever without N
+
+The compiler runs on the board or on the PC (Host_Tools/ems_compile.py);
+earm.script_vm executes the bytecode one control tick at a time. A
+routine costs a few bytes per statement instead of a list of tuples.
+"""
+
+MAGIC = b"EMS"
+VERSION = 1
+HEADER_SIZE = 4
+
+# Opcodes and their operands
+OP_END = 0
+OP_SPEED = 1  # percent u8
+OP_MOVE = 2  # joint mask u8, one angle u8 per set bit (A = bit 0)
+OP_MOVEJ = 3  # same operands as OP_MOVE
+OP_MOVEL = 4  # same operands as OP_MOVE
+OP_WAIT = 5  # ms u16
+OP_GRIP = 6  # claw angle u8
+OP_LOOP = 7  # count u16, 0 = forever
+OP_NEXT = 8  # end of the innermost loop
+OP_BEEP = 9  # ms u16, Hz u16 (0 = default tone)
+
+MAX_DEPTH = 4  # Nested loops
+GRIP_OPEN = 150
+GRIP_CLOSE = 90
+
+_MOVES = {"move": OP_MOVE, "movej": OP_MOVEJ, "movel": OP_MOVEL}
+_NAMES = {OP_END: "end", OP_SPEED: "speed", OP_MOVE: "move", OP_MOVEJ: "movej",
+          OP_MOVEL: "movel", OP_WAIT: "wait", OP_GRIP: "grip", OP_LOOP: "loop",
+          OP_NEXT: "next", OP_BEEP: "beep"}
+
+
+class ScriptError(ValueError):
+    """A script line that does not compile"""
+
+
+def _int(text, lo, hi, line):
+    try:
+        value = int(text)
+    except ValueError:
+        raise ScriptError("line %d: %s is not a number" % (line, text))
+    if not lo <= value <= hi:
+        raise ScriptError("line %d: %d is outside %d-%d" % (line, value, lo, hi))
+    return value
+
+
+def _u16(out, value):
+    out.append(value & 0xFF)
+    out.append(value >> 8)
+
+
+def compile_script(text):
+    """Bytecode of a script, raises ScriptError with the line number"""
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    depth = 0
+    n = 0
+    for raw in text.split("\n"):
+        n += 1
+        words = raw.split("#", 1)[0].replace(",", " ").split()
+        if not words:
+            continue
+        cmd = words[0].lower()
+        args = words[1:]
+        if cmd in _MOVES:
+            if len(args) != 4:
+                raise ScriptError("line %d: %s needs 4 angles (A B C D, _ to keep)" % (n, cmd))
+            mask = 0
+            angles = bytearray()
+            for i in range(4):
+                if args[i] != "_":
+                    mask |= 1 << i
+                    angles.append(_int(args[i], 0, 180, n))
+            out.append(_MOVES[cmd])
+            out.append(mask)
+            out += angles
+        elif cmd == "grip":
+            if len(args) != 1:
+                raise ScriptError("line %d: grip open, close or an angle" % n)
+            word = args[0].lower()
+            out.append(OP_GRIP)
+            out.append(GRIP_OPEN if word == "open" else GRIP_CLOSE if word == "close"
+                       else _int(word, 0, 180, n))
+        elif cmd == "wait":
+            if len(args) != 1:
+                raise ScriptError("line %d: wait MS" % n)
+            ms = _int(args[0], 0, 3600000, n)
+            # Longer waits become several instructions
+            while True:
+                out.append(OP_WAIT)
+                _u16(out, min(ms, 65535))
+                ms -= min(ms, 65535)
+                if ms == 0:
+                    break
+        elif cmd == "beep":
+            if not 1 <= len(args) <= 2:
+                raise ScriptError("line %d: beep MS [HZ]" % n)
+            out.append(OP_BEEP)
+            _u16(out, _int(args[0], 1, 10000, n))
+            _u16(out, _int(args[1], 20, 20000, n) if len(args) > 1 else 0)
+        elif cmd in ("speed", "set-speed"):
+            if len(args) != 1:
+                raise ScriptError("line %d: speed PERCENT" % n)
+            out.append(OP_SPEED)
+            out.append(_int(args[0].rstrip("%"), 1, 200, n))
+        elif cmd == "loop":
+            if len(args) > 1:
+                raise ScriptError("line %d: loop [COUNT]" % n)
+            depth += 1
+            if depth > MAX_DEPTH:
+                raise ScriptError("line %d: more than %d nested loops" % (n, MAX_DEPTH))
+            out.append(OP_LOOP)
+            _u16(out, _int(args[0], 1, 65535, n) if args else 0)
+        elif cmd == "end":
+            if depth == 0:
+                raise ScriptError("line %d: end without loop" % n)
+            depth -= 1
+            out.append(OP_NEXT)
+        else:
+            raise ScriptError("line %d: unknown command %s" % (n, cmd))
+    if depth:
+        raise ScriptError("line %d: loop without end" % n)
+    out.append(OP_END)
+    return bytes(out)
+
+
+def check_header(code, length=None):
+    """True if code starts with a bytecode header this version runs"""
+    length = len(code) if length is None else length
+    return (length > HEADER_SIZE and code[0] == MAGIC[0] and code[1] == MAGIC[1]
+            and code[2] == MAGIC[2] and code[3] == VERSION)
+
+
+def disassemble(code):
+    """Readable listing of bytecode, one (offset, text) per instruction"""
+    if not check_header(code):
+        raise ScriptError("not motion script bytecode")
+    pc = HEADER_SIZE
+    listing = []
+    while pc < len(code):
+        op = code[pc]
+        start = pc
+        pc += 1
+        if op in (OP_MOVE, OP_MOVEJ, OP_MOVEL):
+            mask = code[pc]
+            pc += 1
+            args = []
+            for i in range(4):
+                if mask & (1 << i):
+                    args.append(str(code[pc]))
+                    pc += 1
+                else:
+                    args.append("_")
+            text = " ".join(args)
+        elif op in (OP_SPEED, OP_GRIP):
+            text = str(code[pc])
+            pc += 1
+        elif op in (OP_WAIT, OP_LOOP):
+            text = str(code[pc] | code[pc + 1] << 8)
+            pc += 2
+        elif op == OP_BEEP:
+            text = "%d %d" % (code[pc] | code[pc + 1] << 8, code[pc + 2] | code[pc + 3] << 8)
+            pc += 4
+        else:
+            text = ""
+        listing.append((start, (_NAMES.get(op, "?%d" % op) + " " + text).strip()))
+        if op == OP_END:
+            break
+    return listing
+
+
+def load_script(path):
+    """Bytecode from a file on flash, either compiled (.ems) or script text"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if check_header(data):
+        return data
+    return compile_script(data.decode())
@@ -0,0 +1,111 @@
+"""
+eArm path preprocessing
+Redundant action removal and Catmull-Rom blending of recordings
+"""
+
+from array import array
+
+
+def _pose_dist(a, b):
+    """Largest joint difference between two poses"""
+    d = 0
+    for i in range(4):
+        d = max(d, abs(a[i] - b[i]))
+    return d
+
+
+def _off_line(a, b, c):
+    """Largest joint distance of pose b from the straight move a -> c"""
+    den = 0
+    dot = 0
+    for i in range(4):
+        den += (c[i] - a[i]) * (c[i] - a[i])
+        dot += (b[i] - a[i]) * (c[i] - a[i])
+    if den == 0:
+        return _pose_dist(a, b)
+    t = dot / den
+    if t <= 0 or t >= 1:
+        return 180  # b is not between a and c
+    d = 0
+    for i in range(4):
+        d = max(d, abs(a[i] + t * (c[i] - a[i]) - b[i]))
+    return d
+
+
+def _pose(poses, k):
+    """Action k of a flat buffer (4 angles per action)"""
+    return poses[4 * k:4 * k + 4]
+
+
+def simplify_path(poses, count, tol):
+    """Indices of the actions left after dropping duplicate and collinear ones"""
+    poses = [_pose(poses, k) for k in range(count)]
+    keep = []
+    for k in range(count):
+        if not keep or _pose_dist(poses[keep[-1]], poses[k]) > tol:
+            keep.append(k)
+    # Playback loops, so a last action equal to the first is redundant
+    if len(keep) > 1 and _pose_dist(poses[keep[-1]], poses[keep[0]]) <= tol:
+        keep.pop()
+    
+    k = 1
+    while k < len(keep) - 1:
+        if _off_line(poses[keep[k - 1]], poses[keep[k]], poses[keep[k + 1]]) <= tol:
+            del keep[k]
+        else:
+            k += 1
+    return keep
+
+
+def smooth_path(poses, count, speeds, dwells, tol=2, step=4):
+    """
+    Blend recorded actions into one closed Catmull-Rom spline
+    
+    Parameters:
+        poses: Recorded actions, flat buffer with 4 angles per action
+        count: Number of recorded actions
+        speeds: Per action speed factors (percent)
+        dwells: Per action dwell times (ms), kept at the sample of each
+                kept action, the samples in between have none
+        tol: Degrees within which actions count as duplicate / collinear
+        step: Approximate degrees between spline samples
+    Returns:
+        (path, path_speed, path_dwell) - flat bytearray of sampled poses
+        (4 bytes each), their speed factors and dwell times
+    """
+    keep = simplify_path(poses, count, tol)
+    n = len(keep)
+    if n < 3:
+        # Nothing to blend, the arm turns back at every action, so each
+        # one is a stop: at least 1 ms keeps the accelerated profile there
+        path = bytearray()
+        for k in keep:
+            for i in range(4):
+                path.append(poses[4 * k + i])
+        return (path, bytearray(speeds[k] for k in keep),
+                array('H', [max(1, dwells[k]) for k in keep]))
+    
+    path = bytearray()
+    path_speed = bytearray()
+    path_dwell = array('H')
+    pose = bytearray(4)
+    for k in range(n):
+        p0 = _pose(poses, keep[(k - 1) % n])
+        p1 = _pose(poses, keep[k])
+        p2 = _pose(poses, keep[(k + 1) % n])
+        p3 = _pose(poses, keep[(k + 2) % n])
+        samples = max(1, _pose_dist(p1, p2) // step)
+        for j in range(samples):
+            t = j / samples
+            t2 = t * t
+            t3 = t2 * t
+            for i in range(4):
+                v = 0.5 * (2 * p1[i] + (p2[i] - p0[i]) * t
+                           + (2 * p0[i] - 5 * p1[i] + 4 * p2[i] - p3[i]) * t2
+                           + (3 * p1[i] - p0[i] - 3 * p2[i] + p3[i]) * t3)
+                pose[i] = max(0, min(180, int(v + 0.5)))
+            path.extend(pose)
+            path_speed.append(speeds[keep[(k + 1) % n]])
+            # The first sample of each span is the kept action itself
+            path_dwell.append(dwells[keep[k]] if j == 0 else 0)
+    return path, path_speed, path_dwell
@@ -0,0 +1,244 @@
+"""
+eArm action playback
+Resumable replay of recorded actions, advanced one tick per step()
+"""
+
+from array import array
+import time
+
+# Playback states
+PLAY_IDLE = 0
+PLAY_RUN = 1
+PLAY_PAUSE = 2
+
+# Joint limits (A, B, C, D) for the fastest safe playback mode
+JOINT_MAX_VEL = (120, 90, 90, 180)  # deg/s
+JOINT_MAX_ACC = (400, 250, 250, 600)  # deg/s^2
+
+
+def isqrt(n):
+    """Integer square root by Newton iteration, no floats"""
+    if n <= 0:
+        return 0
+    x = n
+    y = (x + 1) // 2
+    while y < x:
+        x = y
+        y = (x + n // x) // 2
+    return x
+
+
+def trapezoid_time(dist, out):
+    """
+    Shortest move time within the joint limits
+    
+    Every joint follows the same trapezoid velocity profile, so they all
+    start and arrive together. dist holds the joint distances, their
+    sign is ignored. Writes the time in ms to out[0] and the
+    acceleration phase in permille of that time to out[1], nothing is
+    allocated.
+    """
+    best_t = 0
+    best_f = 500
+    for f in range(100, 600, 100):
+        t = 0
+        for i in range(4):
+            d = abs(dist[i])
+            if d:
+                t_vel = d * 1000000 // (JOINT_MAX_VEL[i] * (1000 - f))
+                # t_acc^2 in ms^2, split so every term stays a small int
+                den = JOINT_MAX_ACC[i] * f * (1000 - f) // 1000
+                q = d * 1000000
+                t_acc = isqrt(q // den * 1000 + q % den * 1000 // den)
+                t = max(t, t_vel, t_acc)
+        if best_t == 0 or t < best_t:
+            best_t = t
+            best_f = f
+    out[0] = best_t
+    out[1] = best_f
+
+
+class Player:
+    """Resumable playback of recorded actions, advanced by step() each loop"""
+    def __init__(self, arm):
+        self.arm = arm
+        self.poses = None
+        self.count = 0
+        self.index = 0  # Action currently being approached
+        self.state = PLAY_IDLE
+        self.ms_per_deg = 15  # Same pace as execution_action(act[i], 15)
+        self.dwell_ms = 300  # Pause after each action, was speed * 20
+        self.speed = 100  # Live speed scale in percent
+        self.fastest = False  # Derive timing from JOINT_MAX_VEL / JOINT_MAX_ACC
+        self.seq_speed = 100  # Speed factor of the whole sequence
+        self.seg_speed = None  # Optional per action speed factors (percent)
+        self.seg_dwell = None  # Optional per action dwell times (ms)
+        self.single_step = False
+        self.override = False
+        self.start = array('h', (0, 0, 0, 0))
+        self.target = array('h', (0, 0, 0, 0))
+        self.dist = array('h', (0, 0, 0, 0))
+        self.seg_len = 0  # Segment length in ms * percent
+        self.seg_pos = 0  # Progress in ms * percent
+        self.seg_scale = 100  # Sequence and segment factor for this segment
+        self.accel = 0  # Acceleration phase in permille, 0 = constant speed
+        self.timing = array('l', [0, 0])  # trapezoid_time() result
+        self.dwell = 0  # Remaining dwell in ms * percent
+        self.rolling = False  # Next segment starts moving, through a pass-through point
+        self.last_t = 0
+    
+    def play(self, poses, count, speed=100, seg_speed=None, seg_dwell=None):
+        """
+        Start looping over the first count poses
+        
+        Parameters:
+            poses: Flat buffer with 4 angles per action
+            speed: Speed factor of the whole sequence in percent
+            seg_speed: Per action speed factors in percent, or None
+            seg_dwell: Per action dwell in ms, or None for dwell_ms
+        """
+        if count == 0:
+            return False
+        self.poses = poses
+        self.count = count
+        self.seq_speed = speed
+        self.seg_speed = seg_speed
+        self.seg_dwell = seg_dwell
+        self.index = 0
+        self.single_step = False
+        self.state = PLAY_RUN
+        self._begin_segment()
+        return True
+    
+    def stop(self):
+        self.state = PLAY_IDLE
+    
+    def pause(self):
+        if self.state == PLAY_RUN:
+            self.state = PLAY_PAUSE
+    
+    def resume(self):
+        if self.state == PLAY_PAUSE:
+            self.single_step = False
+            self.state = PLAY_RUN
+            self.last_t = time.ticks_ms()
+    
+    def step_once(self):
+        """Run to the next action, then pause again"""
+        if self.state != PLAY_IDLE:
+            self.single_step = True
+            self.state = PLAY_RUN
+            self.last_t = time.ticks_ms()
+    
+    def set_speed(self, percent):
+        """Scale playback speed, 100 = recorded pace"""
+        self.speed = max(10, min(400, percent))
+    
+    def set_fastest(self, enable):
+        """Run each segment as fast as the joint limits allow"""
+        self.fastest = enable
+        if self.state != PLAY_IDLE and self.dwell <= 0:
+            self._begin_segment()
+    
+    def set_override(self, active):
+        """Hold playback while the joysticks move the arm"""
+        if self.override and not active:
+            # Re-plan from wherever the user left the arm
+            self._begin_segment()
+        self.override = active
+    
+    def active(self):
+        return self.state != PLAY_IDLE
+    
+    def _begin_segment(self):
+        target = self.target
+        current = self.arm.servo_current_angle
+        base = 4 * self.index
+        longest = 0
+        for i in range(4):
+            target[i] = self.poses[base + i]
+            self.start[i] = current[i]
+            self.dist[i] = abs(target[i] - current[i])
+            longest = max(longest, self.dist[i])
+        
+        rolling = self.rolling
+        self.rolling = False
+        self.seg_scale = self.seq_speed
+        if self.seg_speed is not None:
+            self.seg_scale = self.seg_scale * self.seg_speed[self.index] // 100
+        
+        dwell_ms = self.dwell_ms if self.seg_dwell is None else self.seg_dwell[self.index]
+        if self.fastest and dwell_ms == 0 and rolling:
+            # Between pass-through points of a blended path, keep moving at the limit
+            seg_ms = 0
+            for i in range(4):
+                seg_ms = max(seg_ms, self.dist[i] * 1000 // JOINT_MAX_VEL[i])
+            self.accel = 0
+        elif self.fastest:
+            trapezoid_time(self.dist, self.timing)
+            seg_ms = self.timing[0]
+            self.accel = self.timing[1]
+        else:
+            seg_ms = longest * self.ms_per_deg
+            self.accel = 0
+        self.seg_len = seg_ms * 100
+        self.seg_pos = 0
+        self.dwell = 0
+        self.last_t = time.ticks_ms()
+    
+    def _next_segment(self, carry):
+        self.index = (self.index + 1) % self.count
+        self._begin_segment()
+        self.seg_pos = carry
+        if self.single_step:
+            self.state = PLAY_PAUSE
+    
+    def _progress(self):
+        """Position along the segment in permille, shaped by the profile"""
+        u = self.seg_pos * 1000 // self.seg_len
+        f = self.accel
+        if f == 0:
+            return u
+        if u < f:
+            return u * u * 500 // (f * (1000 - f))
+        if u <= 1000 - f:
+            return (u - f // 2) * 1000 // (1000 - f)
+        v = 1000 - u
+        return 1000 - v * v * 500 // (f * (1000 - f))
+    
+    def step(self):
+        """Advance playback by the time elapsed since the last call"""
+        if self.state != PLAY_RUN:
+            return
+        now = time.ticks_ms()
+        speed = self.speed
+        if self.fastest and speed > 100:
+            # Already at the joint limits
+            speed = 100
+        dt = time.ticks_diff(now, self.last_t) * speed * self.seg_scale // 100
+        self.last_t = now
+        if self.override:
+            return
+        
+        if self.dwell > 0:
+            self.dwell -= dt
+            if self.dwell <= 0:
+                self._next_segment(0)
+            return
+        
+        target = self.target
+        self.seg_pos += dt
+        if self.seg_pos >= self.seg_len:
+            for i in range(4):
+                self.arm.write_angle(i, target[i])
+            dwell_ms = self.dwell_ms if self.seg_dwell is None else self.seg_dwell[self.index]
+            if dwell_ms == 0:
+                # No stop, carry the overshoot into the next segment
+                self.rolling = True
+                self._next_segment(self.seg_pos - self.seg_len)
+            else:
+                self.dwell = dwell_ms * 100
+        else:
+            p = self._progress()
+            for i in range(4):
+                self.arm.write_angle(i, self.start[i] + (target[i] - self.start[i]) * p // 1000)
@@ -0,0 +1,52 @@
+"""
+eArm pose queue
+Fixed-size ring of 4-angle poses, filled by a remote host and emptied
+one pose per control tick
+"""
+
+
+class PoseQueue:
+    """Ring buffer of poses in one preallocated bytearray"""
+    def __init__(self, size=128):
+        self.size = size
+        self.buf = bytearray(4 * size)
+        self.head = 0  # Next pose to write
+        self.tail = 0  # Next pose to read
+        self.count = 0
+
+    def free(self):
+        return self.size - self.count
+
+    def clear(self):
+        self.head = self.tail = self.count = 0
+
+    def put_from(self, data, offset, n):
+        """Append n poses from data[offset:], False (nothing added) if they do not fit"""
+        if n > self.size - self.count:
+            return False
+        buf = self.buf
+        head = self.head
+        for k in range(n):
+            base = 4 * head
+            src = offset + 4 * k
+            buf[base] = data[src]
+            buf[base + 1] = data[src + 1]
+            buf[base + 2] = data[src + 2]
+            buf[base + 3] = data[src + 3]
+            head += 1
+            if head == self.size:
+                head = 0
+        self.head = head
+        self.count += n
+        return True
+
+    def pop(self):
+        """Index of the oldest pose in buf (4 * index), or -1 when empty"""
+        if self.count == 0:
+            return -1
+        base = 4 * self.tail
+        self.tail += 1
+        if self.tail == self.size:
+            self.tail = 0
+        self.count -= 1
+        return base
@@ -0,0 +1,273 @@
+"""
+eArm Program Library
+Stores many named action sequences on flash
+
+All programs share one data file. A small index file maps each name to
+its offset in the data file, so loading a program reads only its own
+bytes and never scans or parses the others.
+
+Saving a program appends it to the data file, a replaced or deleted
+program leaves its old bytes behind. Once those pass COMPACT_DEAD the
+data file is rewritten with only the programs in the index.
+"""
+
+import json
+import os
+
+DATA_FILE = "programs.dat"
+INDEX_FILE = "programs.idx"
+
+# Each action is stored as 8 bytes:
+# angle A, angle B, angle C, angle D, speed (%), reserved, dwell low, dwell high
+RECORD_SIZE = 8
+
+# Playback flags of a program, kept in the index
+FLAG_FASTEST = 1  # Timing from the joint velocity and acceleration limits
+FLAG_SMOOTH = 2  # Replay one blended spline through the actions
+
+# Bytes of replaced and deleted programs that trigger compact()
+COMPACT_DEAD = 4096
+
+
+class ProgramLibrary:
+    """
+    Named action sequences on flash, loaded one at a time
+
+    The index is read on first use and programs are only read by load(),
+    so startup cost does not depend on how many programs exist.
+    """
+
+    def __init__(self, data_file=DATA_FILE, index_file=INDEX_FILE):
+        self.data_file = data_file
+        self.index_file = index_file
+        self.index = None  # name -> [offset, count, speed, flags], loaded lazily
+        self.selected = None  # Name of the last selected program
+
+    def _load_index(self):
+        """Read the index file once"""
+        if self.index is None:
+            try:
+                with open(self.index_file) as f:
+                    data = json.load(f)
+                self.index = data.get("programs", {})
+                self.selected = data.get("selected")
+            except (OSError, ValueError):
+                self.index = {}
+        return self.index
+
+    def _save_index(self):
+        """Write the index to a temporary file, then swap it in"""
+        tmp = self.index_file + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"programs": self.index, "selected": self.selected}, f)
+        os.rename(tmp, self.index_file)
+
+    def _data_size(self):
+        try:
+            return os.stat(self.data_file)[6]
+        except OSError:
+            return 0
+
+    def _live_size(self):
+        return sum(entry[1] for entry in self._load_index().values()) * RECORD_SIZE
+
+    def _compact_if_needed(self):
+        """Compact once the dead bytes pass COMPACT_DEAD"""
+        if self._data_size() - self._live_size() > COMPACT_DEAD:
+            self.compact()
+
+    def names(self):
+        """Sorted list of program names"""
+        return sorted(self._load_index())
+
+    def count(self):
+        return len(self._load_index())
+
+    def length(self, name):
+        """Number of actions in a program, None if it does not exist"""
+        entry = self._load_index().get(name)
+        return None if entry is None else entry[1]
+
+    def new_name(self):
+        """First free name of the form prog1, prog2, ..."""
+        index = self._load_index()
+        n = 1
+        while "prog%d" % n in index:
+            n += 1
+        return "prog%d" % n
+
+    def next_name(self, name):
+        """Program after name in sorted order, wrapping around"""
+        names = self.names()
+        if not names:
+            return None
+        if name in names:
+            return names[(names.index(name) + 1) % len(names)]
+        return names[0]
+
+    def save(self, name, poses, count, speeds=None, dwells=None, speed=100, flags=0):
+        """
+        Append a program to the data file and point the index at it
+
+        Parameters:
+            name: Program name
+            poses: Flat buffer with 4 angles per action
+            count: Number of actions to store
+            speeds: Per action speed factors (percent), default 100
+            dwells: Per action dwell times (ms), default 300
+            speed: Speed factor of the whole sequence (percent)
+            flags: FLAG_FASTEST / FLAG_SMOOTH
+        """
+        index = self._load_index()
+        buf = bytearray(count * RECORD_SIZE)
+        for k in range(count):
+            o = k * RECORD_SIZE
+            for i in range(4):
+                buf[o + i] = poses[4 * k + i]
+            buf[o + 4] = speeds[k] if speeds is not None else 100
+            dwell = dwells[k] if dwells is not None else 300
+            buf[o + 6] = dwell & 0xFF
+            buf[o + 7] = dwell >> 8
+
+        offset = self._data_size()
+        with open(self.data_file, "ab") as f:
+            f.write(buf)
+
+        # Replacing a program leaves its old bytes behind until compact()
+        index[name] = [offset, count, speed, flags]
+        self.selected = name
+        self._save_index()
+        self._compact_if_needed()
+
+    def load(self, name, poses, speeds=None, dwells=None):
+        """
+        Read one program into preallocated buffers
+
+        poses is a flat buffer with 4 angles per action.
+
+        Returns:
+            (count, speed, flags) or None if the program does not exist,
+            or its bytes are missing from the data file
+        """
+        entry = self._load_index().get(name)
+        if entry is None:
+            return None
+        offset, count, speed = entry[:3]
+        flags = entry[3] if len(entry) > 3 else 0  # Saved before flags existed
+        if offset + count * RECORD_SIZE > self._data_size():
+            return None  # Data file missing or cut short
+        count = min(count, len(poses) // 4)
+
+        buf = bytearray(count * RECORD_SIZE)
+        try:
+            with open(self.data_file, "rb") as f:
+                f.seek(offset)
+                if f.readinto(buf) != len(buf):
+                    return None
+        except OSError:
+            return None
+
+        for k in range(count):
+            o = k * RECORD_SIZE
+            for i in range(4):
+                poses[4 * k + i] = buf[o + i]
+            if speeds is not None:
+                speeds[k] = buf[o + 4]
+            if dwells is not None:
+                dwells[k] = buf[o + 6] | (buf[o + 7] << 8)
+
+        if self.selected != name:
+            self.selected = name
+            self._save_index()
+        return count, speed, flags
+
+    def tune(self, name, speed=None, flags=None, action=-1, action_speed=None, dwell=None):
+        """
+        Change the timing of a saved program in place
+
+        Parameters:
+            name: Program name
+            speed: New speed factor of the whole sequence (percent)
+            flags: New FLAG_FASTEST / FLAG_SMOOTH
+            action: Index of the action whose action_speed / dwell change
+            action_speed: Speed factor of that action (percent, 1-255)
+            dwell: Dwell after that action (ms, 0-65535)
+        Returns:
+            False if the program or action does not exist or a value is
+            out of range, nothing is changed then
+        """
+        entry = self._load_index().get(name)
+        if entry is None:
+            return False
+        if speed is not None and not 10 <= speed <= 400:
+            return False
+        if action_speed is not None or dwell is not None:
+            if not 0 <= action < entry[1]:
+                return False
+            if action_speed is not None and not 1 <= action_speed <= 255:
+                return False
+            if dwell is not None and not 0 <= dwell <= 0xFFFF:
+                return False
+            o = entry[0] + action * RECORD_SIZE
+            try:
+                with open(self.data_file, "r+b") as f:
+                    if action_speed is not None:
+                        f.seek(o + 4)
+                        f.write(bytes((action_speed,)))
+                    if dwell is not None:
+                        f.seek(o + 6)
+                        f.write(bytes((dwell & 0xFF, dwell >> 8)))
+            except OSError:
+                return False
+        if speed is not None or flags is not None:
+            if len(entry) < 4:
+                entry.append(0)
+            if speed is not None:
+                entry[2] = speed
+            if flags is not None:
+                entry[3] = flags & (FLAG_FASTEST | FLAG_SMOOTH)
+            self._save_index()
+        return True
+
+    def delete(self, name):
+        """Remove a program from the index"""
+        if self._load_index().pop(name, None) is not None:
+            if self.selected == name:
+                self.selected = None
+            self._save_index()
+            self._compact_if_needed()
+
+    def compact(self):
+        """
+        Rewrite the data file keeping only programs in the index
+
+        Programs whose bytes are missing from the data file are dropped
+        from the index.
+        """
+        index = self._load_index()
+        tmp = self.data_file + ".tmp"
+        offset = 0
+        try:
+            src = open(self.data_file, "rb")
+        except OSError:
+            src = None
+        with open(tmp, "wb") as dst:
+            for name in sorted(index):
+                entry = index[name]
+                size = entry[1] * RECORD_SIZE
+                data = b""
+                if src is not None:
+                    src.seek(entry[0])
+                    data = src.read(size)
+                if len(data) < size:
+                    del index[name]
+                    if self.selected == name:
+                        self.selected = None
+                    continue
+                dst.write(data)
+                entry[0] = offset
+                offset += size
+        if src is not None:
+            src.close()
+        os.rename(tmp, self.data_file)
+        self._save_index()
@@ -0,0 +1,96 @@
+"""
+eArm setpoint scheduler
+Setpoints tagged with the board's ticks_us, executed at that moment
+instead of when they arrive
+
+The host learns the board's clock with the TIME_SYNC exchange of
+earm.serial_proto and sends setpoints a little ahead of time, so network
+jitter only decides how early a setpoint waits, not when the arm moves.
+The control loop calls run(deadline) every tick; a setpoint due before
+the tick's deadline is waited for with sleep_us and written on time.
+"""
+
+import time
+from array import array
+
+# A setpoint this late (us) counts as late in the statistics
+LATE_US = 1000
+# Setpoints further ahead than this are refused, ticks_us wraps after ~17 min
+MAX_AHEAD_US = 60000000
+# Do not wait for a setpoint this close (us) to the end of the tick
+MARGIN_US = 500
+
+
+class SetpointSchedule:
+    """Fixed-size list of timed setpoints in time order"""
+    def __init__(self, arm, size=16):
+        self.arm = arm
+        self.size = size
+        self.t = array('l', [0] * size)  # ticks_us per entry, earliest first
+        self.poses = bytearray(4 * size)
+        self.count = 0
+        self.executed = 0
+        self.late = 0
+        self.max_late_us = 0
+
+    def clear(self):
+        self.count = 0
+
+    def add(self, t_us, data, offset):
+        """
+        Insert the pose data[offset:offset + 4] to run at t_us
+
+        Returns False (nothing added) when the schedule is full.
+        """
+        if self.count == self.size:
+            return False
+        t = self.t
+        poses = self.poses
+        # Shift later entries up, equal times keep their arrival order
+        i = self.count
+        while i > 0 and time.ticks_diff(t[i - 1], t_us) > 0:
+            t[i] = t[i - 1]
+            for k in range(4):
+                poses[4 * i + k] = poses[4 * i - 4 + k]
+            i -= 1
+        t[i] = t_us
+        for k in range(4):
+            poses[4 * i + k] = data[offset + k]
+        self.count += 1
+        return True
+
+    def _pop(self):
+        """Write the first entry to the servos and remove it"""
+        poses = self.poses
+        for k in range(4):
+            self.arm.write_angle(k, poses[k])
+        n = self.count - 1
+        t = self.t
+        for i in range(n):
+            t[i] = t[i + 1]
+        for i in range(4 * n):
+            poses[i] = poses[i + 4]
+        self.count = n
+        self.executed += 1
+
+    def run(self, deadline):
+        """
+        Execute the setpoints due before deadline (ticks_us of the end of
+        this tick), True if any was written
+        """
+        done = False
+        while self.count:
+            due = self.t[0]
+            wait = time.ticks_diff(due, time.ticks_us())
+            if wait > 0:
+                if time.ticks_diff(deadline, due) < MARGIN_US:
+                    break
+                time.sleep_us(wait)
+            late = time.ticks_diff(time.ticks_us(), due)
+            if late > LATE_US:
+                self.late += 1
+            if late > self.max_late_us:
+                self.max_late_us = late
+            self._pop()
+            done = True
+        return done
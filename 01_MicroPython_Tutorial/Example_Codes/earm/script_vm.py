@@ -0,0 +1,236 @@
+"""
+eArm motion script interpreter
+Runs bytecode from earm.motion_script one control tick at a time
+
+step() never blocks: a move or wait in progress is advanced by the time
+elapsed since it began, and the instructions after it run in the tick it
+finishes. Moves start where the previous one ended on the clock, not on
+the next tick, so chained movel segments run on without a stop. All
+state is preallocated and the arithmetic is integer only, nothing is
+allocated while a script runs.
+"""
+
+from array import array
+import time
+
+from earm.motion_script import (
+    HEADER_SIZE, MAX_DEPTH, check_header,
+    OP_END, OP_SPEED, OP_MOVE, OP_MOVEJ, OP_MOVEL, OP_WAIT, OP_GRIP,
+    OP_LOOP, OP_NEXT, OP_BEEP,
+)
+from earm.playback import JOINT_MAX_VEL, trapezoid_time
+
+# Interpreter states
+SCRIPT_IDLE = 0
+SCRIPT_RUN = 1
+SCRIPT_ERROR = 2  # Bad opcode or loop nesting, stopped
+
+# Instructions run per step() at most, a tight loop cannot stall the tick
+MAX_OPS = 16
+# Tone of "beep" without a frequency
+BEEP_HZ = 2000
+
+
+class ScriptVM:
+    """Bytecode interpreter advanced by step() in the control loop"""
+    def __init__(self, arm, beeper=None):
+        """
+        Parameters:
+            arm: eArm whose servos the script moves
+            beeper: Optional earm.buzzer.Beeper for "beep"
+        """
+        self.arm = arm
+        self.beeper = beeper
+        self.code = None
+        self.length = 0
+        self.pc = 0
+        self.state = SCRIPT_IDLE
+        self.speed = 100  # Percent of the joint limits
+        self.depth = 0
+        self.loop_pc = array('H', [0] * MAX_DEPTH)  # First instruction of each loop
+        self.loop_left = array('H', [0] * MAX_DEPTH)  # Passes left, 0 = forever
+        self.from_pos = array('h', (0, 0, 0, 0))  # Pose the motion started from
+        self.dist = array('h', (0, 0, 0, 0))
+        self.joint_ms = array('l', (0, 0, 0, 0))  # Per joint times of "move"
+        self.kind = 0  # Opcode of the motion in progress, 0 = none
+        self.seg_ms = 0
+        self.accel = 0  # Acceleration phase in permille, 0 = constant speed
+        self.timing = array('l', [0, 0])  # trapezoid_time() result
+        self.t0 = 0  # ticks_ms the motion began
+        self.executed = 0  # Instructions run
+
+    def load(self, code, length=None):
+        """Use code[:length] as the program, False if it is not bytecode"""
+        length = len(code) if length is None else length
+        self.stop()
+        if not check_header(code, length):
+            self.code = None
+            return False
+        self.code = code
+        self.length = length
+        return True
+
+    def start(self):
+        """Run the loaded program from the beginning"""
+        if self.code is None:
+            return False
+        self.pc = HEADER_SIZE
+        self.depth = 0
+        self.speed = 100
+        self.kind = 0
+        self.state = SCRIPT_RUN
+        return True
+
+    def stop(self):
+        self.state = SCRIPT_IDLE
+        self.kind = 0
+
+    @property
+    def running(self):
+        return self.state == SCRIPT_RUN
+
+    def _target(self, i, angle):
+        self.dist[i] = angle - self.from_pos[i]
+
+    def _begin(self, op, t0):
+        """Time the motion to self.dist, starting at ticks_ms t0"""
+        dist = self.dist
+        self.accel = 0
+        if op == OP_MOVEJ:
+            trapezoid_time(dist, self.timing)
+            ms = self.timing[0]
+            self.accel = self.timing[1]
+            ms = ms * 100 // self.speed
+        else:
+            ms = 0
+            for i in range(4):
+                t = abs(dist[i]) * 1000 // JOINT_MAX_VEL[i] * 100 // self.speed
+                self.joint_ms[i] = t
+                ms = max(ms, t)
+        self.seg_ms = ms
+        self.kind = op
+        self.t0 = t0
+
+    def _progress(self, t):
+        """Position along the motion in permille at t ms, shaped by the profile"""
+        u = t * 1000 // self.seg_ms
+        f = self.accel
+        if f == 0:
+            return u
+        if u < f:
+            return u * u * 500 // (f * (1000 - f))
+        if u <= 1000 - f:
+            return (u - f // 2) * 1000 // (1000 - f)
+        v = 1000 - u
+        return 1000 - v * v * 500 // (f * (1000 - f))
+
+    def _advance(self, now):
+        """Write the servos for time now, True once the motion is complete"""
+        t = time.ticks_diff(now, self.t0)
+        done = t >= self.seg_ms
+        kind = self.kind
+        if kind == OP_WAIT:
+            return done
+        start = self.from_pos
+        dist = self.dist
+        write = self.arm.write_angle
+        if kind == OP_MOVE:
+            for i in range(4):
+                d = dist[i]
+                if d:
+                    total = self.joint_ms[i]
+                    write(i, start[i] + (d if t >= total else d * t // total))
+        else:
+            p = 1000 if done else self._progress(t)
+            for i in range(4):
+                if dist[i]:
+                    write(i, start[i] + dist[i] * p // 1000)
+        return done
+
+    def step(self):
+        """Advance the script by the time elapsed since the last call"""
+        if self.beeper is not None:
+            self.beeper.update()
+        if self.state != SCRIPT_RUN:
+            return
+        now = time.ticks_ms()
+        t0 = now
+        if self.kind:
+            if not self._advance(now):
+                return
+            # The next instruction begins where this one ended
+            t0 = time.ticks_add(self.t0, self.seg_ms)
+            self.kind = 0
+        code = self.code
+        for _ in range(MAX_OPS):
+            pc = self.pc
+            if pc >= self.length:
+                self.state = SCRIPT_IDLE
+                return
+            op = code[pc]
+            pc += 1
+            self.executed += 1
+            if op == OP_MOVE or op == OP_MOVEJ or op == OP_MOVEL:
+                mask = code[pc]
+                pc += 1
+                angles = self.arm.servo_current_angle
+                for i in range(4):
+                    self.from_pos[i] = angles[i]
+                    self.dist[i] = 0
+                    if mask & (1 << i):
+                        self._target(i, code[pc])
+                        pc += 1
+                self._begin(op, t0)
+            elif op == OP_GRIP:
+                angles = self.arm.servo_current_angle
+                for i in range(4):
+                    self.from_pos[i] = angles[i]
+                    self.dist[i] = 0
+                self._target(3, code[pc])
+                pc += 1
+                self._begin(OP_MOVE, t0)
+            elif op == OP_WAIT:
+                self.seg_ms = code[pc] | code[pc + 1] << 8
+                pc += 2
+                self.kind = OP_WAIT
+                self.t0 = t0
+            elif op == OP_SPEED:
+                self.speed = code[pc]
+                pc += 1
+            elif op == OP_BEEP:
+                if self.beeper is not None:
+                    hz = code[pc + 2] | code[pc + 3] << 8
+                    self.beeper.beep(hz or BEEP_HZ, code[pc] | code[pc + 1] << 8)
+                pc += 4
+            elif op == OP_LOOP:
+                if self.depth == MAX_DEPTH:
+                    self.state = SCRIPT_ERROR
+                    return
+                self.loop_left[self.depth] = code[pc] | code[pc + 1] << 8
+                pc += 2
+                self.loop_pc[self.depth] = pc
+                self.depth += 1
+            elif op == OP_NEXT:
+                d = self.depth - 1
+                if d < 0:
+                    self.state = SCRIPT_ERROR
+                    return
+                left = self.loop_left[d]
+                if left == 1:
+                    self.depth = d
+                else:
+                    if left:
+                        self.loop_left[d] = left - 1
+                    pc = self.loop_pc[d]
+            elif op == OP_END:
+                self.state = SCRIPT_IDLE
+                return
+            else:
+                self.state = SCRIPT_ERROR
+                return
+            self.pc = pc
+            if self.kind:
+                if not self._advance(now):
+                    return
+                t0 = time.ticks_add(self.t0, self.seg_ms)
+                self.kind = 0
@@ -0,0 +1,289 @@
+"""
+eArm serial control application
+The arm follows setpoints, velocities and streamed trajectories sent by
+a PC over the framed binary protocol in earm.serial_proto, on a serial
+port or over WiFi (earm.tcp_port), or runs motion scripts it was sent
+"""
+
+import time
+
+from earm.arm import eArm
+from earm.buzzer import Beeper
+from earm.gc_policy import GcPolicy
+from earm.loop import LoopRunner
+from earm.jitter_buffer import JitterBuffer, JB_IDLE
+from earm.scheduler import SetpointSchedule, MAX_AHEAD_US
+from earm.script_vm import ScriptVM
+from earm.serial_proto import (
+    SerialLink, StdioPort, VERSION, MAX_PAYLOAD,
+    MSG_PING, MSG_SETPOINT, MSG_VELOCITY, MSG_TRAJ, MSG_TELEMETRY_REQ, MSG_STOP,
+    MSG_STREAM_START, MSG_STREAM_END, MSG_TIME_SYNC, MSG_SETPOINT_AT,
+    MSG_SCRIPT_LOAD, MSG_SCRIPT_RUN,
+    MSG_ACK, MSG_PONG, MSG_TELEMETRY, MSG_CREDIT, MSG_TIME,
+    ACK_FMT, PONG_FMT, TELEMETRY_FMT, CREDIT_FMT, TIME_FMT,
+    ST_OK, ST_BAD_LEN, ST_FULL, ST_UNKNOWN, ST_RANGE, ST_LATE, ST_INVALID,
+    MODE_IDLE, MODE_SETPOINT, MODE_VELOCITY, MODE_TRAJ, MODE_SCRIPT,
+)
+
+# Velocity mode stops when no command refreshed it for this long
+VELOCITY_TIMEOUT_MS = 250
+
+# A CREDIT frame is sent once this many slots were freed since the last report
+CREDIT_STEP = 16
+
+# Largest motion script bytecode, the buffer is allocated by the first SCRIPT_LOAD
+SCRIPT_SIZE = 2048
+
+
+class SerialControl:
+    """Host driven control of the mechanical arm over a serial link"""
+    def __init__(self, servo_pins=(4, 5, 6, 7), port=None, rate_hz=100, queue_size=128,
+                 buzzer_pin=9):
+        """
+        Parameters:
+            servo_pins: A, B, C, D servo pins (adjust according to actual wiring)
+            port: Object with readinto() / write(), e.g. machine.UART(1, ...)
+                  or TcpPort(), None = the USB serial REPL (Ctrl-C is disabled
+                  while running)
+            rate_hz: Control loop rate, trajectories play one pose per tick
+            queue_size: Trajectory poses that can be buffered (jitter buffer size)
+            buzzer_pin: Buzzer for the "beep" of motion scripts
+        """
+        self.servo_pins = servo_pins
+        self.port = port
+        self.arm = eArm()
+        self.jitter = JitterBuffer(self.arm, queue_size)
+        self.queue = self.jitter.queue
+        self.schedule = SetpointSchedule(self.arm)
+        self.beeper = Beeper(buzzer_pin)
+        self.script = ScriptVM(self.arm, self.beeper)
+        self.script_buf = None
+        self.script_len = 0
+        self.streaming = False  # Send CREDIT frames while a stream plays
+        self.last_seq = 0  # seq of the last host frame handled
+        self.credit_free = 0  # Free slots in the last ACK or CREDIT
+        self.gc_policy = GcPolicy()
+        self.loop = LoopRunner(1000000 // rate_hz, self.gc_policy)
+        self.link = None  # Opened by begin()
+        self.mode = MODE_IDLE
+        self.velocity = [0, 0, 0, 0]  # deg/s per joint
+        self.vel_acc = [0, 0, 0, 0]  # Accumulated motion in deg * ms
+        self.vel_t = 0  # ticks_ms of the last velocity command
+        self.last_t = 0
+
+    def begin(self):
+        """Attach the servos and open the link"""
+        self.arm.servo_attach(*self.servo_pins)
+        if self.port is None:
+            self.port = StdioPort()
+        self.link = SerialLink(self.port)
+        self.gc_policy.begin()
+        self.last_t = time.ticks_ms()
+
+    def _ack(self, seq, status):
+        self.credit_free = self.queue.free()
+        self.link.send_fmt(MSG_ACK, seq, ACK_FMT, status, self.credit_free)
+    
+    def _credit(self):
+        """Report freed slots while a stream plays"""
+        free = self.queue.free()
+        if free - self.credit_free >= CREDIT_STEP or (free == self.queue.size and free != self.credit_free):
+            self.credit_free = free
+            self.link.send_fmt(MSG_CREDIT, 0, CREDIT_FMT, self.last_seq, free,
+                               self.queue.count, min(self.jitter.underruns, 65535))
+
+    def handle(self, parser):
+        """Execute one received frame"""
+        msg = parser.msg
+        seq = parser.seq
+        n = parser.length
+        data = parser.payload
+        self.last_seq = seq
+        if msg == MSG_TIME_SYNC:
+            # First, so the receive time is taken before any other work
+            rx_us = time.ticks_us()
+            self.link.send_fmt(MSG_TIME, seq, TIME_FMT, rx_us, time.ticks_us(), time.ticks_ms())
+        elif msg == MSG_PING:
+            self.link.send_fmt(MSG_PONG, seq, PONG_FMT, VERSION, MAX_PAYLOAD,
+                               self.queue.size, self.loop.period_us)
+        elif msg == MSG_TELEMETRY_REQ:
+            self.send_telemetry(seq)
+        elif msg == MSG_SETPOINT:
+            if n != 4:
+                self._ack(seq, ST_BAD_LEN)
+                return
+            for i in range(4):
+                if data[i] > 180:
+                    self._ack(seq, ST_RANGE)
+                    return
+            self._end_stream()
+            self.mode = MODE_SETPOINT
+            for i in range(4):
+                self.arm.write_angle(i, data[i])
+            self._ack(seq, ST_OK)
+        elif msg == MSG_SETPOINT_AT:
+            if n != 8:
+                self._ack(seq, ST_BAD_LEN)
+                return
+            # The host sends ticks_us values below 2**30, a small int
+            if data[3] >= 0x40 or data[4] > 180 or data[5] > 180 or data[6] > 180 or data[7] > 180:
+                self._ack(seq, ST_RANGE)
+                return
+            t_us = data[0] | data[1] << 8 | data[2] << 16 | data[3] << 24
+            ahead = time.ticks_diff(t_us, time.ticks_us())
+            if ahead > MAX_AHEAD_US:
+                self._ack(seq, ST_RANGE)
+            elif not self.schedule.add(t_us, data, 4):
+                self._ack(seq, ST_FULL)
+            else:
+                self._ack(seq, ST_OK if ahead > 0 else ST_LATE)
+        elif msg == MSG_VELOCITY:
+            if n != 8:
+                self._ack(seq, ST_BAD_LEN)
+                return
+            for i in range(4):
+                v = data[2 * i] | data[2 * i + 1] << 8  # int16, little endian
+                self.velocity[i] = v - 65536 if v & 0x8000 else v
+            self._end_stream()
+            self.mode = MODE_VELOCITY
+            self.vel_t = time.ticks_ms()
+            self._ack(seq, ST_OK)
+        elif msg == MSG_TRAJ:
+            if n == 0 or n % 4:
+                self._ack(seq, ST_BAD_LEN)
+                return
+            for i in range(n):
+                if data[i] > 180:
+                    self._ack(seq, ST_RANGE)
+                    return
+            if self.mode != MODE_TRAJ:
+                # Single chunk outside a stream, play as soon as it arrives
+                self.jitter.start(0)
+                self.mode = MODE_TRAJ
+            if not self.queue.put_from(data, 0, n // 4):
+                self._ack(seq, ST_FULL)
+                return
+            self._ack(seq, ST_OK)
+        elif msg == MSG_STREAM_START:
+            if n != 2 and n != 6:
+                self._ack(seq, ST_BAD_LEN)
+                return
+            start_t = None
+            if n == 6:
+                start_t = data[2] | data[3] << 8 | data[4] << 16 | data[5] << 24
+            self.jitter.start(data[0] | data[1] << 8, start_t)
+            self.mode = MODE_TRAJ
+            self.streaming = True
+            self._ack(seq, ST_OK)
+        elif msg == MSG_STREAM_END:
+            self.jitter.end()
+            self._ack(seq, ST_OK)
+        elif msg == MSG_SCRIPT_LOAD:
+            if n < 2:
+                self._ack(seq, ST_BAD_LEN)
+                return
+            offset = data[0] | data[1] << 8
+            if offset + n - 2 > SCRIPT_SIZE or offset > self.script_len:
+                self._ack(seq, ST_RANGE)
+                return
+            if self.script_buf is None:
+                self.script_buf = bytearray(SCRIPT_SIZE)
+            if self.mode == MODE_SCRIPT:
+                # Never rewrite the bytecode under a running script
+                self.script.stop()
+                self.mode = MODE_SETPOINT
+            buf = self.script_buf
+            for i in range(2, n):
+                buf[offset + i - 2] = data[i]
+            self.script_len = offset + n - 2
+            self._ack(seq, ST_OK)
+        elif msg == MSG_SCRIPT_RUN:
+            if n != 0:
+                self._ack(seq, ST_BAD_LEN)
+                return
+            if self.script_buf is None or not self.script.load(self.script_buf, self.script_len):
+                self._ack(seq, ST_INVALID)
+                return
+            self._end_stream()
+            self.script.start()
+            self.mode = MODE_SCRIPT
+            self._ack(seq, ST_OK)
+        elif msg == MSG_STOP:
+            self._end_stream()
+            self.schedule.clear()
+            self.mode = MODE_SETPOINT
+            self._ack(seq, ST_OK)
+        else:
+            self._ack(seq, ST_UNKNOWN)
+
+    def _end_stream(self):
+        self.jitter.stop()
+        self.script.stop()
+        if self.streaming:
+            self.streaming = False
+            self._credit()
+    
+    def send_telemetry(self, seq):
+        a = self.arm.servo_current_angle
+        self.link.send_fmt(MSG_TELEMETRY, seq, TELEMETRY_FMT,
+                           time.ticks_ms(), a[0], a[1], a[2], a[3], self.mode,
+                           self.queue.count, min(self.loop.overruns, 65535),
+                           min(self.link.parser.crc_errors, 65535),
+                           min(self.jitter.underruns, 65535),
+                           min(self.schedule.late, 65535), self.schedule.max_late_us)
+
+    def control(self, dt):
+        """Advance the active mode by dt ms"""
+        if self.schedule.count and self.schedule.run(self.loop.deadline):
+            # A timed setpoint ran, it replaces whatever the arm was doing
+            self._end_stream()
+            self.mode = MODE_SETPOINT
+            return
+        if self.mode == MODE_TRAJ:
+            self.jitter.step()
+            if self.streaming:
+                self._credit()
+            if self.jitter.state == JB_IDLE:
+                # Trajectory played out, hold the last pose
+                self.streaming = False
+                self.mode = MODE_SETPOINT
+        elif self.mode == MODE_SCRIPT:
+            self.script.step()
+            if not self.script.running:
+                self.mode = MODE_SETPOINT
+        elif self.mode == MODE_VELOCITY:
+            if time.ticks_diff(time.ticks_ms(), self.vel_t) > VELOCITY_TIMEOUT_MS:
+                # Host went quiet, do not keep driving into the end stops
+                self.mode = MODE_SETPOINT
+                return
+            angles = self.arm.servo_current_angle
+            for i in range(4):
+                acc = self.vel_acc[i] + self.velocity[i] * dt
+                steps = acc // 1000 if acc >= 0 else -(-acc // 1000)
+                if steps:
+                    acc -= steps * 1000
+                    self.arm.write_angle(i, angles[i] + steps)
+                self.vel_acc[i] = acc
+
+    def tick(self):
+        """One pass of the control loop"""
+        now = time.ticks_ms()
+        dt = time.ticks_diff(now, self.last_t)
+        self.last_t = now
+        link = self.link
+        while link.poll():
+            self.handle(link.parser)
+        self.control(dt)
+        # A script's last beep outlives the script
+        self.beeper.update()
+
+    def run(self):
+        """Main loop"""
+        self.begin()
+        try:
+            self.loop.run(self.tick)
+        finally:
+            # StdioPort gives Ctrl-C back, TcpPort closes its sockets
+            close = getattr(self.port, "close", None)
+            if close is not None:
+                close()
@@ -0,0 +1,270 @@
+"""
+eArm framed binary serial protocol
+Device side of the link used by Host_Tools/earm_host over a UART or the
+USB serial REPL
+
+Frame:
+    0xA5, type, seq, len, payload[len], crc8
+
+The CRC-8 (polynomial 0x07) covers type, seq, len and the payload. A
+frame with a bad CRC is dropped and counted; the host notices the
+missing reply and resends. Every host message is answered with the same
+seq, either by its own reply (PONG, TELEMETRY) or by an ACK.
+
+While a stream plays, the board also sends CREDIT frames with seq 0 as
+its queue drains. The host may have as many poses in flight as the
+last reported free slots, minus the poses it sent after the frame that
+report names (credit based flow control).
+
+The same frames run over TCP (earm.tcp_port) when the board is on WiFi.
+A stream may name the board's ticks_ms to start at, so a host driving
+several arms can start them together.
+
+TIME_SYNC is an NTP style exchange: the host notes its clock when it
+sends (t0) and gets the reply (t3), the board reports ticks_us when the
+request was handled (t1) and when the reply left (t2). With the sample
+of the shortest round trip the host knows the board's ticks_us to well
+under a millisecond and can tag setpoints with the moment they must run
+(SETPOINT_AT), which removes the network jitter from the motion.
+
+Motion scripts (earm.motion_script) are sent as bytecode with
+SCRIPT_LOAD in pieces of up to MAX_PAYLOAD - 2 bytes, each naming its
+offset, and started with SCRIPT_RUN. The script runs on the board
+(earm.script_vm) until it ends or any other motion command or STOP
+takes over.
+
+Host_Tools/earm_host/protocol.py is the host copy of these definitions,
+keep both in step.
+"""
+
+import struct
+import time
+
+VERSION = 5
+SYNC = 0xA5
+MAX_PAYLOAD = 255
+
+# A frame that stalls this long is dropped, so a corrupted length byte
+# cannot swallow the frames that follow
+FRAME_TIMEOUT_MS = 50
+
+# Host -> device
+MSG_PING = 0x01  # -> PONG
+MSG_SETPOINT = 0x02  # 4 x uint8 angle -> ACK
+MSG_VELOCITY = 0x03  # 4 x int16 deg/s -> ACK
+MSG_TRAJ = 0x04  # n x 4 x uint8 angle, one pose per control tick -> ACK
+MSG_TELEMETRY_REQ = 0x05  # -> TELEMETRY
+MSG_STOP = 0x06  # Clear the trajectory, hold the current pose -> ACK
+MSG_STREAM_START = 0x07  # prefill uint16 [, start ticks_ms uint32], start a jitter buffered stream -> ACK
+MSG_STREAM_END = 0x08  # Last pose sent, play out the buffer -> ACK
+MSG_TIME_SYNC = 0x09  # -> TIME
+MSG_SETPOINT_AT = 0x0A  # ticks_us uint32, 4 x uint8 angle -> ACK (ST_LATE if already due)
+MSG_SCRIPT_LOAD = 0x0B  # offset uint16, bytecode; offset 0 starts a new script -> ACK
+MSG_SCRIPT_RUN = 0x0C  # Run the loaded script -> ACK (ST_INVALID if it is not bytecode)
+
+# Device -> host
+MSG_ACK = 0x80  # status uint8, free trajectory slots uint16
+MSG_PONG = 0x81  # version uint8, max payload uint8, queue size uint16, period us uint32
+MSG_TELEMETRY = 0x85  # see TELEMETRY_FMT
+MSG_CREDIT = 0x86  # Unsolicited, seq 0, see CREDIT_FMT
+MSG_TIME = 0x87  # see TIME_FMT
+
+# ACK status
+ST_OK = 0
+ST_BAD_LEN = 1
+ST_FULL = 2  # Trajectory chunk does not fit, nothing was queued
+ST_UNKNOWN = 3
+ST_RANGE = 4
+ST_LATE = 5  # Timed setpoint was already due, it runs at once
+ST_INVALID = 6  # Loaded script is not motion script bytecode
+
+# Control modes reported in telemetry
+MODE_IDLE = 0
+MODE_SETPOINT = 1
+MODE_VELOCITY = 2
+MODE_TRAJ = 3
+MODE_SCRIPT = 4
+
+ACK_FMT = "<BH"
+PONG_FMT = "<BBHI"
+# ticks_ms, angles A-D, mode, queued poses, loop overruns, CRC errors, underruns,
+# late timed setpoints, worst timed setpoint lateness us
+TELEMETRY_FMT = "<I4BBHHHHHI"
+# seq of the last host frame handled, free slots, queued poses, underruns
+CREDIT_FMT = "<BHHH"
+# ticks_us when TIME_SYNC was handled, ticks_us when TIME was sent, ticks_ms
+TIME_FMT = "<III"
+
+
+def _crc8_table():
+    table = bytearray(256)
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = ((c << 1) ^ 0x07) & 0xFF if c & 0x80 else (c << 1) & 0xFF
+        table[i] = c
+    return bytes(table)
+
+
+CRC8 = _crc8_table()
+
+
+def crc8(buf, start, end, crc=0):
+    """CRC-8 of buf[start:end], table driven"""
+    table = CRC8
+    for i in range(start, end):
+        crc = table[crc ^ buf[i]]
+    return crc
+
+
+class FrameParser:
+    """Byte at a time frame decoder with a preallocated payload buffer"""
+    # Parser states
+    WAIT_SYNC = 0
+    TYPE = 1
+    SEQ = 2
+    LEN = 3
+    PAYLOAD = 4
+    CRC = 5
+
+    def __init__(self):
+        self.state = self.WAIT_SYNC
+        self.head = bytearray(3)  # type, seq, len, kept for the CRC
+        self.payload = bytearray(MAX_PAYLOAD)
+        self.pos = 0
+        self.crc_errors = 0
+        self.timeouts = 0
+
+    def feed(self, byte):
+        """Consume one byte, True when a complete valid frame is ready"""
+        state = self.state
+        if state == self.WAIT_SYNC:
+            if byte == SYNC:
+                self.state = self.TYPE
+        elif state == self.TYPE:
+            self.head[0] = byte
+            self.state = self.SEQ
+        elif state == self.SEQ:
+            self.head[1] = byte
+            self.state = self.LEN
+        elif state == self.LEN:
+            self.head[2] = byte
+            self.pos = 0
+            self.state = self.PAYLOAD if byte else self.CRC
+        elif state == self.PAYLOAD:
+            self.payload[self.pos] = byte
+            self.pos += 1
+            if self.pos == self.head[2]:
+                self.state = self.CRC
+        else:
+            self.state = self.WAIT_SYNC
+            crc = crc8(self.payload, 0, self.head[2], crc8(self.head, 0, 3))
+            if crc == byte:
+                return True
+            self.crc_errors += 1
+        return False
+
+    def expire(self):
+        """Drop a partly received frame"""
+        if self.state != self.WAIT_SYNC:
+            self.state = self.WAIT_SYNC
+            self.timeouts += 1
+
+    @property
+    def msg(self):
+        return self.head[0]
+
+    @property
+    def seq(self):
+        return self.head[1]
+
+    @property
+    def length(self):
+        return self.head[2]
+
+
+class SerialLink:
+    """Frames over a port object with readinto() and write(), e.g. machine.UART"""
+    def __init__(self, port, rx_size=64):
+        self.port = port
+        self.parser = FrameParser()
+        self.rx = bytearray(rx_size)
+        self.rx_len = 0
+        self.rx_pos = 0
+        self.tx = bytearray(MAX_PAYLOAD + 5)
+        self.tx_view = memoryview(self.tx)
+        self.rx_t = 0  # ticks_ms of the last received byte
+
+    def poll(self):
+        """True when a frame is ready in self.parser, call again until False"""
+        parser = self.parser
+        while True:
+            if self.rx_pos >= self.rx_len:
+                n = self.port.readinto(self.rx)
+                if not n:
+                    if parser.state and time.ticks_diff(time.ticks_ms(), self.rx_t) > FRAME_TIMEOUT_MS:
+                        parser.expire()
+                    return False
+                self.rx_len = n
+                self.rx_pos = 0
+                self.rx_t = time.ticks_ms()
+            byte = self.rx[self.rx_pos]
+            self.rx_pos += 1
+            if parser.feed(byte):
+                return True
+
+    def send(self, msg, seq, length):
+        """Send a frame whose payload was written to self.tx[4:4 + length]"""
+        tx = self.tx
+        tx[0] = SYNC
+        tx[1] = msg
+        tx[2] = seq
+        tx[3] = length
+        tx[4 + length] = crc8(tx, 1, 4 + length)
+        self.port.write(self.tx_view[:5 + length])
+
+    def send_fmt(self, msg, seq, fmt, *values):
+        """Pack values into the payload and send"""
+        struct.pack_into(fmt, self.tx, 4, *values)
+        self.send(msg, seq, struct.calcsize(fmt))
+
+
+class StdioPort:
+    """
+    The USB serial REPL as a port: non-blocking readinto() and write()
+
+    Ctrl-C is disabled while the port is open, 0x03 is ordinary data in
+    a binary frame. close() gives the REPL its keyboard interrupt back.
+    """
+    def __init__(self):
+        import sys
+        import select
+        import micropython
+        self.stdin = sys.stdin.buffer
+        self.stdout = sys.stdout.buffer
+        self.poller = select.poll()
+        self.poller.register(sys.stdin, select.POLLIN)
+        self.one = bytearray(1)
+        self.micropython = micropython
+        micropython.kbd_intr(-1)
+
+    def readinto(self, buf):
+        n = 0
+        size = len(buf)
+        one = self.one
+        while n < size:
+            ready = False
+            for _ in self.poller.ipoll(0):
+                ready = True
+            if not ready:
+                break
+            self.stdin.readinto(one)
+            buf[n] = one[0]
+            n += 1
+        return n
+
+    def write(self, data):
+        self.stdout.write(data)
+
+    def close(self):
+        self.micropython.kbd_intr(3)
@@ -0,0 +1,216 @@
+"""
+eArm servo driver
+Servo control for ESP32-C3, with an optional background thread that keeps
+moving while a web button is held
+
+No pin, PWM or thread is created until the servo is first used.
+"""
+
+from machine import Pin, PWM
+from array import array
+import time
+import _thread
+
+# Slots of Servo.state, one preallocated array polled by the adjust thread
+S_ANGLE = 0    # Current angle
+S_DIR = 1      # Auto adjust direction: 1 increase, -1 decrease, 0 hold
+S_RUNNING = 2  # Auto adjust thread started
+S_SPEED = 3    # Degrees per adjust step
+S_SAVE = 4     # Save mode, 1 = stop the pulse output 40 s after the last move
+S_TICKER = 5   # Idle ticks in save mode
+S_MIN = 6      # Minimum angle
+S_MAX = 7      # Maximum angle
+
+
+def angle_to_duty_u16(angle, min_us, max_us, period_us):
+    """
+    16-bit PWM duty for angle (0-180 degrees), used by Servo and ArmServo
+
+    Integer maths, floats are heap objects on the ESP32 port.
+    """
+    return (min_us + angle * (max_us - min_us) // 180) * 65535 // period_us
+
+
+class Servo:
+    """
+    Servo motor control class with automatic adjustment capability
+    """
+
+    def __init__(self, pin_num, freq=50, min_angle=0, max_angle=180, save_mode=0):
+        """
+        Initialize servo motor
+
+        Parameters:
+            pin_num: GPIO pin number (e.g., 1, 2, 3...)
+            freq: PWM frequency, default 50Hz (standard servo frequency)
+            min_angle: Minimum angle, default 0 degrees
+            max_angle: Maximum angle, default 180 degrees
+            save_mode: 1 = stop the pulse output 40 s after the last move
+        """
+        # Validate parameters
+        if min_angle < 0 or max_angle > 180:
+            raise ValueError("Angle range should be 0-180 degrees")
+        if min_angle >= max_angle:
+            raise ValueError("Minimum angle must be less than maximum angle")
+
+        self.pin_num = pin_num
+        self.pin = None  # Created on first use
+        self.pwm = None
+        self.freq = freq
+        self.state = array('h', (90, 0, 0, 2, save_mode, 0, min_angle, max_angle))
+
+        # Calculate period time (microseconds)
+        self.period_us = 1000000 // freq  # e.g., 50Hz = 20000us
+
+        # Default servo parameters (0.5ms-2.4ms pulse width)
+        self.min_pulse_us = 500    # Pulse width at 0 degrees
+        self.max_pulse_us = 2400   # Pulse width at 180 degrees
+
+    # Slot accessors, the adjust thread reads self.state directly
+    @property
+    def current_angle(self):
+        return self.state[S_ANGLE]
+
+    @current_angle.setter
+    def current_angle(self, angle):
+        self.state[S_ANGLE] = int(angle)
+
+    @property
+    def auto_increase(self):
+        return self.state[S_DIR] > 0
+
+    @property
+    def auto_decrease(self):
+        return self.state[S_DIR] < 0
+
+    @property
+    def running(self):
+        return self.state[S_RUNNING] != 0
+
+    @property
+    def adjust_speed(self):
+        return self.state[S_SPEED]
+
+    @adjust_speed.setter
+    def adjust_speed(self, speed):
+        self.state[S_SPEED] = speed
+
+    @property
+    def save_mode(self):
+        return self.state[S_SAVE]
+
+    @property
+    def min_angle(self):
+        return self.state[S_MIN]
+
+    @property
+    def max_angle(self):
+        return self.state[S_MAX]
+
+    def _output(self):
+        """PWM output, created on first use"""
+        if self.pwm is None:
+            self.pin = Pin(self.pin_num, Pin.OUT)
+            self.pwm = PWM(self.pin, freq=self.freq)
+        return self.pwm
+
+    def _start_thread(self):
+        """Start the auto adjust thread on first use"""
+        if not self.state[S_RUNNING]:
+            self.state[S_RUNNING] = 1
+            _thread.start_new_thread(self._auto_adjust_thread, ())
+
+    def _angle_to_duty(self, angle):
+        """Convert angle to 16-bit PWM duty"""
+        # Limit angle within allowed range
+        st = self.state
+        if angle < st[S_MIN]:
+            angle = st[S_MIN]
+        elif angle > st[S_MAX]:
+            angle = st[S_MAX]
+
+        # Linear mapping: angle -> pulse width -> duty
+        return angle_to_duty_u16(int(angle), self.min_pulse_us, self.max_pulse_us, self.period_us)
+
+    def set_angle(self, angle, delay_ms=0):
+        """
+        Set servo to specific angle
+
+        Parameters:
+            angle: Target angle (0-180 degrees)
+            delay_ms: Delay time after setting (milliseconds)
+        Returns:
+            Actual set angle
+        """
+        duty = self._angle_to_duty(angle)
+        self._output().duty_u16(duty)
+        self.state[S_ANGLE] = int(angle)
+        if self.state[S_SAVE] == 1:
+            # The thread takes care of releasing the servo later
+            self._start_thread()
+        if delay_ms > 0:
+            time.sleep_ms(delay_ms)
+        return angle
+
+    def get_angle(self):
+        """Get current angle"""
+        return self.current_angle
+
+    def _auto_adjust_thread(self):
+        """Background thread for automatic angle adjustment"""
+        st = self.state
+        while st[S_RUNNING]:
+            direction = st[S_DIR]
+            if direction:
+                new_angle = st[S_ANGLE] + direction * st[S_SPEED]
+                if new_angle > st[S_MAX]:
+                    new_angle = st[S_MAX]
+                elif new_angle < st[S_MIN]:
+                    new_angle = st[S_MIN]
+                self.set_angle(new_angle)
+                time.sleep_ms(20)
+                st[S_TICKER] = 0
+            else:
+                if st[S_SAVE] == 1:
+                    # After 40 seconds, turn off the pulse output
+                    if st[S_TICKER] < 1000:
+                        self.set_angle(st[S_ANGLE])
+                        time.sleep_ms(30)
+                        st[S_TICKER] += 1
+                    self.detach()
+                    time.sleep_ms(10)
+                else:
+                    time.sleep_ms(50)
+
+    def start_increase(self):
+        """Start automatic angle increase"""
+        self.state[S_DIR] = 1
+        self._start_thread()
+
+    def start_decrease(self):
+        """Start automatic angle decrease"""
+        self.state[S_DIR] = -1
+        self._start_thread()
+
+    def stop_adjust(self):
+        """Stop all automatic adjustment"""
+        self.state[S_DIR] = 0
+
+    def detach(self):
+        """Stop PWM signal"""
+        if self.pwm is not None:
+            self.pwm.duty_u16(0)
+
+    def attach(self):
+        """Reattach servo (restore PWM output)"""
+        self.set_angle(self.current_angle)
+
+    def deinit(self):
+        """Clean up resources"""
+        if self.state[S_RUNNING]:
+            self.state[S_RUNNING] = 0
+            time.sleep_ms(100)
+        if self.pwm is not None:
+            self.detach()
+            self.pwm.deinit()
+            self.pwm = None
@@ -0,0 +1,107 @@
+"""
+eArm web sessions
+One controlling browser at a time, everyone else watches
+
+Every page load opens a session with a random token that the page sends
+with each request. The first session that commands the arm (or asks to
+take control) becomes the controller and holds a lease; each command it
+sends renews the lease, its telemetry polls do not. Other sessions are
+observers: their commands are refused and they only read telemetry.
+When the controller sends no command for LEASE_MS, e.g. a tab left open,
+its lease expires and the arm is free again.
+"""
+
+import time
+import random
+from array import array
+
+# The controller loses the arm after this long without a command
+LEASE_MS = 3000
+# A session without requests for this long may be reused
+SESSION_IDLE_MS = 60000
+
+# Roles reported to a session
+ROLE_FREE = 0  # Nobody controls the arm
+ROLE_OBSERVER = 1  # Someone else controls it
+ROLE_CONTROLLER = 2  # This session controls it
+
+
+class SessionTable:
+    """Fixed table of session tokens with a single controller lease"""
+    def __init__(self, size=8):
+        self.size = size
+        self.tokens = [None] * size
+        self.seen = array('l', [0] * size)  # ticks_ms of the last request per slot
+        self.controller = -1  # Slot of the controller, -1 = free
+        self.lease_t = 0  # ticks_ms of the controller's last command
+
+    def open(self):
+        """New session token, replacing an idle (or the oldest observer) session"""
+        now = time.ticks_ms()
+        slot = -1
+        oldest = -1
+        for i in range(self.size):
+            if i == self.controller:
+                continue
+            if self.tokens[i] is None:
+                slot = i
+                break
+            age = time.ticks_diff(now, self.seen[i])
+            if age > oldest:
+                oldest = age
+                slot = i
+        token = "%08x" % random.getrandbits(32)
+        self.tokens[slot] = token
+        self.seen[slot] = now
+        return token
+
+    def find(self, token):
+        """Slot of token, -1 if unknown, marks the session as seen without renewing a lease"""
+        if token is None:
+            return -1
+        for i in range(self.size):
+            if self.tokens[i] == token:
+                self.seen[i] = time.ticks_ms()
+                return i
+        return -1
+
+    def expire(self):
+        """Drop a lapsed lease, True if the controller was just lost"""
+        if self.controller >= 0 and time.ticks_diff(time.ticks_ms(), self.lease_t) > LEASE_MS:
+            self.controller = -1
+            return True
+        return False
+
+    def take(self, slot):
+        """
+        Make slot the controller if the arm is free, True if it controls the arm
+        
+        Called for every command, so the controller's lease is renewed here.
+        """
+        self.expire()
+        if slot < 0:
+            return False
+        if self.controller < 0:
+            self.controller = slot
+        if self.controller != slot:
+            return False
+        self.lease_t = time.ticks_ms()
+        return True
+
+    def release(self, slot):
+        if slot >= 0 and slot == self.controller:
+            self.controller = -1
+
+    def role(self, slot):
+        if self.controller < 0:
+            return ROLE_FREE
+        return ROLE_CONTROLLER if slot == self.controller else ROLE_OBSERVER
+
+    def count(self):
+        """Sessions seen within SESSION_IDLE_MS"""
+        now = time.ticks_ms()
+        n = 0
+        for i in range(self.size):
+            if self.tokens[i] is not None and time.ticks_diff(now, self.seen[i]) < SESSION_IDLE_MS:
+                n += 1
+        return n
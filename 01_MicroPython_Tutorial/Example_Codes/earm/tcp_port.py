@@ -0,0 +1,97 @@
+"""
+eArm TCP port
+The framed serial protocol over a WiFi TCP connection
+
+TcpPort has the readinto() / write() interface of machine.UART, so
+SerialLink and SerialControl use it unchanged. One host connection is
+served at a time and kept open (the host pools it). A new connection
+replaces the old one, so a host that reconnects after a WiFi dropout is
+not locked out by the half-open connection it left behind.
+"""
+
+import errno
+import socket
+import time
+
+DEFAULT_PORT = 5005
+
+
+class TcpPort:
+    """Non-blocking TCP server socket with a single persistent client"""
+    def __init__(self, port=DEFAULT_PORT, host="0.0.0.0"):
+        self.server = socket.socket()
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(socket.getaddrinfo(host, port)[0][-1])
+        self.server.listen(1)
+        self.server.setblocking(False)
+        self.port = port
+        self.conn = None
+        self.peer = None
+        self.connections = 0
+
+    def _accept(self):
+        try:
+            conn, addr = self.server.accept()
+        except OSError:
+            return False
+        conn.setblocking(False)
+        self.drop()
+        self.conn = conn
+        self.peer = addr
+        self.connections += 1
+        # MicroPython streams have readinto(), CPython sockets recv_into()
+        self._readinto = conn.readinto if hasattr(conn, "readinto") else conn.recv_into
+        return True
+
+    def drop(self):
+        """Close the host connection"""
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+            self.conn = None
+
+    def readinto(self, buf):
+        """Bytes received into buf, 0 when nothing is waiting"""
+        if self.conn is None and not self._accept():
+            return 0
+        try:
+            n = self._readinto(buf)
+        except OSError as e:
+            if e.args[0] != errno.EAGAIN:
+                # Connection reset
+                self.drop()
+            n = None
+        if n is None:
+            # Nothing waiting, a reconnecting host takes over
+            self._accept()
+            return 0
+        if n == 0:
+            # Host closed the connection
+            self.drop()
+        return n
+
+    def write(self, data):
+        """Send the whole frame, dropping the connection if the host stops reading"""
+        conn = self.conn
+        if conn is None:
+            return
+        view = memoryview(data)
+        start = time.ticks_ms()
+        while view:
+            try:
+                sent = conn.send(view)
+            except OSError:
+                sent = 0
+            if sent:
+                view = view[sent:]
+            elif time.ticks_diff(time.ticks_ms(), start) > 500:
+                self.drop()
+                return
+            else:
+                time.sleep_ms(1)
+
+    def close(self):
+        self.drop()
+        self.server.close()
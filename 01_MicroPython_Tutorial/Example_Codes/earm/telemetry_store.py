@@ -0,0 +1,268 @@
+"""
+eArm telemetry store
+Fixed-memory history of joint angles, loop timing, heap and command
+latency at several resolutions
+
+    level 0  every sample, the last few seconds
+    level 1  min / max / mean over spans[0] samples (1 s), the last minutes
+    level 2  min / max / mean over spans[1] level 1 records (1 min), the last hour
+
+Every buffer is allocated by the constructor and record() only writes
+into them, so the heap does not grow however long the board runs.
+Level 1 records can also be spilled to flash: they are staged in a
+batch and written by flush() from the application's idle time, into
+spill_files files of at most spill_bytes each (the oldest is dropped).
+
+Dump layout of write() (little endian), read by Host_Tools/telemetry_fetch.py:
+    header  "<4sBBBBHHI"  magic b"ETSD", version, channels, level, values
+                          per channel (1 or 3), records, period ms,
+                          age ms of the newest record
+    data    uint16 * records * values * channels, oldest first; a rollup
+            record holds all minimums, then all maximums, then all means
+
+Spill files hold records of "<I" ticks_ms followed by one level 1 record.
+"""
+
+from array import array
+import os
+import struct
+import time
+
+MAGIC = b"ETSD"
+VERSION = 1
+HEADER = "<4sBBBBHHI"
+
+# Default channels, stored as uint16; heap free is kept in 16 byte units
+CHANNELS = ("a", "b", "c", "d", "busy_us", "latency_us", "heap_free")
+SCALES = (1, 1, 1, 1, 1, 1, 16)
+
+# Level 1 records per flash write
+SPILL_BATCH = 16
+
+
+class Rollup:
+    """Ring of min / max / mean records over a fixed span of inputs"""
+    def __init__(self, channels, size, span):
+        self.channels = channels
+        self.size = size
+        self.span = span
+        self.data = array('H', bytes(6 * channels * size))
+        self.head = 0  # Next record to write
+        self.count = 0
+        self.last = 0  # Offset of the newest record in data
+        self.lo = array('H', bytes(2 * channels))
+        self.hi = array('H', bytes(2 * channels))
+        self.sum = array('l', [0] * channels)
+        self.n = 0
+
+    def fold(self, data, lo, hi, mean):
+        """
+        Add one input, its channels at data[lo:], data[hi:] and data[mean:]
+        (the same offset three times for a raw sample), True when it
+        completed a record
+        """
+        ch = self.channels
+        first = self.n == 0
+        for c in range(ch):
+            v = data[lo + c]
+            if first or v < self.lo[c]:
+                self.lo[c] = v
+            v = data[hi + c]
+            if first or v > self.hi[c]:
+                self.hi[c] = v
+            self.sum[c] = (0 if first else self.sum[c]) + data[mean + c]
+        self.n += 1
+        if self.n < self.span:
+            return False
+        base = 3 * ch * self.head
+        out = self.data
+        for c in range(ch):
+            out[base + c] = self.lo[c]
+            out[base + ch + c] = self.hi[c]
+            out[base + 2 * ch + c] = self.sum[c] // self.n
+        self.last = base
+        self.head = self.head + 1 if self.head + 1 < self.size else 0
+        if self.count < self.size:
+            self.count += 1
+        self.n = 0
+        return True
+
+
+class TelemetryStore:
+    """Multi-resolution telemetry rings with optional flash spill"""
+    def __init__(self, channels=len(CHANNELS), full=300, period_ms=100,
+                 spans=(10, 60), sizes=(120, 60),
+                 spill=None, spill_bytes=65536, spill_files=2):
+        """
+        Parameters:
+            channels: Values per sample
+            full: Samples kept at full rate
+            period_ms: Time between samples, used to label the exports
+            spans: Inputs per record of each rollup level
+            sizes: Records kept per rollup level
+            spill: Flash file for level 1 records, None = no spill
+            spill_bytes: Size of one spill file before it is rotated
+            spill_files: Spill files kept, spill, spill.1, ...
+        """
+        self.channels = channels
+        self.full = full
+        self.period_ms = period_ms
+        self.samples = array('H', bytes(2 * channels * full))
+        self.head = 0
+        self.count = 0
+        self.levels = [Rollup(channels, sizes[i], spans[i]) for i in range(len(spans))]
+        self.newest_t = array('l', [0] * (1 + len(spans)))  # ticks_ms of each level's newest record
+        self.spill = spill
+        self.spill_bytes = spill_bytes
+        self.spill_files = spill_files
+        self.rec_size = 4 + 6 * channels
+        self.batch = bytearray(self.rec_size * SPILL_BATCH) if spill else None
+        self.batch_n = 0
+        self.spill_size = -1  # Size of the current spill file, read on the first flush
+        self.spilled = 0  # Records written to flash
+        self.spill_lost = 0  # Records dropped because flush() came too late
+
+    def record(self, values):
+        """Store one sample (values[0:channels]) and update the rollups"""
+        ch = self.channels
+        base = ch * self.head
+        samples = self.samples
+        for c in range(ch):
+            samples[base + c] = values[c]
+        self.head = self.head + 1 if self.head + 1 < self.full else 0
+        if self.count < self.full:
+            self.count += 1
+        now = time.ticks_ms()
+        newest = self.newest_t
+        newest[0] = now
+        levels = self.levels
+        # A raw sample is its own min, max and mean
+        if not levels[0].fold(samples, base, base, base):
+            return
+        newest[1] = now
+        if self.batch is not None:
+            self._stage(levels[0], now)
+        for k in range(1, len(levels)):
+            src = levels[k - 1]
+            b = src.last
+            if not levels[k].fold(src.data, b, b + ch, b + 2 * ch):
+                return
+            newest[k + 1] = now
+
+    def _stage(self, level, now):
+        """Copy the newest level 1 record into the spill batch"""
+        if self.batch_n == SPILL_BATCH:
+            self.spill_lost += 1
+            return
+        batch = self.batch
+        pos = self.rec_size * self.batch_n
+        for i in range(4):
+            batch[pos + i] = (now >> (8 * i)) & 0xFF
+        pos += 4
+        data = level.data
+        base = level.last
+        for i in range(3 * self.channels):
+            v = data[base + i]
+            batch[pos] = v & 0xFF
+            batch[pos + 1] = v >> 8
+            pos += 2
+        self.batch_n += 1
+
+    def pending(self):
+        """True when a full batch waits for flush()"""
+        return self.batch_n == SPILL_BATCH
+
+    def flush(self, force=False):
+        """
+        Write the staged records to flash, from idle time; only full
+        batches unless force. Returns the records written.
+        """
+        n = self.batch_n
+        if n == 0 or (n < SPILL_BATCH and not force):
+            return 0
+        size = self.rec_size * n
+        if self.spill_size < 0:
+            try:
+                self.spill_size = os.stat(self.spill)[6]
+            except OSError:
+                self.spill_size = 0
+        if self.spill_size + size > self.spill_bytes:
+            self._rotate()
+        with open(self.spill, "ab") as f:
+            f.write(memoryview(self.batch)[:size])
+        self.spill_size += size
+        self.spilled += n
+        self.batch_n = 0
+        return n
+
+    def _rotate(self):
+        """spill -> spill.1 -> spill.2 ..., the oldest file is removed"""
+        last = self.spill_files - 1
+        for i in range(last, 0, -1):
+            src = self.spill if i == 1 else "%s.%d" % (self.spill, i - 1)
+            dst = "%s.%d" % (self.spill, i)
+            try:
+                if i == last:
+                    os.remove(dst)
+            except OSError:
+                pass
+            try:
+                os.rename(src, dst)
+            except OSError:
+                pass
+        if last == 0:
+            try:
+                os.remove(self.spill)
+            except OSError:
+                pass
+        self.spill_size = 0
+
+    def _ring(self, level):
+        """(data, head, count, size, values per channel, period ms) of a level"""
+        if level == 0:
+            return self.samples, self.head, self.count, self.full, 1, self.period_ms
+        r = self.levels[level - 1]
+        period = self.period_ms
+        for k in range(level):
+            period *= self.levels[k].span
+        return r.data, r.head, r.count, r.size, 3, period
+
+    def write(self, stream, level=0):
+        """Binary dump of one level to a stream (socket or file)"""
+        data, head, count, size, per, period = self._ring(level)
+        stride = per * self.channels
+        age = time.ticks_diff(time.ticks_ms(), self.newest_t[level])
+        stream.write(struct.pack(HEADER, MAGIC, VERSION, self.channels, level, per,
+                                 count, period, max(0, age)))
+        view = memoryview(data)
+        start = head - count
+        if start < 0:
+            # Wrapped: the oldest records are at the end of the buffer
+            stream.write(view[(start + size) * stride:size * stride])
+            start = 0
+        if head > start:
+            stream.write(view[start * stride:head * stride])
+
+    def write_csv(self, stream, level=0, names=CHANNELS, scales=SCALES):
+        """
+        CSV of one level, one row per record: t_ms (relative to now, so
+        negative), then the channels (rollups: name_min, name_max, name_mean)
+        """
+        data, head, count, size, per, period = self._ring(level)
+        ch = self.channels
+        stride = per * ch
+        if per == 1:
+            cols = names[:ch]
+        else:
+            cols = [n + s for s in ("_min", "_max", "_mean") for n in names[:ch]]
+        stream.write(("t_ms," + ",".join(cols) + "\n").encode())
+        age = time.ticks_diff(time.ticks_ms(), self.newest_t[level])
+        for r in range(count):
+            i = head - count + r
+            if i < 0:
+                i += size
+            base = i * stride
+            row = [str(-age - (count - 1 - r) * period)]
+            for k in range(stride):
+                row.append(str(data[base + k] * scales[k % ch]))
+            stream.write((",".join(row) + "\n").encode())
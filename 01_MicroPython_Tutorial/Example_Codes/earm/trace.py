@@ -0,0 +1,243 @@
+"""
+eArm input trace
+Records the inputs of the joystick and web applications with their
+times, so that a session on the board can be replayed on the PC by
+Host_Tools/trace_replay.py and gives the same servo output
+
+    joystick  the four joystick readings of every control tick (after the
+              JoyStick filter), the button events and the servo angles
+    web       every request with a query, page loads with their session
+              token, and the jog directions handed to the servos
+
+Timing decides most of these bugs, so while a trace is recorded the
+modules on the control path read the time from a TickClock: a single
+ticks_ms() value per tick (or per request) that is also written to the
+trace. The replay drives the same clock from the trace, so every time
+comparison in the code comes out the same way.
+
+Records are staged in a RAM buffer and appended to the trace file by
+flush(), which the applications call from idle time; a full buffer is
+written at once.
+
+File layout (little endian):
+    header  "<4sBBI4B13H"  magic b"ETRC", version, source, ticks_ms at the
+                           start, servo angles A-D, joystick profile (min,
+                           centre, max of xL, yL, xR, yR) and dead zone
+    records, type byte first, dt is the ms since the previous timed record:
+        T_WAIT     "<H"   dt, time passing without a record
+        T_TICK     "<HB"  dt, change mask, then a uint16 per joystick reading
+                          (mask bits 0-3) and a uint8 per servo angle (bits
+                          4-7) that changed since the previous tick
+        T_BUTTON   "B"    button event, taken by the next tick
+        T_REQUEST  "<HbB" dt, session slot, query length, query
+        T_SESSION  "<HbB" dt, session slot, token length, token
+        T_APPLY    "<HBB" dt, flags, jog directions (2 bits per servo,
+                          1 increase, 3 decrease)
+"""
+
+from array import array
+import struct
+import sys
+import time
+
+from earm.calibration import AXES
+
+MAGIC = b"ETRC"
+VERSION = 1
+HEADER = "<4sBBI4B13H"
+
+# Sources
+SRC_JOYSTICK = 1
+SRC_WEB = 2
+
+# Record types
+T_WAIT = 0
+T_TICK = 1
+T_BUTTON = 2
+T_REQUEST = 3
+T_SESSION = 4
+T_APPLY = 5
+
+# T_APPLY flags
+A_IDLE = 1  # Accept timeout, the controller lease was checked first
+A_LOST = 2  # The lease had expired, every axis was stopped
+
+# Modules whose time is read from the TickClock while tracing
+JOYSTICK_MODULES = ("earm.arm", "earm.playback", "earm.buzzer", "earm.joystick_app")
+WEB_MODULES = ("earm.sessions", "earm.command_intake", "earm.web_control")
+
+
+class TickClock:
+    """Stand-in for the time module, ticks_ms() only moves when latched"""
+    def __init__(self):
+        self.now = time.ticks_ms()
+        self.ticks_us = time.ticks_us
+        self.ticks_add = time.ticks_add
+        self.ticks_diff = time.ticks_diff
+        self.sleep_ms = time.sleep_ms
+        self.sleep_us = time.sleep_us
+
+    def ticks_ms(self):
+        return self.now
+
+
+def install_clock(clock, names):
+    """Make the modules names read their time from clock"""
+    for name in names:
+        sys.modules[name].time = clock
+
+
+def profile_values(profile):
+    """The 13 header values of a JoystickProfile"""
+    values = []
+    for name in AXES:
+        values.extend(profile.axes[name])
+    values.append(profile.dead_zone)
+    return values
+
+
+def directions(servos):
+    """Jog directions of the web servos, 2 bits each"""
+    bits = 0
+    for i in range(len(servos)):
+        bits |= (servos[i].state[1] & 3) << (2 * i)  # earm.servo S_DIR
+    return bits
+
+
+class TraceRecorder:
+    """Staged, timed input records written to a file on flash"""
+    def __init__(self, path, source, angles, profile=None, size=2048):
+        """
+        Parameters:
+            path: Trace file, overwritten
+            source: SRC_JOYSTICK or SRC_WEB
+            angles: Servo angles A-D at the start
+            profile: The 13 joystick profile values, None = zeros
+            size: RAM buffer in bytes
+        """
+        self.path = path
+        self.clock = TickClock()
+        self.buf = bytearray(size)
+        self.n = 0
+        self.last_t = self.clock.now
+        self.readings = array('H', bytes(8))  # Joystick readings of the previous tick
+        self.angles = bytearray(4)  # Servo angles of the previous tick
+        for i in range(4):
+            self.angles[i] = angles[i]
+        self.records = 0
+        self.written = 0
+        with open(path, "wb") as f:
+            f.write(struct.pack(HEADER, MAGIC, VERSION, source, self.last_t,
+                                *(tuple(angles) + tuple(profile or [0] * 13))))
+
+    def install(self, names):
+        """Make the modules names read the time from this trace's clock"""
+        install_clock(self.clock, names)
+
+    def latch(self):
+        """Fix the time read until the next latch, at the start of a tick or request"""
+        self.clock.now = time.ticks_ms()
+
+    def _begin(self, kind, size):
+        """Room for a timed record of up to size bytes, returns the offset after dt"""
+        if self.n + size + 3 > len(self.buf):
+            self.flush()
+        now = self.clock.now
+        dt = time.ticks_diff(now, self.last_t)
+        self.last_t = now
+        buf = self.buf
+        while dt > 65535:
+            if self.n + size + 6 > len(self.buf):
+                self.flush()
+            n = self.n
+            buf[n] = T_WAIT
+            buf[n + 1] = 0xFF
+            buf[n + 2] = 0xFF
+            self.n = n + 3
+            dt -= 65535
+        n = self.n
+        buf[n] = kind
+        buf[n + 1] = dt & 0xFF
+        buf[n + 2] = dt >> 8
+        self.records += 1
+        return n + 3
+
+    def tick(self, readings, angles):
+        """Record a joystick tick: its readings xL, yL, xR, yR and the servo angles after it"""
+        pos = self._begin(T_TICK, 13)
+        buf = self.buf
+        at = pos
+        pos += 1
+        mask = 0
+        last = self.readings
+        for i in range(4):
+            v = readings[i]
+            if v != last[i]:
+                last[i] = v
+                mask |= 1 << i
+                buf[pos] = v & 0xFF
+                buf[pos + 1] = v >> 8
+                pos += 2
+        last = self.angles
+        for i in range(4):
+            v = angles[i]
+            if v != last[i]:
+                last[i] = v
+                mask |= 16 << i
+                buf[pos] = v
+                pos += 1
+        buf[at] = mask
+        self.n = pos
+
+    def button(self, event):
+        """Record a button event, taken by the tick being recorded"""
+        if self.n + 2 > len(self.buf):
+            self.flush()
+        self.buf[self.n] = T_BUTTON
+        self.buf[self.n + 1] = event
+        self.n += 2
+        self.records += 1
+
+    def _text(self, kind, slot, text):
+        data = text.encode()[:255]
+        pos = self._begin(kind, 2 + len(data))
+        buf = self.buf
+        buf[pos] = slot & 0xFF
+        buf[pos + 1] = len(data)
+        buf[pos + 2:pos + 2 + len(data)] = data
+        self.n = pos + 2 + len(data)
+
+    def request(self, slot, req):
+        """Record a request with a query and the session slot it was found in"""
+        line = req.split("\n", 1)[0].split(" ")
+        query = line[1].split("?", 1)[1] if len(line) > 1 and "?" in line[1] else ""
+        self._text(T_REQUEST, slot, query)
+
+    def session(self, slot, token):
+        """Record a page load that opened session slot"""
+        self._text(T_SESSION, slot, token)
+
+    def apply(self, flags, servos):
+        """Record the jog directions handed to the servos"""
+        pos = self._begin(T_APPLY, 2)
+        self.buf[pos] = flags
+        self.buf[pos + 1] = directions(servos)
+        self.n = pos + 2
+
+    def pending(self):
+        """True when the buffer is half full and should be written from idle time"""
+        return self.n > len(self.buf) // 2
+
+    def flush(self):
+        """Append the staged records to the trace file"""
+        if self.n == 0:
+            return
+        with open(self.path, "ab") as f:
+            f.write(memoryview(self.buf)[:self.n])
+        self.written += self.n
+        self.n = 0
+
+    def report(self):
+        """Summary line for the console"""
+        return "Trace: %d records, %d bytes in %s" % (
+            self.records, self.written + self.n, self.path)
@@ -0,0 +1,594 @@
+"""
+eArm Robotic Arm Web Control System
+Real-time button control with automatic servo adjustment
+Optimized for minimal resource usage
+"""
+
+import gc
+import time
+import socket
+import _thread
+from array import array
+
+from earm.buzzer import Buzzer
+from earm.command_intake import CommandIntake
+from earm.gc_policy import GcPolicy
+from earm.adc_capture import AdcCapture
+from earm.http import (RequestReader, parse_request, send_response, send_binary,
+                       close_client, SEND_TIMEOUT_S)
+from earm.log import log, EV_SERVER_ERROR
+from earm.programs import ProgramLibrary, FLAG_FASTEST, FLAG_SMOOTH
+from earm.servo import Servo
+from earm.sessions import SessionTable, ROLE_CONTROLLER
+from earm.telemetry_store import TelemetryStore
+from earm.trace import TraceRecorder, SRC_WEB, WEB_MODULES, A_IDLE, A_LOST
+from earm.wifi import setup_wifi, WIFI_SSID, AP_IP
+
+# Requests answered per burst before the coalesced jog commands are applied
+ACCEPT_BURST = 8
+
+# Telemetry served to the pages is rebuilt at most this often
+TELEMETRY_MS = 200
+ROLE_CODES = "foc"  # Role letter sent to the page, indexed by sessions.ROLE_*
+
+# Playback modes of the page, index = programs FLAG_FASTEST | FLAG_SMOOTH
+PLAY_MODES = ("paced", "fastest", "smooth", "smooth fastest")
+
+# History sample period: 300 samples = 30 s at full rate, then 2 min of
+# 1 s rollups and 1 h of 1 min rollups
+HISTORY_MS = 100
+
+
+class WebControl:
+    """Web page with hold-to-move buttons for the four servos"""
+    def __init__(self, servo_pins=(4, 5, 6, 7), buzzer_pin=9, history_log=None, trace=None):
+        """
+        Parameters:
+            servo_pins: A, B, C, D servo pins (adjust according to actual wiring)
+            buzzer_pin: Buzzer pin
+            history_log: Flash file for 1 s telemetry rollups, e.g.
+                         "telemetry.bin", None = keep them in RAM only
+            trace: File on flash to record the commands to, e.g. "trace.bin",
+                   for Host_Tools/trace_replay.py, None = no trace
+        """
+        # ==================== Hardware Initialization ====================
+        self.servo_A = Servo(pin_num=servo_pins[0])
+        self.servo_B = Servo(pin_num=servo_pins[1])
+        self.servo_C = Servo(pin_num=servo_pins[2])
+        self.servo_D = Servo(pin_num=servo_pins[3], save_mode=1)
+        self.servos = (self.servo_A, self.servo_B, self.servo_C, self.servo_D)
+        self.buzzer = Buzzer(buzzer_pin)
+        self.buzzer_state = False
+        
+        # ==================== Program Playback ====================
+        # Programs saved from the joystick app, the index is read on first use
+        self.library = ProgramLibrary()
+        self.play_name = None  # Program being played, None when idle
+        self.play_stop = False
+        
+        # Jog commands, coalesced per axis over each burst of requests
+        self.intake = CommandIntake()
+        
+        # ==================== Sessions ====================
+        # One controlling page, the others observe
+        self.sessions = SessionTable()
+        self.waiting = []  # (client, slot) telemetry polls of the current burst
+        self.telemetry = [""] * len(ROLE_CODES)  # Cached reply per role
+        self.telemetry_t = 0
+        
+        # ==================== Telemetry History ====================
+        # Angles, burst time, request latency and free heap, see /?history
+        self.history = TelemetryStore(period_ms=HISTORY_MS, spill=history_log)
+        self.sample = array('H', bytes(2 * self.history.channels))
+        self.sample_t = 0
+        self.busy_us = 0  # Longest burst since the last sample
+        self.latency_us = 0  # Slowest request since the last sample
+        
+        # Clients whose request head is still arriving
+        self.reader = RequestReader(self.serve)
+        
+        # Input trace, opened by start_trace()
+        self.trace_path = trace
+        self.trace = None
+        
+        # Collect only when the accept loop is idle and enough was allocated
+        self.gc_policy = GcPolicy()
+    
+    def _playing(self, slot):
+        """False once playback was stopped or another session took the arm"""
+        controller = self.sessions.controller
+        return not self.play_stop and (controller < 0 or controller == slot)
+    
+    def _play_thread(self, name, slot, poses, count, speed, speeds, dwells):
+        """Replay a saved program until stopped, one degree per step"""
+        servos = self.servos
+        while self._playing(slot):
+            for k in range(count):
+                base = 4 * k
+                step_ms = max(1, 15 * 10000 // (speed * max(1, speeds[k])))
+                moving = True
+                while moving and self._playing(slot):
+                    moving = False
+                    for i in range(4):
+                        angle = servos[i].current_angle
+                        target = poses[base + i]
+                        if angle != target:
+                            moving = True
+                            servos[i].set_angle(angle + 1 if target > angle else angle - 1)
+                    time.sleep_ms(step_ms)
+                # Dwell in short sleeps so that stop_program() is not kept waiting
+                wait = dwells[k]
+                while wait > 0 and self._playing(slot):
+                    time.sleep_ms(min(wait, 20))
+                    wait -= 20
+                if not self._playing(slot):
+                    break
+        if self.play_name == name:
+            self.play_name = None
+    
+    def play_program(self, name, slot):
+        """Load a program from flash and start replaying it for session slot"""
+        self.stop_program()
+        count = self.library.length(name)
+        if not count:
+            return
+        poses = bytearray(4 * count)
+        speeds = bytearray(count)
+        dwells = [0] * count
+        loaded = self.library.load(name, poses, speeds, dwells)
+        if loaded is None:
+            return
+        self.play_stop = False
+        self.play_name = name
+        _thread.start_new_thread(self._play_thread, (name, slot, poses, loaded[0], loaded[1], speeds, dwells))
+    
+    def tune_program(self, params):
+        """
+        Change the timing of a saved program, stored with it on flash
+        
+        tune=<name> with any of speed=<sequence %>, mode=<PLAY_MODES index>,
+        or act=<action index> with aspeed=<action %> and / or dwell=<ms>.
+        This page replays with the speeds and dwells, the joystick app
+        also applies the fastest and smooth modes.
+        """
+        try:
+            speed = int(params['speed']) if 'speed' in params else None
+            flags = int(params['mode']) if 'mode' in params else None
+            action = int(params.get('act', -1))
+            action_speed = int(params['aspeed']) if 'aspeed' in params else None
+            dwell = int(params['dwell']) if 'dwell' in params else None
+        except ValueError:
+            return "bad"
+        if flags is not None and not 0 <= flags <= (FLAG_FASTEST | FLAG_SMOOTH):
+            return "bad"
+        if not self.library.tune(params['tune'], speed, flags, action, action_speed, dwell):
+            return "bad"
+        return "ok"
+    
+    def stop_program(self):
+        """Stop the running program and wait for its thread to finish"""
+        self.play_stop = True
+        for _ in range(50):
+            if self.play_name is None:
+                break
+            time.sleep_ms(20)
+    
+    def handle_command(self, params, slot=-1):
+        """
+        Process control commands
+        
+        slot is the sender's session, only the controller may move the arm.
+        A command from any session takes control while the arm is free.
+        A program keeps playing after its session's lease lapses, until
+        another session takes control, or the controller jogs or stops it.
+        """
+        if 'take' in params:
+            if not self.sessions.take(slot):
+                return "busy"
+            self.intake.set_page(params.get('t'))
+            return "ok"
+        if 'release' in params:
+            if self.sessions.role(slot) == ROLE_CONTROLLER:
+                self.sessions.release(slot)
+                self.intake.stop_all(self.servos)
+            return ""
+        if 'stats' in params:
+            return self.intake.report()
+        if not self.sessions.take(slot):
+            return "observer"
+        # The controller's page, jog numbering restarts when control changes hands
+        self.intake.set_page(params.get('t'))
+    
+        # Servo jog buttons, applied by the accept loop after each burst;
+        # jogging takes the arm back from a playing program
+        if self.intake.offer(params):
+            if self.play_name is not None:
+                self.stop_program()
+            return ""
+        # Buzzer - Use different status codes
+        if 'buzzer' in params:
+            if params['buzzer'] == 'on':
+                self.buzzer.on()
+                self.buzzer_state = True
+            elif params['buzzer'] == 'off':
+                self.buzzer.off()
+                self.buzzer_state = False
+        # Saved programs
+        elif 'play' in params:
+            self.play_program(params['play'], slot)
+        elif 'stop' in params:
+            self.stop_program()
+        elif 'tune' in params:
+            return self.tune_program(params)
+        return ""
+    
+    def send_capture(self, client, params):
+        """
+        Capture the joystick ADC channels and send the binary dump
+        
+        /?adc_capture=<frames>&burst=<reads>&period=<us>, for Host_Tools/adc_analyse.py
+        """
+        try:
+            burst = min(32, max(1, int(params.get('burst', '1'))))
+            # At most 16384 samples (32 KB) whatever the burst
+            frames = min(16384 // (4 * burst), max(16, int(params['adc_capture'])))
+            period_us = int(params.get('period', '0'))
+        except ValueError:
+            send_response(client, "Bad capture parameters", "text/plain")
+            return
+        cap = AdcCapture(frames=frames, burst=burst)
+        cap.capture(period_us)
+        send_binary(client, cap)
+        cap = None
+        self.gc_policy.collect()
+    
+    def start_trace(self):
+        """Open the input trace, the request path then reads one time per request"""
+        angles = [servo.current_angle for servo in self.servos]
+        self.trace = TraceRecorder(self.trace_path, SRC_WEB, angles)
+        self.trace.install(WEB_MODULES)
+    
+    def apply_commands(self, idle):
+        """
+        Hand the coalesced jog commands to the servos
+        
+        idle: Called on an accept timeout, drop a lapsed controller lease first
+        """
+        trace = self.trace
+        if trace is not None:
+            trace.latch()
+        lost = idle and self.sessions.expire()
+        if lost:
+            self.intake.stop_all(self.servos)
+        self.intake.apply(self.servos)
+        if trace is not None:
+            trace.apply((A_IDLE if idle else 0) | (A_LOST if lost else 0), self.servos)
+    
+    def record_history(self):
+        """Add a history sample every HISTORY_MS"""
+        now = time.ticks_ms()
+        if time.ticks_diff(now, self.sample_t) < HISTORY_MS:
+            return
+        self.sample_t = now
+        v = self.sample
+        for i in range(4):
+            v[i] = self.servos[i].current_angle
+        v[4] = min(self.busy_us, 65535)
+        v[5] = min(self.latency_us, 65535)
+        v[6] = min(gc.mem_free() // 16, 65535)
+        self.busy_us = 0
+        self.latency_us = 0
+        self.history.record(v)
+    
+    def send_history(self, client, params):
+        """
+        Send one level of the telemetry history
+        
+        /?history=<level 0-2>[&fmt=csv], binary by default, for
+        Host_Tools/telemetry_fetch.py
+        """
+        try:
+            level = int(params['history'] or '0')
+        except ValueError:
+            level = -1
+        if not 0 <= level <= len(self.history.levels):
+            send_response(client, "Bad history level", "text/plain")
+            return
+        csv = params.get('fmt') == 'csv'
+        try:
+            client.settimeout(SEND_TIMEOUT_S)
+            client.sendall(("HTTP/1.1 200 OK\r\nContent-Type: %s\r\nConnection: close\r\n\r\n"
+                            % ("text/csv" if csv else "application/octet-stream")).encode())
+            if csv:
+                self.history.write_csv(client, level)
+            else:
+                self.history.write(client, level)
+        except OSError:
+            pass
+        close_client(client)
+    
+    def refresh_telemetry(self):
+        """Rebuild the cached telemetry replies, at most every TELEMETRY_MS"""
+        now = time.ticks_ms()
+        if self.telemetry[0] and time.ticks_diff(now, self.telemetry_t) < TELEMETRY_MS:
+            return
+        self.telemetry_t = now
+        # A,B,C,D,buzzer,program playing,sessions,role
+        base = "%d,%d,%d,%d,%d,%d,%d," % (
+            self.servo_A.current_angle, self.servo_B.current_angle,
+            self.servo_C.current_angle, self.servo_D.current_angle,
+            self.buzzer_state, self.play_name is not None, self.sessions.count())
+        for role in range(len(ROLE_CODES)):
+            self.telemetry[role] = base + ROLE_CODES[role]
+    
+    def answer_observers(self):
+        """Answer the telemetry polls of a burst, after its commands were applied"""
+        if self.waiting:
+            self.refresh_telemetry()
+            for client, slot in self.waiting:
+                send_response(client, self.telemetry[self.sessions.role(slot)], "text/plain")
+            self.waiting.clear()
+    
+    def generate_html(self, token=""):
+        """Generate HTML with current buzzer state and the page's session token"""
+        wifi_status = "WiFi: Connected"  
+    
+        # Set the initial value based on the current buzzer status
+        buzzer_class = "buzzer-btn" if self.buzzer_state else "buzzer-off"
+        buzzer_icon = "🔊" if self.buzzer_state else "🔇"
+    
+        # Saved programs, the last selected one preselected
+        names = self.library.names()
+        options = "".join(
+            f'<option{" selected" if n == self.library.selected else ""}>{n}</option>' for n in names
+        ) or "<option disabled>No programs</option>"
+        modes = "".join(f'<option value="{i}">{m}</option>' for i, m in enumerate(PLAY_MODES))
+    
+        return f"""<!DOCTYPE html>
+        <html><head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width,initial-scale=1">
+        <title>eArm</title>
+        <style>
+        *{{margin:0;padding:0;box-sizing:border-box;-webkit-tap-highlight-color:transparent}}
+        body{{font-family:Arial,sans-serif;background:#1a1a2e;min-height:100vh;display:flex;justify-content:center;align-items:center;padding:20px}}
+        .container{{width:100%;max-width:500px;background:white;padding:20px;border-radius:20px;box-shadow:0 10px 30px rgba(0,0,0,0.4)}}
+        .header{{text-align:center;margin-bottom:15px;padding-bottom:15px;border-bottom:2px solid #eee}}
+        h1{{color:#333;margin:0 0 10px 0;font-size:28px}}
+        .status{{background:#f0f8ff;padding:12px;border-radius:10px;text-align:center;margin-bottom:20px;font-size:16px;font-weight:bold}}
+        .wifi-connected{{color:#27ae60;background:#d5f4e6;border-left:5px solid #27ae60}}
+        .servo-list{{display:flex;flex-direction:column;gap:15px;margin-bottom:10px}}
+        .servo-card{{background:#f8f9fa;padding:15px;border-radius:15px;border:2px solid #e9ecef;display:flex;align-items:center;justify-content:space-between;height:100px}}
+        .servo-label{{display:flex;flex-direction:column;align-items:center;justify-content:center;flex:1;padding:0 15px}}
+        .servo-icon{{font-size:32px;margin-bottom:5px}}
+        .control-btn{{width:70px;height:70px;border:none;border-radius:12px;font-size:30px;font-weight:bold;cursor:pointer;user-select:none;touch-action:manipulation;display:flex;align-items:center;justify-content:center;transition:transform 0.1s}}
+        .control-btn:active{{transform:scale(0.95)}}
+        .minus-btn{{background:#e74c3c;color:white}}
+        .minus-btn.active{{background:#c0392b}}
+        .plus-btn{{background:#2ecc71;color:white}}
+        .plus-btn.active{{background:#27ae60}}
+        .function-buttons{{display:grid;grid-template-columns:1fr;gap:12px;margin-top:25px}}
+        .func-btn{{padding:18px;border:none;border-radius:12px;font-size:18px;font-weight:bold;cursor:pointer;color:white;display:flex;align-items:center;justify-content:center;gap:10px}}
+        .buzzer-btn{{background:#f39c12}}
+        .buzzer-off{{background:#7f8c8d}}
+        .program{{display:flex;gap:10px}}
+        .program select{{flex:1;padding:12px;border-radius:12px;font-size:18px}}
+        .program input{{width:80px;padding:12px;border-radius:12px;font-size:18px}}
+        .play-btn{{background:#3498db}}
+        .take-btn{{background:#8e44ad;margin-bottom:20px;width:100%}}
+        .ro .servo-list,.ro .function-buttons{{opacity:.4;pointer-events:none}}
+        .footer{{text-align:center;color:#7f8c8d;font-size:14px;padding-top:15px;margin-top:15px;border-top:1px solid #eee}}
+        </style></head>
+        <body>
+        <div class="container">
+        <div class="header"><h1>eArm</h1></div>
+        <div class="status wifi-connected"><div id="st">{wifi_status}</div><div id="ang"></div></div>
+        <button class="func-btn take-btn" id="take" onclick="c('take=1')">Take control</button>
+        <div class="servo-list">
+        <div class="servo-card">
+        <button class="control-btn minus-btn" id="a_minus" onmousedown="h('a','minus')" onmouseup="r('a','minus')" ontouchstart="h('a','minus')" ontouchend="r('a','minus')">➖</button>
+        <div class="servo-label"><div class="servo-icon">🔄</div></div>
+        <button class="control-btn plus-btn" id="a_plus" onmousedown="h('a','plus')" onmouseup="r('a','plus')" ontouchstart="h('a','plus')" ontouchend="r('a','plus')">➕</button>
+        </div>
+        <div class="servo-card">
+        <button class="control-btn minus-btn" id="b_minus" onmousedown="h('b','minus')" onmouseup="r('b','minus')" ontouchstart="h('b','minus')" ontouchend="r('b','minus')">➖</button>
+        <div class="servo-label"><div class="servo-icon">🦾</div></div>
+        <button class="control-btn plus-btn" id="b_plus" onmousedown="h('b','plus')" onmouseup="r('b','plus')" ontouchstart="h('b','plus')" ontouchend="r('b','plus')">➕</button>
+        </div>
+        <div class="servo-card">
+        <button class="control-btn minus-btn" id="c_minus" onmousedown="h('c','minus')" onmouseup="r('c','minus')" ontouchstart="h('c','minus')" ontouchend="r('c','minus')">➖</button>
+        <div class="servo-label"><div class="servo-icon">🦾</div></div>
+        <button class="control-btn plus-btn" id="c_plus" onmousedown="h('c','plus')" onmouseup="r('c','plus')" ontouchstart="h('c','plus')" ontouchend="r('c','plus')">➕</button>
+        </div>
+        <div class="servo-card">
+        <button class="control-btn minus-btn" id="d_minus" onmousedown="h('d','minus')" onmouseup="r('d','minus')" ontouchstart="h('d','minus')" ontouchend="r('d','minus')">➖</button>
+        <div class="servo-label"><div class="servo-icon">🫳</div></div>
+        <button class="control-btn plus-btn" id="d_plus" onmousedown="h('d','plus')" onmouseup="r('d','plus')" ontouchstart="h('d','plus')" ontouchend="r('d','plus')">➕</button>
+        </div>
+        </div>
+        <div class="function-buttons">
+        <button class="func-btn {buzzer_class}" id="buzzerButton" onclick="t()">
+        <span id="buzzerIcon">{buzzer_icon}</span>
+        <span id="buzzerText">BUZZER</span>
+        </button>
+        <div class="program">
+        <select id="prog">{options}</select>
+        <button class="func-btn play-btn" onclick="c('play='+e('prog').value)">▶</button>
+        <button class="func-btn buzzer-off" onclick="c('stop=1')">⏹</button>
+        </div>
+        <div class="program">
+        <input id="spd" type="number" min="10" max="400" value="100" title="Sequence speed %">
+        <select id="mode">{modes}</select>
+        <button class="func-btn play-btn" onclick="c('tune='+e('prog').value+'&speed='+e('spd').value+'&mode='+e('mode').value)">Set</button>
+        </div>
+        <div class="program">
+        <input id="act" type="number" min="1" value="1" title="Action">
+        <input id="asp" type="number" min="1" max="255" value="100" title="Action speed %">
+        <input id="dw" type="number" min="0" max="65535" value="300" title="Dwell ms">
+        <button class="func-btn play-btn" onclick="c('tune='+e('prog').value+'&act='+(e('act').value-1)+'&aspeed='+e('asp').value+'&dwell='+e('dw').value)">Set</button>
+        </div>
+        </div>
+        <div class="footer"><p>eArm Control System</p></div>
+        </div>
+        <script>
+        var buzzerState = {str(self.buzzer_state).lower()};
+        var T='{token}',N=0,H={{}};
+        function c(q){{return fetch('/?'+q+'&t='+T,{{cache:'no-cache'}}).catch(()=>{{}})}}
+        function h(s,d){{e(s+'_'+d).classList.add('active');f(s,d,'1');clearInterval(H[s]);H[s]=setInterval(()=>f(s,d,'1'),300)}}
+        function r(s,d){{e(s+'_'+d).classList.remove('active');clearInterval(H[s]);f(s,d,'0')}}
+        function f(s,d,st){{c(s+'_'+d+'='+st+'&n='+(++N))}}
+        function t(){{
+        buzzerState = !buzzerState;
+        var b = e('buzzerButton');
+        var i = e('buzzerIcon');
+        var t = e('buzzerText');
+        if(buzzerState){{
+        b.className = 'func-btn buzzer-btn';
+        i.textContent = '🔊';
+        c('buzzer=on');
+        }}else{{
+        b.className = 'func-btn buzzer-off';
+        i.textContent = '🔇';
+        c('buzzer=off');
+        }}
+        }}
+        function e(id){{return document.getElementById(id)}}
+        function u(){{fetch('/?tm=1&t='+T).then(r=>r.text()).then(s=>{{
+        var v=s.split(','),R=v[7];
+        e('st').textContent=R=='c'?'You control the arm':R=='o'?'Observing, another device controls the arm':'Arm free';
+        e('ang').textContent='A '+v[0]+'° B '+v[1]+'° C '+v[2]+'° D '+v[3]+'° · '+v[6]+' connected';
+        e('take').style.display=R=='c'?'none':'';
+        document.body.className=R=='o'?'ro':''}}).catch(()=>{{}}).finally(()=>setTimeout(u,500))}}
+        window.onload = u;
+        window.onbeforeunload = () => {{['a','b','c','d'].forEach(s => ['minus','plus'].forEach(d => f(s,d,'0')));c('release=1')}}
+        </script>
+        </body></html>"""
+    
+    def run(self):
+        """Main program loop"""
+        print("Starting eArm Control System...")
+        ap = setup_wifi()
+    
+        # Initialize servos
+        self.servo_A.set_angle(90)
+        self.servo_B.set_angle(120)
+        self.servo_C.set_angle(60)
+        self.servo_D.set_angle(90)
+    
+        if self.trace_path is not None:
+            self.start_trace()
+    
+        # Setup server
+        s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    
+        try:
+            s.bind(('0.0.0.0', 80))
+        except Exception as e:
+            print("Bind error:", e)
+            return
+    
+        s.listen(5)
+        self.gc_policy.begin()
+        print("Server on port 80")
+        print("Connect to: " + WIFI_SSID)
+        print("URL: http://" + AP_IP)
+    
+        reader = self.reader
+        while True:
+            client = None
+            try:
+                # Short waits while request heads are still arriving
+                s.settimeout(0.01 if reader.count else 0.1)
+                try:
+                    client, addr = s.accept()
+                except OSError:
+                    # Accept timeout, finish the slow requests that arrived
+                    if reader.poll():
+                        self.apply_commands(False)
+                        self.answer_observers()
+                    # Nobody is waiting for a response
+                    self.apply_commands(True)
+                    self.answer_observers()
+                    self.record_history()
+                    if self.history.pending():
+                        # Flash writes only while nobody waits for an answer
+                        self.history.flush()
+                    elif self.trace is not None and self.trace.pending():
+                        self.trace.flush()
+                    elif log.count:
+                        log.flush()
+                    elif self.gc_policy.due():
+                        self.gc_policy.collect()
+                    continue
+                # Answer the whole backlog first, then move once with the
+                # newest command per axis
+                s.settimeout(0)
+                t0 = time.ticks_us()
+                for _ in range(ACCEPT_BURST):
+                    reader.add(client)
+                    client = None
+                    try:
+                        client, addr = s.accept()
+                    except OSError:
+                        break
+                if client is not None:
+                    reader.add(client)
+                    client = None
+                reader.poll()
+                self.apply_commands(False)
+                self.answer_observers()
+                busy = time.ticks_diff(time.ticks_us(), t0)
+                if busy > self.busy_us:
+                    self.busy_us = busy
+                self.record_history()
+            
+            except Exception as e:
+                log.event(EV_SERVER_ERROR, e)
+                if client is not None:
+                    close_client(client)
+    
+    def serve(self, client, req):
+        """Answer one request head from the RequestReader, telemetry polls wait in self.waiting"""
+        t0 = time.ticks_us()
+        trace = self.trace
+        if trace is not None:
+            trace.latch()
+        if '?' in req:
+            params = parse_request(req)
+            slot = self.sessions.find(params.get('t'))
+            if trace is not None:
+                trace.request(slot, req)
+            if 'tm' in params:
+                self.waiting.append((client, slot))
+            elif 'status_check' in params:
+                send_response(client, "OK", "text/plain")
+            elif 'adc_capture' in params:
+                self.send_capture(client, params)
+            elif 'history' in params:
+                self.send_history(client, params)
+            else:
+                send_response(client, self.handle_command(params, slot), "text/plain")
+        else:
+            # Every page load is a new session
+            token = self.sessions.open() if req.startswith("GET / ") else ""
+            if token and trace is not None:
+                trace.session(self.sessions.tokens.index(token), token)
+            send_response(client, self.generate_html(token), "text/html")
+        latency = time.ticks_diff(time.ticks_us(), t0)
+        if latency > self.latency_us:
+            self.latency_us = latency
+    
+    def deinit(self):
+        """Stop playback, write out the logs and release the servos and buzzer"""
+        self.stop_program()
+        if self.history.batch is not None:
+            self.history.flush(force=True)
+        log.drain()
+        if self.trace is not None:
+            self.trace.flush()
+        self.servo_A.deinit()
+        self.servo_B.deinit()
+        self.servo_C.deinit()
+        self.servo_D.deinit()
+        self.buzzer.off()
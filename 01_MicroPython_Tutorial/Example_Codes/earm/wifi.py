@@ -0,0 +1,113 @@
+"""
+eArm WiFi setup
+
+Access point (the default, every arm is its own "eArm" network at
+192.168.4.1) or station mode, joining an existing network so several
+arms can be reached from one PC. The mode comes from wifi.json:
+
+    {"mode": "sta", "ssid": "lab", "password": "secret",
+     "ip": "192.168.1.51", "netmask": "255.255.255.0",
+     "gateway": "192.168.1.1", "dns": "192.168.1.1", "hostname": "earm-1"}
+
+"ip" may be left out to use DHCP. Without the file the board starts an
+access point as before.
+"""
+
+import time
+import json
+import network
+
+WIFI_SSID = "eArm"
+AP_IP = "192.168.4.1"
+CONFIG_FILE = "wifi.json"
+
+
+def setup_wifi(ssid=WIFI_SSID, ip=AP_IP):
+    """Configure ESP32 as WiFi Access Point"""
+    ap = network.WLAN(network.AP_IF)
+    ap.active(True)
+    ap.config(essid=ssid, authmode=network.AUTH_OPEN)
+    ap.ifconfig((ip, '255.255.255.0', ip, ip))
+    
+    for i in range(10):
+        if ap.active():
+            print("WiFi AP active")
+            break
+        time.sleep(0.5)
+    
+    print("=" * 40)
+    print("SSID: " + ssid)
+    print("IP: " + ip)
+    print("=" * 40)
+    return ap
+
+
+def connect_station(ssid, password, ip=None, netmask="255.255.255.0", gateway=None, dns=None,
+                    hostname=None, timeout_ms=15000):
+    """
+    Join an existing network
+
+    Parameters:
+        ip: Static address, None = DHCP
+        hostname: Name announced to the network (mDNS / DHCP), e.g. "earm-1"
+    Returns:
+        The WLAN interface, its address is in ifconfig()[0]
+    Raises:
+        OSError if the network could not be joined within timeout_ms
+    """
+    sta = network.WLAN(network.STA_IF)
+    sta.active(True)
+    if hostname:
+        try:
+            network.hostname(hostname)
+        except (AttributeError, ValueError):
+            pass
+    if ip:
+        gateway = gateway or ip
+        sta.ifconfig((ip, netmask, gateway, dns or gateway))
+    if not sta.isconnected():
+        sta.connect(ssid, password)
+        start = time.ticks_ms()
+        while not sta.isconnected():
+            if time.ticks_diff(time.ticks_ms(), start) > timeout_ms:
+                sta.active(False)
+                raise OSError("WiFi: could not join " + ssid)
+            time.sleep_ms(100)
+
+    print("=" * 40)
+    print("Joined: " + ssid)
+    print("IP: " + sta.ifconfig()[0])
+    print("=" * 40)
+    return sta
+
+
+def load_config(path=CONFIG_FILE):
+    """Network settings from flash, None if there are none"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def setup_network(path=CONFIG_FILE):
+    """
+    Station or access point as configured in path
+
+    Returns the board's IP address. Falls back to the access point when
+    the configured network cannot be joined.
+    """
+    config = load_config(path)
+    if config and config.get("mode") == "sta":
+        try:
+            sta = connect_station(config["ssid"], config.get("password", ""),
+                                  ip=config.get("ip"), netmask=config.get("netmask", "255.255.255.0"),
+                                  gateway=config.get("gateway"), dns=config.get("dns"),
+                                  hostname=config.get("hostname"))
+            return sta.ifconfig()[0]
+        except (OSError, KeyError) as e:
+            print("Station mode failed:", e)
+    ap = config if config and config.get("mode") == "ap" else {}
+    ip = ap.get("ip", AP_IP)
+    setup_wifi(ap.get("ssid", WIFI_SSID), ip)
+    return ip
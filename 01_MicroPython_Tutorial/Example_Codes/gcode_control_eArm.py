@@ -0,0 +1,38 @@
+# gcode_control_eArm.py
+# MicroPython version for ESP32-C3
+# This code applies to siyeenove mechanical arm
+# Through this link you can download the source code:
+# https://github.com/siyeenove
+# Company web site:
+# https://siyeenove.com/
+#
+# The arm runs G-code from a PC: G0/G1 moves of the joints A-D in degrees
+# with F in deg/min, G4 dwell, M3/M5 to close and open the claw (see
+# earm/gcode.py). Any G-code sender that waits for "ok" works on the USB
+# serial port; Host_Tools/gcode_send.py streams files over serial, TCP
+# or HTTP. While it runs, Ctrl-C is disabled on the REPL; reset the
+# board to get the prompt back.
+from earm.gcode_control import GcodeControl
+
+# True: join the WiFi of wifi.json (or open the "eArm" access point) and
+# take G-code on TCP port 23 and as HTTP POST /gcode on port 80 instead
+USE_WIFI = False
+TCP_PORT = 23
+
+
+def main():
+    port = None
+    http_port = None
+    if USE_WIFI:
+        from earm.tcp_port import TcpPort
+        from earm.wifi import setup_network
+        ip = setup_network()
+        port = TcpPort(TCP_PORT)
+        http_port = 80
+        print("G-code on %s:%d and http://%s/gcode" % (ip, TCP_PORT, ip))
+    app = GcodeControl(servo_pins=(4, 5, 6, 7), port=port, http_port=http_port, rate_hz=100)
+    app.run()
+
+
+if __name__ == "__main__":
+    main()
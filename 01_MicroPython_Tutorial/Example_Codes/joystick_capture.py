@@ -0,0 +1,35 @@
+# joystick_capture.py
+# MicroPython version for ESP32-C3
+# High rate capture of the four joystick channels for noise analysis.
+#
+# Run it from the PC with the host analyser, which reads the dump from
+# the serial port:
+#     python Host_Tools/adc_analyse.py --port /dev/ttyACM0
+# or start it by hand and save the binary between the EADC markers.
+import sys
+import gc
+
+from earm.adc_capture import AdcCapture, JOYSTICK_PINS
+
+# Frames and reads per channel and frame:
+#   BURST = 1   -> noise spectrum, one read per channel at the highest rate
+#   BURST = 20  -> same read pattern as JoyStick, shows the settling after
+#                  each channel switch (keep FRAMES small, RAM is limited)
+FRAMES = 2048
+BURST = 1
+PERIOD_US = 0  # 0 = fastest stable rate
+
+
+def main(frames=FRAMES, burst=BURST, period_us=PERIOD_US):
+    gc.collect()
+    cap = AdcCapture(JOYSTICK_PINS, frames, burst)
+    cap.capture(period_us)
+    # Text markers around the binary so the host can find it in the REPL output
+    print("EADC-BEGIN %d" % cap.size())
+    cap.write(sys.stdout.buffer)
+    print()
+    print("EADC-END period %d us, %d late frames" % (cap.period_us, cap.late))
+
+
+if __name__ == "__main__":
+    main()
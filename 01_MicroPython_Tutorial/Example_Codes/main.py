@@ -1,18 +1,37 @@
 """
-This is a Python script executor that will:
-    1. Scan all files in the current directory
+This is a Python script launcher that will:
+    1. Read the launch order from launcher.json when it exists,
+       otherwise scan all files in the current directory and call
+       main() of each module that has one
     2. Skip the boot.py and main.py files
-    3. Only execute files with .py extensions
-    4. Ensure only files are executed (not directories)
+    3. Import each enabled module (.py, or precompiled .mpy when available)
+       and report the start-up time and heap it used
+    4. Call the entry functions in the same order, once every module
+       is imported (an application's entry usually never returns)
+
+A module that fails to import, or has no such entry, is reported and
+skipped, the others are still launched.
+
+Manifest format (launcher.json):
+    {"modules": [
+        {"module": "joystick_control_eArm", "enabled": true, "entry": "main"},
+        {"module": "web_app_control_eArm", "enabled": false, "entry": "main"}
+    ]}
 """
 #!/opt/bin/lv_micropython
 # Import MicroPython specific modules
-import uos as os           # MicroPython's os module 
-import uerrno as errno     # MicroPython's errno module
+import uos as os           # MicroPython's os module
+import sys
+import time
+import gc
 
-# Get directory iterator for listing files in current directory
-# os.ilistdir() returns an iterator of directory entries
-iter = os.ilistdir()
+MANIFEST = "launcher.json"
+DEFAULT_ENTRY = "main"  # Entry called without manifest, when a module has it
+
+# Folder with precompiled .mpy files staged by the host build step.
+# MicroPython prefers a .py over an .mpy in the same folder, so this
+# folder is searched first to make the precompiled bytecode win.
+MPY_DIR = "mpy"
 
 # File type constants for directory entries
 # These constants come from stat
@@ -20,58 +39,125 @@ iter = os.ilistdir()
 IS_DIR = 0x4000      # Flag indicating the entry is a directory
 IS_REGULAR = 0x8000  # Flag indicating the entry is a regular file
 
-# Main loop: Process each entry in the directory
-while True:
+
+def load_manifest():
+    """Return a list of (module, entry) to launch, or None without manifest"""
     try:
-        # Get next directory entry using iterator
-        # Each entry is a tuple: (name, type, inode[, size])
-        entry = next(iter)
-        
-        # Extract filename (first element of tuple)
+        import json
+        with open(MANIFEST) as f:
+            manifest = json.load(f)
+    except OSError:
+        return None
+
+    plan = []
+    for item in manifest.get("modules", []):
+        if item.get("enabled", True):
+            plan.append((item["module"], item.get("entry")))
+    return plan
+
+
+def scan_directory():
+    """
+    Every .py / .mpy file in the current directory, in directory order
+
+    The entry is DEFAULT_ENTRY, called only when the module defines it.
+    """
+    plan = []
+    # os.ilistdir() returns an iterator of directory entries
+    # Each entry is a tuple: (name, type, inode[, size])
+    for entry in os.ilistdir():
         filename = entry[0]
-        
-        # Extract file type (second element of tuple)
-        # This indicates if it's a file, directory, etc.
-        file_type = entry[1]
-        
+
         # Skip system files that should not be executed
         # boot.py: Runs on boot, should not be executed manually
         # main.py: Main application file, should be run separately
         if filename == 'boot.py' or filename == 'main.py':
-            continue  # Skip to next file
-            
+            continue
+
+        # Directories are only identified, not processed further
+        if entry[1] == IS_DIR:
+            continue
+
+        if filename.endswith('.py'):
+            name = filename[:-3]
+        elif filename.endswith('.mpy'):
+            name = filename[:-4]
         else:
-            # Print separator for visual clarity in output
-            print("===============================")
-            
-            # Print filename without newline (end="")
-            print(filename, end="")
-            
-            # Check if current entry is a directory
-            if file_type == IS_DIR:
-                print(", File is a directory")
-                print("===============================")
-                # Note: Directories are only identified, not processed further
-                
-            else:
-                # For regular files, just close the filename line
-                print("\n===============================")
-                
-                # Originally commented code that would print file contents:
-                # print("Contents:")
-                # with open(filename) as f:
-                #    for line in enumerate(f):
-                #        print("{}".format(line[1]),end="")
-                # print("")
-                
-                # Actually execute the Python file
-                # exec() runs the code in the file with global context
-                # open(filename).read() reads the entire file content
-                # globals() provides the current global
-                # namespace to the executed code
-                exec(open(filename).read(), globals())
-                
-    # StopIteration exception is raised when iterator has no more items
-    except StopIteration:
-        break  # Exit the infinite while loop
-    
\ No newline at end of file
+            continue
+        if (name, DEFAULT_ENTRY) not in plan:
+            plan.append((name, DEFAULT_ENTRY))
+    return plan
+
+
+def source_of(name):
+    """Which file the import will use, for the report"""
+    for folder in sys.path:
+        for ext in ('.py', '.mpy'):
+            path = (folder + '/' if folder else '') + name + ext
+            try:
+                os.stat(path)
+                return path
+            except OSError:
+                pass
+    return name
+
+
+def launch(name):
+    """Import one module and report the cost, returns the module"""
+    # Print separator for visual clarity in output
+    print("===============================")
+    print(name)
+    print("===============================")
+
+    gc.collect()
+    mem = gc.mem_free()
+    start = time.ticks_us()
+
+    # Each module gets its own namespace, and a module imported twice is
+    # taken from sys.modules instead of being compiled again
+    module = __import__(name)
+
+    used_ms = time.ticks_diff(time.ticks_us(), start) / 1000
+    gc.collect()
+    print("[launcher] %s: %.1f ms, %d bytes heap (%s)" % (
+        name, used_ms, mem - gc.mem_free(), source_of(name)))
+    return module
+
+
+# Search the precompiled bytecode folder first when it exists
+try:
+    os.stat(MPY_DIR)
+    sys.path.insert(0, MPY_DIR)
+except OSError:
+    pass
+
+plan = load_manifest()
+scanned = plan is None
+if scanned:
+    plan = scan_directory()
+
+boot_start = time.ticks_ms()
+entries = []
+for name, entry in plan:
+    try:
+        module = launch(name)
+    except Exception as e:
+        # A broken module must not keep the others from starting
+        print("[launcher] %s: %s: %s" % (name, type(e).__name__, e))
+        continue
+    if not entry:
+        continue
+    func = getattr(module, entry, None)
+    if func is not None:
+        entries.append((name, func))
+    elif not scanned:
+        print("[launcher] %s: no entry %s()" % (name, entry))
+
+print("[launcher] ready in %d ms, %d bytes free" % (
+    time.ticks_diff(time.ticks_ms(), boot_start), gc.mem_free()))
+
+for name, func in entries:
+    try:
+        func()
+    except Exception as e:
+        print("[launcher] %s: %s: %s" % (name, type(e).__name__, e))
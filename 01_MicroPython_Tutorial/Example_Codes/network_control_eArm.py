@@ -0,0 +1,28 @@
+# network_control_eArm.py
+# MicroPython version for ESP32-C3
+# This code applies to siyeenove mechanical arm
+# Through this link you can download the source code:
+# https://github.com/siyeenove
+# Company web site:
+# https://siyeenove.com/
+#
+# The arm follows commands from a PC over WiFi, using the same framed
+# protocol as serial_control_eArm.py on TCP port 5005. Put a wifi.json
+# on the board to join your network (see earm/wifi.py), otherwise the
+# board opens its own "eArm" access point at 192.168.4.1.
+# Host_Tools/earm_host drives one arm (ArmClient.connect) or many
+# (Fleet) from a PC.
+from earm.serial_control import SerialControl
+from earm.tcp_port import TcpPort, DEFAULT_PORT
+from earm.wifi import setup_network
+
+
+def main():
+    ip = setup_network()
+    print("Listening on %s:%d" % (ip, DEFAULT_PORT))
+    app = SerialControl(servo_pins=(4, 5, 6, 7), port=TcpPort(DEFAULT_PORT), rate_hz=100)
+    app.run()
+
+
+if __name__ == "__main__":
+    main()
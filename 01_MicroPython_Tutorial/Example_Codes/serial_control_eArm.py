@@ -0,0 +1,26 @@
+# serial_control_eArm.py
+# MicroPython version for ESP32-C3
+# This code applies to siyeenove mechanical arm
+# Through this link you can download the source code:
+# https://github.com/siyeenove
+# Company web site:
+# https://siyeenove.com/
+#
+# The arm follows commands from a PC over the USB serial link, see
+# Host_Tools/earm_host for the client library. While it runs, Ctrl-C is
+# disabled on the REPL; reset the board to get the prompt back.
+from earm.serial_control import SerialControl
+
+# To use a dedicated UART instead of the USB serial REPL:
+#     from machine import UART
+#     port = UART(1, baudrate=115200, tx=20, rx=21, timeout=0)
+port = None
+
+
+def main():
+    app = SerialControl(servo_pins=(4, 5, 6, 7), port=port, rate_hz=100)
+    app.run()
+
+
+if __name__ == "__main__":
+    main()
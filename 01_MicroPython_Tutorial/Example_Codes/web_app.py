@@ -1,18 +1,31 @@
 """
 eArm Robotic Arm Web Control System
+
+Button presses are logged with earm.log and written to the console
+while the server waits for the next request, upload the earm folder
+to the board together with this file.
+
+Requests are read with earm.http.RequestReader, a client that is slow
+to send its request does not hold up the others.
 """
 
 from machine import Pin
 import time
 import network
 import socket
-import gc
 import _thread
 
+from earm.gc_policy import GcPolicy
+from earm.http import RequestReader, parse_request, send_response, close_client, report
+from earm.log import log, EV_BUTTON, EV_BUZZER, EV_SERVER_ERROR
+
 # ==================== WiFi Setup ====================
 WIFI_SSID = "eArm"
 AP_IP = "192.168.4.1"
 
+# Idle time offered to a garbage collection on an accept timeout
+GC_SLOT_US = 5000
+
 buzzer_state = False
 
 def setup_wifi():
@@ -41,52 +54,46 @@ def handle_command(params):
     
     # Servo A
     if 'a_minus' in params:
-        print("Press the - button of servo_A.") if params['a_minus'] == '1' else print("Release the - button of servo_A.")
+        log.event(EV_BUTTON, 'a_minus', params['a_minus'])
     elif 'a_plus' in params:
-        print("Press the + button of servo_A.") if params['a_plus'] == '1' else print("Release the + button of servo_A.")
+        log.event(EV_BUTTON, 'a_plus', params['a_plus'])
     # Servo B
     elif 'b_minus' in params:
-        print("Press the - button of servo_B.") if params['b_minus'] == '1' else print("Release the - button of servo_B.")
+        log.event(EV_BUTTON, 'b_minus', params['b_minus'])
     elif 'b_plus' in params:
-        print("Press the + button of servo_B.") if params['b_plus'] == '1' else print("Release the + button of servo_B.")
+        log.event(EV_BUTTON, 'b_plus', params['b_plus'])
     # Servo C
     elif 'c_minus' in params:
-        print("Press the - button of servo_C.") if params['c_minus'] == '1' else  print("Release the - button of servo_C.")
+        log.event(EV_BUTTON, 'c_minus', params['c_minus'])
     elif 'c_plus' in params:
-        print("Press the + button of servo_C.") if params['c_plus'] == '1' else print("Release the + button of servo_C.")
+        log.event(EV_BUTTON, 'c_plus', params['c_plus'])
     # Servo D
     elif 'd_minus' in params:
-        print("Press the - button of servo_D.") if params['d_minus'] == '1' else print("Release the - button of servo_D.")
+        log.event(EV_BUTTON, 'd_minus', params['d_minus'])
     elif 'd_plus' in params:
-        print("Press the + button of servo_D.") if params['d_plus'] == '1' else print("Release the + button of servo_D.")
+        log.event(EV_BUTTON, 'd_plus', params['d_plus'])
     # Buzzer - Use different status codes
     elif 'buzzer' in params:
         if params['buzzer'] == 'on':
             buzzer_state = True
-            print("Buzzer ON")
+            log.event(EV_BUZZER, "on")
         elif params['buzzer'] == 'off':
             buzzer_state = False
-            print("Buzzer OFF")
+            log.event(EV_BUZZER, "off")
     return ""
 
-def parse_request(req):
-    """Extract URL parameters from HTTP request"""
-    lines = req.split('\n')
-    if lines:
-        first = lines[0].split(' ')
-        if len(first) > 1 and '?' in first[1]:
-            query = first[1].split('?')[1]
-            return {k:v for k,v in (p.split('=',1) for p in query.split('&') if '=' in p)}
-    return {}
-
-def send_response(client, content, ctype="text/html"):
-    """Send HTTP response"""
-    try:
-        resp = f"HTTP/1.1 200 OK\r\nContent-Type: {ctype}\r\nConnection: close\r\n\r\n{content}"
-        client.send(resp)
-        client.close()
-    except:
-        pass
+def handle_request(client, req):
+    """Answer one request head from the RequestReader"""
+    if '?' in req:
+        params = parse_request(req)
+        if 'status_check' in params:
+            send_response(client, "OK", "text/plain")
+        else:
+            handle_command(params)
+            send_response(client, "", "text/plain")
+    else:
+        html = generate_html()
+        send_response(client, html, "text/html")
 
 # ==================== HTML Generation ====================
 def generate_html():
@@ -208,37 +215,31 @@ def main():
     print("Connect to: " + WIFI_SSID)
     print("URL: http://" + AP_IP)
     
+    reader = RequestReader(handle_request)
+    # Collect on accept timeouts, once enough was allocated
+    gc_policy = GcPolicy()
+    gc_policy.begin()
     while True:
+        client = None
         try:
-            s.settimeout(0.1)
+            # Short waits while request heads are still arriving
+            s.settimeout(0.01 if reader.count else 0.1)
             try:
                 client, addr = s.accept()
-                req = client.recv(1024).decode()
-                
-                if req:
-                    if '?' in req:
-                        params = parse_request(req)
-                        if 'status_check' in params:
-                            send_response(client, "OK", "text/plain")
-                        else:
-                            handle_command(params)
-                            send_response(client, "", "text/plain")
-                    else:
-                        html = generate_html()
-                        send_response(client, html, "text/html")
-                else:
-                    client.close()
+                reader.add(client)
+                client = None
             except OSError:
-                pass
-            
-            gc.collect()
-            
+                # Accept timeout, write the logged events while nobody waits
+                log.flush()
+                gc_policy.idle(GC_SLOT_US)
+            reader.poll()
+            # One event per pass as well, so steady traffic does not
+            # leave the ring to be overwritten
+            log.flush(1)
         except Exception as e:
-            print("Error:", e)
-            try:
-                client.close()
-            except:
-                pass
+            log.event(EV_SERVER_ERROR, e)
+            if client is not None:
+                close_client(client)
 
 # ==================== Entry Point ====================
 if __name__ == "__main__":
@@ -246,3 +247,4 @@ if __name__ == "__main__":
         main()
     except KeyboardInterrupt:
         print("\nShutting down...")
+        print(report())
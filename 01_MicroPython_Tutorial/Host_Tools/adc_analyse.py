@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Joystick ADC capture analyser
+
+Fetches a binary capture from the board (see earm/adc_capture.py) and
+reports per channel noise, the noise spectrum and the settling after a
+channel switch, then recommends the JoyStick read filter:
+    JoyStick(samples, trim) averages samples reads, minus trim at each end
+
+Sources:
+    --port /dev/ttyACM0         run joystick_capture.main() over the REPL
+    --url http://192.168.4.1    web_app_control_eArm, /?adc_capture=...
+    --file capture.bin          a dump saved earlier with --save
+
+Usage:
+    python adc_analyse.py --port /dev/ttyACM0                 # noise, burst 1
+    python adc_analyse.py --port /dev/ttyACM0 --burst 20 --frames 128
+    python adc_analyse.py --url http://192.168.4.1 --save capture.bin
+
+The spectrum needs numpy, serial capture needs pyserial.
+"""
+
+import argparse
+import math
+import struct
+import sys
+import time
+import urllib.request
+
+MAGIC = b"EADC"
+HEADER = "<4sBBHIIHH"
+CHANNELS = ("xL", "yL", "xR", "yR")
+
+# One entry of the calibration lookup table is 16 raw counts, noise below
+# a quarter of that never changes the speed level
+DEFAULT_TARGET = 4.0
+
+
+def parse_dump(data):
+    """(header dict, samples[channel][frame][read]) from a dump"""
+    size = struct.calcsize(HEADER)
+    magic, version, channels, burst, frames, period_us, late, _ = struct.unpack(HEADER, data[:size])
+    if magic != MAGIC:
+        raise ValueError("not an EADC dump")
+    count = frames * channels * burst
+    values = struct.unpack("<%dH" % count, data[size:size + 2 * count])
+    samples = [[list(values[(f * channels + c) * burst:(f * channels + c + 1) * burst])
+                for f in range(frames)] for c in range(channels)]
+    head = {"version": version, "channels": channels, "burst": burst,
+            "frames": frames, "period_us": period_us, "late": late}
+    return head, samples
+
+
+def read_serial(port, frames, burst, period_us, baud=115200, timeout=30):
+    """Run the capture over the REPL and return the dump"""
+    try:
+        import serial
+    except ImportError:
+        sys.exit("pyserial is needed for --port: pip install pyserial")
+    with serial.Serial(port, baud, timeout=1) as ser:
+        ser.write(b"\x03\x03")  # Stop whatever is running
+        time.sleep(0.5)
+        ser.reset_input_buffer()
+        ser.write(b"import joystick_capture; joystick_capture.main(%d, %d, %d)\r\n"
+                  % (frames, burst, period_us))
+        end = time.time() + timeout
+        while time.time() < end:
+            line = ser.readline()
+            if line.startswith(b"EADC-BEGIN"):
+                size = int(line.split()[1])
+                data = ser.read(size)
+                if len(data) != size:
+                    raise RuntimeError("capture truncated (%d of %d bytes)" % (len(data), size))
+                return data
+        raise RuntimeError("no EADC-BEGIN marker from the board")
+
+
+def read_url(url, frames, burst, period_us):
+    query = "/?adc_capture=%d&burst=%d&period=%d" % (frames, burst, period_us)
+    with urllib.request.urlopen(url.rstrip("/") + query, timeout=30) as resp:
+        return resp.read()
+
+
+def mean(xs):
+    return sum(xs) / len(xs)
+
+
+def std(xs):
+    m = mean(xs)
+    return math.sqrt(sum((x - m) ** 2 for x in xs) / len(xs))
+
+
+def block_noise(series, n):
+    """Std of the means of consecutive blocks of n samples"""
+    blocks = [mean(series[i:i + n]) for i in range(0, len(series) - n + 1, n)]
+    return std(blocks) if len(blocks) > 1 else 0.0
+
+
+def spectrum_peaks(series, period_us, cutoff_hz, peaks=3):
+    """(dominant frequencies, fraction of noise power above cutoff_hz), or None without numpy"""
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    x = np.asarray(series, dtype=float)
+    x = x - x.mean()
+    power = np.abs(np.fft.rfft(x * np.hanning(len(x)))) ** 2
+    freqs = np.fft.rfftfreq(len(x), period_us / 1e6)
+    power[0] = 0.0
+    total = power.sum()
+    if total == 0:
+        return [], 0.0
+    top = np.argsort(power)[::-1][:peaks]
+    return [(float(freqs[k]), float(power[k] / total)) for k in top], float(power[freqs > cutoff_hz].sum() / total)
+
+
+def settling(frames, target):
+    """Reads to drop at the start of a burst, and the per position offsets"""
+    burst = len(frames[0])
+    tail = mean([f[-1] for f in frames] + [f[-2] for f in frames]) if burst > 1 else 0
+    offsets = [mean([f[i] for f in frames]) - tail for i in range(burst)]
+    trim = 0
+    while trim < burst // 2 and abs(offsets[trim]) > target / 2:
+        trim += 1
+    return trim, offsets
+
+
+def recommend_average(series_fn, target, limit):
+    """Smallest n <= limit whose averaged noise is within target"""
+    for n in range(1, limit + 1):
+        if series_fn(n) <= target:
+            return n
+    return limit
+
+
+def analyse(head, samples, target, cutoff_hz):
+    burst = head["burst"]
+    period_us = head["period_us"]
+    read_us = period_us / (head["channels"] * burst) / 1.25  # capture adds 25% margin
+    print("Capture: %d frames x %d channels x %d reads, period %d us (%.0f Hz), %d late frames"
+          % (head["frames"], head["channels"], burst, period_us, 1e6 / period_us, head["late"]))
+    print("ADC read: about %.1f us" % read_us)
+    print()
+
+    trims = []
+    counts = []
+    for c, frames in enumerate(samples):
+        name = CHANNELS[c] if c < len(CHANNELS) else "ch%d" % c
+        firsts = [f[0] for f in frames]
+        print("%s: mean %.1f, std %.2f, min %d, max %d (raw counts)"
+              % (name, mean(firsts), std(firsts), min(firsts), max(firsts)))
+
+        peaks = spectrum_peaks([mean(f) for f in frames], period_us, cutoff_hz)
+        if peaks is None:
+            print("    spectrum: install numpy")
+        elif peaks[0]:
+            text = ", ".join("%.1f Hz (%.0f%%)" % (f, 100 * p) for f, p in peaks[0])
+            print("    noise peaks: %s; %.0f%% of the noise power above %g Hz"
+                  % (text, 100 * peaks[1], cutoff_hz))
+
+        if burst > 1:
+            trim, offsets = settling(frames, target)
+            print("    burst offsets: " + " ".join("%+.1f" % o for o in offsets))
+            usable = burst - 2 * trim
+            n = recommend_average(
+                lambda n: std([mean(f[trim:trim + n]) for f in frames]), target, usable)
+        else:
+            trim = 0
+            series = firsts
+            n = recommend_average(lambda n: block_noise(series, n), target, 64)
+        print("    averaging %d read(s) after dropping %d keeps the noise within %.1f counts"
+              % (n, trim, target))
+        trims.append(trim)
+        counts.append(n)
+        print()
+
+    trim = max(trims)
+    n = max(counts)
+    samples_per_read = n + 2 * trim
+    print("Recommended: JoyStick(samples=%d, trim=%d)" % (samples_per_read, trim))
+    print("    joystick_filter=(%d, %d) in JoystickApp, about %.2f ms of ADC reads per tick"
+          % (samples_per_read, trim, 4 * samples_per_read * read_us / 1000))
+    if burst == 1:
+        print("    trim measured with --burst 1 is 0, run with --burst 20 to measure the settling")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="eArm joystick ADC capture analyser")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--port", help="serial port of the board")
+    src.add_argument("--url", help="web_app_control_eArm address, e.g. http://192.168.4.1")
+    src.add_argument("--file", help="dump saved with --save")
+    parser.add_argument("--frames", type=int, default=2048, help="frames to capture (default 2048)")
+    parser.add_argument("--burst", type=int, default=1, help="reads per channel and frame (default 1)")
+    parser.add_argument("--period", type=int, default=0, help="frame period in us, 0 = fastest stable")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET,
+                        help="acceptable noise after averaging, raw counts (default %g)" % DEFAULT_TARGET)
+    parser.add_argument("--cutoff", type=float, default=20.0,
+                        help="joystick motion bandwidth in Hz, power above counts as noise (default 20)")
+    parser.add_argument("--save", help="also write the raw dump to this file")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            data = f.read()
+    elif args.port:
+        data = read_serial(args.port, args.frames, args.burst, args.period)
+    else:
+        data = read_url(args.url, args.frames, args.burst, args.period)
+    if args.save:
+        with open(args.save, "wb") as f:
+            f.write(data)
+
+    head, samples = parse_dump(data)
+    analyse(head, samples, args.target, args.cutoff)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Import time and heap benchmark for the earm modules
+
+Imports every module in a fresh Unix MicroPython process, with the
+machine and network modules replaced by the stubs in Host_Tools/stubs,
+and reports the median import time and the heap it used:
+    transient - heap allocated right after import (includes the compiler's garbage)
+    retained  - heap still in use after gc.collect()
+
+Usage:
+    python bench_import.py                      # import from source
+    python bench_import.py --mpy build/bundle/mpy   # import precompiled .mpy
+    python bench_import.py --micropython ~/micropython/ports/unix/build-standard/micropython
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES = os.path.normpath(os.path.join(HERE, "..", "Example_Codes"))
+STUBS = os.path.join(HERE, "stubs")
+
+MODULES = [
+    "earm",
+    "earm.adc_capture",
+    "earm.joystick",
+    "earm.buttons",
+    "earm.calibration",
+    "earm.gc_policy",
+    "earm.log",
+    "earm.loop",
+    "earm.buzzer",
+    "earm.arm",
+    "earm.path",
+    "earm.playback",
+    "earm.programs",
+    "earm.serial_proto",
+    "earm.pose_queue",
+    "earm.jitter_buffer",
+    "earm.scheduler",
+    "earm.motion_script",
+    "earm.script_vm",
+    "earm.gcode",
+    "earm.gcode_control",
+    "earm.serial_control",
+    "earm.tcp_port",
+    "earm.servo",
+    "earm.music",
+    "earm.command_intake",
+    "earm.sessions",
+    "earm.telemetry_store",
+    "earm.trace",
+    "earm.http",
+    "earm.wifi",
+    "earm.joystick_app",
+    "earm.web_control",
+]
+
+# Runs inside MicroPython, prints "<us> <transient bytes> <retained bytes>"
+SNIPPET = """
+import sys, gc, time
+sys.path[:0] = [%r, %r]
+import fake_machine, fake_network
+sys.modules['machine'] = fake_machine
+sys.modules['network'] = fake_network
+gc.collect()
+m0 = gc.mem_alloc()
+t0 = time.ticks_us()
+__import__(%r)
+t = time.ticks_diff(time.ticks_us(), t0)
+m1 = gc.mem_alloc()
+gc.collect()
+print(t, m1 - m0, gc.mem_alloc() - m0)
+"""
+
+
+def run_once(micropython, heapsize, path, module):
+    code = SNIPPET % (STUBS, path, module)
+    out = subprocess.run([micropython, "-X", "heapsize=" + heapsize, "-c", code],
+                         capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr else "failed")
+    us, transient, retained = out.stdout.split()[-3:]
+    return int(us), int(transient), int(retained)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="earm import benchmark (Unix MicroPython)")
+    parser.add_argument("--micropython", default=shutil.which("micropython"),
+                        help="Unix port executable (default: micropython on PATH)")
+    parser.add_argument("--mpy", help="folder with precompiled .mpy files instead of source")
+    parser.add_argument("--heapsize", default="192k", help="MicroPython heap size (default 192k)")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per module (default 5)")
+    args = parser.parse_args()
+
+    if not args.micropython:
+        sys.exit("Unix MicroPython not found, build ports/unix or pass --micropython PATH")
+
+    path = os.path.abspath(args.mpy) if args.mpy else EXAMPLES
+    print("Importing from %s (%s runs, heap %s)" % (path, args.repeat, args.heapsize))
+    print("%-20s %10s %12s %12s" % ("module", "time (ms)", "transient", "retained"))
+    for module in MODULES:
+        try:
+            runs = [run_once(args.micropython, args.heapsize, path, module)
+                    for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print("%-20s %s" % (module, e))
+            continue
+        us = statistics.median(r[0] for r in runs)
+        print("%-20s %10.2f %12d %12d" % (module, us / 1000, runs[0][1], runs[0][2]))
+
+
+if __name__ == "__main__":
+    main()
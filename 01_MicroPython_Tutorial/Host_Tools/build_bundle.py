@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Build a deployable eArm bundle with precompiled .mpy files
+
+Runs on the PC, not on the board. The earm package is cross-compiled
+with mpy-cross so the ESP32-C3 no longer compiles it from source at
+import time; the thin entry scripts stay as .py so they can still be
+opened in Thonny.
+
+Bundle layout (copy the contents of build/bundle to the board root):
+    main.py, launcher.json, joystick_control_eArm.py, web_app_control_eArm.py,
+    joystick_capture.py, serial_control_eArm.py, network_control_eArm.py
+    mpy/earm/*.mpy    <- searched first by main.py
+
+mpy-cross must match the firmware version, for the bundled v1.27.0
+firmware use:  pip install mpy-cross==1.27.0
+
+Usage:
+    python build_bundle.py                  # build/bundle with .mpy files
+    python build_bundle.py --frozen         # also write a frozen manifest
+    python build_bundle.py --mpy-cross PATH # use a specific mpy-cross
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES = os.path.normpath(os.path.join(HERE, "..", "Example_Codes"))
+
+# Library package that is cross-compiled
+PACKAGE = "earm"
+
+# Files copied as source next to the compiled package
+ENTRY_FILES = [
+    "main.py",
+    "launcher.json",
+    "joystick_control_eArm.py",
+    "web_app_control_eArm.py",
+    "joystick_capture.py",
+    "serial_control_eArm.py",
+    "network_control_eArm.py",
+    "gcode_control_eArm.py",
+]
+
+# ESP32-C3 is a RISC-V core, only relevant for @micropython.native code
+MARCH = "rv32imc"
+
+
+def find_mpy_cross(path):
+    """Command prefix that runs mpy-cross"""
+    if path:
+        return [path]
+    exe = shutil.which("mpy-cross")
+    if exe:
+        return [exe]
+    try:
+        import mpy_cross  # noqa: F401  (pip install mpy-cross)
+    except ImportError:
+        sys.exit("mpy-cross not found: pip install mpy-cross, or pass --mpy-cross PATH")
+    return [sys.executable, "-m", "mpy_cross"]
+
+
+def package_sources():
+    """(source path, path relative to Example_Codes) for every package module"""
+    root = os.path.join(EXAMPLES, PACKAGE)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != "__pycache__"]
+        for name in sorted(filenames):
+            if name.endswith(".py"):
+                src = os.path.join(dirpath, name)
+                yield src, os.path.relpath(src, EXAMPLES)
+
+
+def compile_package(mpy_cross, out_dir):
+    """Cross-compile the package into out_dir, return the number of modules"""
+    count = 0
+    for src, rel in package_sources():
+        dst = os.path.join(out_dir, rel[:-3] + ".mpy")
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        cmd = mpy_cross + ["-march=" + MARCH, "-s", rel.replace(os.sep, "/"), "-o", dst, src]
+        subprocess.run(cmd, check=True)
+        print("  %-32s %6d bytes" % (rel, os.path.getsize(dst)))
+        count += 1
+    return count
+
+
+def write_frozen_manifest(path):
+    """Manifest for building a firmware image with the package frozen in"""
+    with open(path, "w") as f:
+        f.write('include("$(PORT_DIR)/boards/manifest.py")\n')
+        f.write('package("%s", base_path=%r)\n' % (PACKAGE, EXAMPLES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--out", default=os.path.join(HERE, "build"),
+                        help="output folder (default: Host_Tools/build)")
+    parser.add_argument("--mpy-cross", help="path to the mpy-cross executable")
+    parser.add_argument("--frozen", action="store_true",
+                        help="also write manifest.py for FROZEN_MANIFEST firmware builds")
+    args = parser.parse_args()
+
+    bundle = os.path.join(args.out, "bundle")
+    if os.path.isdir(bundle):
+        shutil.rmtree(bundle)
+    os.makedirs(bundle)
+
+    print("Compiling %s package:" % PACKAGE)
+    count = compile_package(find_mpy_cross(args.mpy_cross), os.path.join(bundle, "mpy"))
+
+    for name in ENTRY_FILES:
+        shutil.copy(os.path.join(EXAMPLES, name), bundle)
+
+    if args.frozen:
+        manifest = os.path.join(args.out, "manifest.py")
+        write_frozen_manifest(manifest)
+        print("Frozen manifest: " + manifest)
+        print("  make BOARD=ESP32_GENERIC_C3 FROZEN_MANIFEST=" + manifest)
+
+    print("%d modules compiled into %s" % (count, bundle))
+    print("Upload with:  mpremote fs cp -r %s/. :" % bundle)
+
+
+if __name__ == "__main__":
+    main()
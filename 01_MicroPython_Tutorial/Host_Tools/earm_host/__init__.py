@@ -0,0 +1,27 @@
+"""
+eArm host library
+
+Talks to the board over the framed binary protocol of
+Example_Codes/earm/serial_proto.py (run serial_control_eArm.py on the board).
+
+    from earm_host import ArmClient
+    with ArmClient.open("/dev/ttyUSB0", start=True) as arm:
+        arm.setpoint((90, 120, 60, 90))
+        print(arm.telemetry())
+
+Longer moves are planned on the PC and streamed with flow control:
+
+    from earm_host import TrajectoryStreamer, plan_smooth
+    poses = plan_smooth(waypoints, arm.ping().period_us / 1e6)
+    print(TrajectoryStreamer(arm).stream(poses))
+
+Boards on WiFi (network_control_eArm.py) are reached with
+ArmClient.connect(host), and many of them at once with Fleet.
+"""
+
+from earm_host.client import ArmClient, ProtocolError
+from earm_host.clock import DeviceClock
+from earm_host.fleet import Fleet, FleetStatus
+from earm_host.planner import plan_smooth, plan_trapezoid
+from earm_host.protocol import Ack, Credit, Pong, Telemetry
+from earm_host.streamer import StreamStats, TrajectoryStreamer
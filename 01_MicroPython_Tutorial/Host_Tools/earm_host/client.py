@@ -0,0 +1,354 @@
+"""
+eArm serial client
+
+Sends commands and waits for the reply with the same sequence number,
+resending after a timeout. Works over pyserial, TCP (boards running
+network_control_eArm.py) or any transport with read(n) (returning what
+is available, possibly nothing) and write(data).
+"""
+
+import os
+import select
+import socket
+import struct
+import time
+
+from earm_host import protocol as p
+from earm_host.clock import DeviceClock, exchange, host_us
+from earm_host.script import compile_script
+
+
+class ProtocolError(Exception):
+    """The board rejected a command or did not answer"""
+
+
+def host_ms():
+    """Monotonic milliseconds of this PC, the reference of clock_offset()"""
+    return int(time.monotonic() * 1000)
+
+
+class FdTransport:
+    """Raw file descriptor (pty, pipe) as a transport"""
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def read(self, n, timeout=0.01):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        return os.read(self.fd, n) if ready else b""
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self.fd, view):]
+
+    def close(self):
+        os.close(self.fd)
+
+
+class SerialTransport:
+    """pyserial port as a transport"""
+
+    def __init__(self, port, baud=115200):
+        try:
+            import serial
+        except ImportError:
+            raise ProtocolError("pyserial is needed for serial ports: pip install pyserial")
+        self.ser = serial.Serial(port, baud, timeout=0.01)
+
+    def read(self, n):
+        return self.ser.read(min(n, max(1, self.ser.in_waiting)))
+
+    def write(self, data):
+        self.ser.write(data)
+
+    def close(self):
+        self.ser.close()
+
+
+class TcpTransport:
+    """Persistent TCP connection to network_control_eArm.py"""
+
+    def __init__(self, host, port=p.TCP_PORT, connect_timeout=3.0):
+        self.address = (host, port)
+        self.sock = socket.create_connection(self.address, timeout=connect_timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setblocking(False)
+
+    def read(self, n, timeout=0.01):
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready:
+            return b""
+        data = self.sock.recv(n)
+        if not data:
+            raise ProtocolError("connection to %s:%d closed" % self.address)
+        return data
+
+    def write(self, data):
+        self.sock.setblocking(True)
+        try:
+            self.sock.sendall(data)
+        finally:
+            self.sock.setblocking(False)
+
+    def close(self):
+        self.sock.close()
+
+
+class ArmClient:
+    """Command interface of serial_control_eArm"""
+
+    def __init__(self, transport, timeout=0.5, retries=3):
+        self.transport = transport
+        self.timeout = timeout
+        self.retries = retries
+        self.decoder = p.Decoder()
+        self.seq = 0
+        self.pending = {}  # seq -> (msg, payload) of replies not yet collected
+        self.info = None  # Pong from the last ping()
+        self.on_credit = None  # Called with each unsolicited Credit
+        self.clock = DeviceClock()  # The board's ticks_us, see sync_clock()
+
+    @classmethod
+    def open(cls, port, baud=115200, start=False, **kwargs):
+        """Client on a serial port, start=True launches the app from the REPL first"""
+        client = cls(SerialTransport(port, baud), **kwargs)
+        if start:
+            client.start_repl_app()
+        return client
+
+    @classmethod
+    def connect(cls, host, port=p.TCP_PORT, **kwargs):
+        """Client on a board reachable over WiFi"""
+        return cls(TcpTransport(host, port), **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.transport.close()
+
+    def start_repl_app(self, module="serial_control_eArm"):
+        """Interrupt the REPL, start the serial control app and wait for it to answer"""
+        self.transport.write(b"\x03\x03")
+        time.sleep(0.3)
+        self.transport.write(b"import %s; %s.main()\r\n" % (module.encode(), module.encode()))
+        time.sleep(0.5)
+        self._drain()
+        return self.ping()
+
+    # ---------------- Transport ----------------
+
+    def _drain(self):
+        """Discard whatever the board printed so far"""
+        while self.transport.read(4096):
+            pass
+        self.decoder = p.Decoder()
+
+    def _receive(self, deadline):
+        """Read and sort incoming frames until deadline"""
+        while time.monotonic() < deadline:
+            data = self.transport.read(4096)
+            if data:
+                for msg, seq, payload in self.decoder.feed(data):
+                    if msg == p.MSG_CREDIT:
+                        if self.on_credit:
+                            self.on_credit(p.decode_reply(msg, payload))
+                    else:
+                        self.pending[seq] = (msg, payload)
+                return True
+        return False
+
+    def send(self, msg, payload=b""):
+        """Send without waiting, returns the sequence number"""
+        # 1..255, seq 0 belongs to unsolicited frames from the board
+        self.seq = self.seq % 255 + 1
+        self.pending.pop(self.seq, None)
+        self.transport.write(p.encode(msg, self.seq, payload))
+        return self.seq
+
+    def poll(self, timeout=0.0):
+        """Handle incoming frames for up to timeout seconds, True if any data came"""
+        return self._receive(time.monotonic() + timeout)
+
+    def take_reply(self, seq):
+        """Decoded reply to seq if it has arrived, else None"""
+        if seq not in self.pending:
+            return None
+        msg, payload = self.pending.pop(seq)
+        return p.decode_reply(msg, payload)
+
+    def reply(self, seq, timeout=None):
+        """Decoded reply to seq, or None after timeout"""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while seq not in self.pending:
+            if not self._receive(deadline):
+                return None
+        msg, payload = self.pending.pop(seq)
+        return p.decode_reply(msg, payload)
+
+    def request(self, msg, payload=b""):
+        """Send and wait for the reply, resending on timeout"""
+        for _ in range(self.retries):
+            reply = self.reply(self.send(msg, payload))
+            if reply is not None:
+                return reply
+        raise ProtocolError("no reply to message 0x%02x" % msg)
+
+    def _command(self, msg, payload=b""):
+        ack = self.request(msg, payload)
+        if ack.status != p.ST_OK:
+            raise ProtocolError(p.STATUS_NAMES.get(ack.status, "status %d" % ack.status))
+        return ack
+
+    # ---------------- Commands ----------------
+
+    def ping(self):
+        """Pong with version, queue size and control period"""
+        self.info = self.request(p.MSG_PING)
+        if self.info.version != p.VERSION:
+            raise ProtocolError("board speaks protocol version %d, host %d"
+                                % (self.info.version, p.VERSION))
+        return self.info
+
+    def setpoint(self, angles):
+        """Move straight to angles A, B, C, D"""
+        return self._command(p.MSG_SETPOINT, p.setpoint_payload(angles))
+
+    def velocity(self, velocities):
+        """Jog at deg/s per joint, repeat within 250 ms or the board stops"""
+        return self._command(p.MSG_VELOCITY, p.velocity_payload(velocities))
+
+    def stop(self):
+        """Drop the queued trajectory and hold the current pose"""
+        return self._command(p.MSG_STOP)
+
+    def telemetry(self):
+        return self.request(p.MSG_TELEMETRY_REQ)
+
+    def sync_clock(self, samples=8):
+        """
+        NTP style clock sync, returns the DeviceClock
+
+        Takes samples exchanges spread over one control period and keeps
+        the one with the shortest delay. Call it again every few minutes, the clock also learns
+        the drift of the board's crystal from successive syncs.
+        """
+        if self.info is None:
+            self.ping()
+        period = self.info.period_us / 1e6
+        best = None
+        for k in range(samples):
+            # A request sent right after a reply waits almost a whole tick
+            # on the board, spread the send times over the tick instead
+            time.sleep(period * (k + 0.5) / samples)
+            t0 = host_us()
+            t = self.request(p.MSG_TIME_SYNC)
+            t3 = host_us()
+            sample = exchange(t0, t.rx_us, t.tx_us, t3)
+            if best is None or sample.delay_us < best.delay_us:
+                best = sample
+        self.clock.add(best)
+        return self.clock
+
+    def setpoint_at(self, angles, at, max_age=60.0):
+        """
+        Move to angles at host time at (time.monotonic() seconds)
+
+        The board waits for the moment itself, so link jitter does not
+        show in the motion. Syncs the clock first if the last sync is
+        older than max_age seconds. Returns the Ack, status ST_LATE if
+        the moment had already passed on arrival (the move ran at once).
+        """
+        if self.clock.age > max_age:
+            self.sync_clock()
+        t_us = self.clock.to_device(int(at * 1e6))
+        ack = self.request(p.MSG_SETPOINT_AT, p.setpoint_at_payload(t_us, angles))
+        if ack.status not in (p.ST_OK, p.ST_LATE):
+            raise ProtocolError(p.STATUS_NAMES.get(ack.status, "status %d" % ack.status))
+        return ack
+
+    def stream_start(self, prefill, start_t=None):
+        """
+        Start a jitter buffered stream, playback waits for prefill poses
+
+        start_t is the board's ticks_ms to start playing at (see
+        clock_offset()), None starts as soon as prefill poses are queued.
+        """
+        if start_t is None:
+            return self._command(p.MSG_STREAM_START, struct.pack("<H", prefill))
+        return self._command(p.MSG_STREAM_START, struct.pack("<HI", prefill, start_t % p.TICKS_PERIOD))
+
+    def clock_offset(self, samples=5):
+        """
+        (offset, rtt) in ms between this PC and the board's ticks_ms
+
+        The board's clock reads (host_ms() + offset) % TICKS_PERIOD. The
+        sample with the shortest round trip wins, its error is at most
+        half that round trip.
+        """
+        best = None
+        for _ in range(samples):
+            t0 = host_ms()
+            t = self.telemetry()
+            t1 = host_ms()
+            if best is None or t1 - t0 < best[1]:
+                best = ((t.ticks_ms - (t0 + t1) // 2) % p.TICKS_PERIOD, t1 - t0)
+        return best
+
+    def stream_end(self):
+        """Let the board play out the buffer after the last pose"""
+        return self._command(p.MSG_STREAM_END)
+
+    def send_chunk(self, poses):
+        """Queue up to MAX_CHUNK poses, returns the Ack (status ST_FULL if they did not fit)"""
+        return self.request(p.MSG_TRAJ, p.traj_payload(poses))
+
+    def stream(self, poses, chunk=32):
+        """
+        Queue a precomputed trajectory, one pose per control tick
+
+        Chunks that do not fit are retried after the queue had time to
+        drain, so any length can be streamed. Returns when the last pose
+        is queued.
+        """
+        if self.info is None:
+            self.ping()
+        period = self.info.period_us / 1e6
+        chunk = max(1, min(chunk, p.MAX_CHUNK, self.info.queue_size))
+        i = 0
+        while i < len(poses):
+            part = poses[i:i + chunk]
+            ack = self.send_chunk(part)
+            if ack.status == p.ST_OK:
+                i += len(part)
+            elif ack.status == p.ST_FULL:
+                time.sleep((len(part) - ack.free) * period)
+            else:
+                raise ProtocolError(p.STATUS_NAMES.get(ack.status, "status %d" % ack.status))
+
+    def load_script(self, script):
+        """Send a motion script (source text or bytecode) to the board, returns its size"""
+        code = compile_script(script) if isinstance(script, str) else bytes(script)
+        for offset in range(0, len(code), p.SCRIPT_CHUNK):
+            self._command(p.MSG_SCRIPT_LOAD,
+                          p.script_load_payload(offset, code[offset:offset + p.SCRIPT_CHUNK]))
+        return len(code)
+
+    def run_script(self, script=None):
+        """Run a motion script on the board, the one loaded last if script is None"""
+        if script is not None:
+            self.load_script(script)
+        return self._command(p.MSG_SCRIPT_RUN)
+
+    def wait_idle(self, timeout=30.0):
+        """Wait until the queued trajectory or the script has been played, returns the last telemetry"""
+        deadline = time.monotonic() + timeout
+        while True:
+            t = self.telemetry()
+            if t.mode not in (p.MODE_TRAJ, p.MODE_SCRIPT) or time.monotonic() > deadline:
+                return t
+            time.sleep(max(0.01, t.queued * self.info.period_us / 2e6))
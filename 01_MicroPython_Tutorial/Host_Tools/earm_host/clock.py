@@ -0,0 +1,94 @@
+"""
+The board's ticks_us as seen from the PC
+
+Each TIME_SYNC exchange gives four times, t0/t3 on the PC and t1/t2 on
+the board (see earm/serial_proto.py):
+
+    offset = ((t1 - t0) + (t2 - t3)) / 2     board clock - PC clock
+    delay  = (t3 - t0) - (t2 - t1)           time spent on the link
+
+The board only reads its link once per control tick, so most samples
+carry up to a period of extra delay on the way in. A burst of samples
+is taken and the one with the smallest delay is kept, like NTP's clock
+filter. Offsets from successive syncs give the drift of the board's
+crystal, so predictions stay accurate between syncs.
+"""
+
+import time
+from collections import deque, namedtuple
+
+from earm_host.protocol import TICKS_PERIOD
+
+Sample = namedtuple("Sample", "host_us offset_us delay_us")
+
+
+def host_us():
+    """Monotonic microseconds of this PC, the reference of DeviceClock"""
+    return time.monotonic_ns() // 1000
+
+
+def ticks_diff(a, b):
+    """Signed a - b of two ticks_us values, like time.ticks_diff on the board"""
+    d = (a - b) % TICKS_PERIOD
+    return d - TICKS_PERIOD if d >= TICKS_PERIOD // 2 else d
+
+
+def exchange(t0, t1, t2, t3):
+    """Sample from one exchange, t0/t3 in host_us(), t1/t2 in board ticks_us"""
+    a = t1 - t0
+    # (t2 - t3) is close to a modulo the tick period, unwrap it next to a
+    b = a + ticks_diff(t2 - t3, a)
+    return Sample((t0 + t3) // 2, (a + b) // 2, (t3 - t0) - ticks_diff(t2, t1))
+
+
+class DeviceClock:
+    """Offset and drift of one board's ticks_us against host_us()"""
+
+    def __init__(self, history=16):
+        self.samples = deque(maxlen=history)  # Best sample of each sync, offsets unwrapped
+
+    def add(self, sample):
+        if self.samples:
+            last = self.samples[-1].offset_us
+            sample = sample._replace(offset_us=last + ticks_diff(sample.offset_us, last))
+        self.samples.append(sample)
+
+    @property
+    def synced(self):
+        return bool(self.samples)
+
+    @property
+    def age(self):
+        """Seconds since the last sync"""
+        return (host_us() - self.samples[-1].host_us) / 1e6 if self.samples else float("inf")
+
+    @property
+    def delay_us(self):
+        return self.samples[-1].delay_us
+
+    @property
+    def drift_ppm(self):
+        """Board clock rate error from a least squares fit, 0 until two syncs 1 s apart"""
+        s = self.samples
+        if len(s) < 2 or s[-1].host_us - s[0].host_us < 1000000:
+            return 0.0
+        n = len(s)
+        mx = sum(x.host_us for x in s) / n
+        my = sum(x.offset_us for x in s) / n
+        sxx = sum((x.host_us - mx) ** 2 for x in s)
+        sxy = sum((x.host_us - mx) * (x.offset_us - my) for x in s)
+        return sxy / sxx * 1e6
+
+    def offset(self, at_us):
+        """Predicted offset at host time at_us"""
+        last = self.samples[-1]
+        return last.offset_us + self.drift_ppm * (at_us - last.host_us) / 1e6
+
+    def to_device(self, at_us):
+        """Board ticks_us at host time at_us"""
+        return int(round(at_us + self.offset(at_us))) % TICKS_PERIOD
+
+    def to_host(self, ticks_us, near_us=None):
+        """Host time of a board ticks_us value, the one closest to near_us (default now)"""
+        near_us = host_us() if near_us is None else near_us
+        return near_us + ticks_diff(ticks_us, self.to_device(near_us))
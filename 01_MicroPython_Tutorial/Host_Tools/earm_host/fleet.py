@@ -0,0 +1,189 @@
+"""
+Several arms from one PC
+
+Keeps one persistent TCP connection per board running
+network_control_eArm.py and fans every command out to all of them in
+parallel. A connection that fails is dropped and opened again on the
+next call, so a board that rebooted or roamed rejoins by itself.
+
+Trajectories start together: the clock offset of every board is
+measured first, and each stream is told to start at the same moment
+expressed in that board's own ticks_ms. Timed setpoints (setpoint_at)
+use each board's synced ticks_us and run on all arms within a fraction
+of a millisecond.
+
+    fleet = Fleet(["192.168.1.51", "192.168.1.52:5005"])
+    fleet.setpoint((90, 120, 60, 90))
+    fleet.stream(poses, lead=0.5)
+    print(fleet.status())
+"""
+
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from earm_host import protocol as p
+from earm_host.client import ArmClient, ProtocolError, host_ms
+from earm_host.streamer import TrajectoryStreamer
+
+FleetStatus = namedtuple(
+    "FleetStatus", "online offline telemetry max_queued underruns overruns crc_errors")
+
+
+def _address(spec):
+    """(host, port) from "host", "host:port" or a tuple"""
+    if isinstance(spec, tuple):
+        return spec
+    host, _, port = spec.partition(":")
+    return host, int(port) if port else p.TCP_PORT
+
+
+class Fleet:
+    """Pooled connections to many arms with parallel commands"""
+
+    def __init__(self, addresses, names=None, timeout=0.5, retries=3):
+        """
+        Parameters:
+            addresses: "host", "host:port" or (host, port) per board
+            names: Name per board, defaults to "host:port"
+        """
+        self.addresses = [_address(a) for a in addresses]
+        self.names = list(names) if names else ["%s:%d" % a for a in self.addresses]
+        self.client_args = {"timeout": timeout, "retries": retries}
+        self.clients = {name: None for name in self.names}
+        self.offsets = {}  # name -> (clock offset ms, rtt ms) from sync_clocks()
+        self.errors = {}  # name -> last exception
+        self.pool = ThreadPoolExecutor(max_workers=max(1, len(self.names)))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for name, client in self.clients.items():
+            if client is not None:
+                client.close()
+                self.clients[name] = None
+        self.pool.shutdown()
+
+    def client(self, name):
+        """Connected ArmClient of one board, (re)connecting if needed"""
+        client = self.clients[name]
+        if client is None:
+            host, port = self.addresses[self.names.index(name)]
+            client = ArmClient.connect(host, port, **self.client_args)
+            client.ping()
+            self.clients[name] = client
+        return client
+
+    def _drop(self, name):
+        client = self.clients[name]
+        self.clients[name] = None
+        if client is not None:
+            try:
+                client.close()
+            except OSError:
+                pass
+
+    def each(self, fn, names=None):
+        """
+        Run fn(name, client) for every board in parallel
+
+        Returns {name: result} of the boards that succeeded; failures are
+        kept in self.errors and their connection is reopened next time.
+        """
+        names = self.names if names is None else names
+
+        def run(name):
+            try:
+                return fn(name, self.client(name))
+            except (ProtocolError, OSError) as e:
+                self._drop(name)
+                raise e
+
+        futures = {name: self.pool.submit(run, name) for name in names}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+                self.errors.pop(name, None)
+            except (ProtocolError, OSError) as e:
+                self.errors[name] = e
+        return results
+
+    # ---------------- Commands ----------------
+
+    def ping(self):
+        return self.each(lambda name, c: c.ping())
+
+    def setpoint(self, angles):
+        """Same angles for every arm, or {name: angles}"""
+        if isinstance(angles, dict):
+            return self.each(lambda name, c: c.setpoint(angles[name]), list(angles))
+        return self.each(lambda name, c: c.setpoint(angles))
+
+    def stop(self):
+        return self.each(lambda name, c: c.stop())
+
+    def telemetry(self):
+        return self.each(lambda name, c: c.telemetry())
+
+    def status(self):
+        """Telemetry of all arms with fleet wide totals"""
+        tel = self.telemetry()
+        values = list(tel.values())
+        return FleetStatus(
+            online=len(tel), offline=sorted(set(self.names) - set(tel)), telemetry=tel,
+            max_queued=max((t.queued for t in values), default=0),
+            underruns=sum(t.underruns for t in values),
+            overruns=sum(t.overruns for t in values),
+            crc_errors=sum(t.crc_errors for t in values))
+
+    def sync_clocks(self, samples=5):
+        """
+        Sync the ticks_us clock of every board and measure its ticks_ms
+        offset, returns {name: (offset, rtt)} in ms
+        """
+        def sync(name, client):
+            client.sync_clock()
+            return client.clock_offset(samples)
+
+        self.offsets.update(self.each(sync))
+        return self.offsets
+
+    def setpoint_at(self, angles, delay=0.2):
+        """
+        Same angles (or {name: angles}) on every arm at one moment, delay
+        seconds from now; returns {name: Ack}
+        """
+        at = time.monotonic() + delay
+        if isinstance(angles, dict):
+            return self.each(lambda name, c: c.setpoint_at(angles[name], at), list(angles))
+        return self.each(lambda name, c: c.setpoint_at(angles, at))
+
+    def stream(self, trajectories, lead=0.5, **streamer_args):
+        """
+        Play trajectories on all arms, starting together
+
+        Parameters:
+            trajectories: One pose list for every arm, or {name: poses}
+            lead: Seconds from now to the common start, long enough to
+                  send every board its prefill
+            streamer_args: Passed to TrajectoryStreamer (chunk, prefill_s)
+        Returns:
+            {name: StreamStats}
+        """
+        if not isinstance(trajectories, dict):
+            trajectories = {name: trajectories for name in self.names}
+        names = list(trajectories)
+        self.sync_clocks()
+        start = host_ms() + int(lead * 1000)
+
+        def run(name, client):
+            offset = self.offsets[name][0]
+            streamer = TrajectoryStreamer(client, **streamer_args)
+            return streamer.stream(trajectories[name], start_t=(start + offset) % p.TICKS_PERIOD)
+
+        return self.each(run, [n for n in names if n in self.offsets])
@@ -0,0 +1,152 @@
+"""
+Trajectory planning on the PC
+
+Turns joint-space waypoints into one pose per control tick of the
+board, so the board only has to play them back. Two planners:
+
+    plan_trapezoid  stops at every waypoint, all joints share one
+                    trapezoidal velocity profile per segment
+    plan_smooth     Catmull-Rom spline through the waypoints, then a
+                    forward/backward pass limits speed and acceleration
+                    along the path, so the arm does not stop in between
+
+Joint limits are the ones used by earm/playback.py (deg/s, deg/s^2).
+"""
+
+import math
+
+JOINT_MAX_VEL = (120, 90, 90, 180)
+JOINT_MAX_ACC = (400, 250, 250, 600)
+
+
+def _clamp_pose(pose):
+    return tuple(max(0, min(180, int(round(a)))) for a in pose)
+
+
+def segment_time(dist, vel=JOINT_MAX_VEL, acc=JOINT_MAX_ACC):
+    """
+    Shortest synchronised move for per joint distances
+
+    Returns (seconds, acceleration fraction f of that time): every joint
+    accelerates for f * T, cruises and decelerates for f * T.
+    """
+    best = (0.0, 0.5)
+    for k in range(1, 11):
+        f = k / 20.0
+        t = 0.0
+        for d, v, a in zip(dist, vel, acc):
+            d = abs(d)
+            if d:
+                t = max(t, d / (v * (1 - f)), math.sqrt(d / (a * f * (1 - f))))
+        if best[0] == 0.0 or t < best[0]:
+            best = (t, f)
+    return best
+
+
+def trapezoid(u, f):
+    """Position 0..1 along a trapezoid profile at time fraction u"""
+    if f <= 0:
+        return u
+    if u < f:
+        return u * u / (2 * f * (1 - f))
+    if u <= 1 - f:
+        return (u - f / 2) / (1 - f)
+    v = 1 - u
+    return 1 - v * v / (2 * f * (1 - f))
+
+
+def plan_trapezoid(waypoints, period, speed=1.0, dwell=0.0, start=None):
+    """
+    Poses every period seconds, stopping dwell seconds at each waypoint
+
+    Parameters:
+        waypoints: Sequence of (A, B, C, D) angles
+        period: Control period of the board in seconds (Pong.period_us / 1e6)
+        speed: Fraction of the joint limits to use, 0 < speed <= 1
+        start: Pose the arm is in, defaults to the first waypoint
+    """
+    vel = [v * speed for v in JOINT_MAX_VEL]
+    acc = [a * speed * speed for a in JOINT_MAX_ACC]
+    poses = []
+    prev = tuple(start) if start is not None else tuple(waypoints[0])
+    for wp in waypoints:
+        dist = [b - a for a, b in zip(prev, wp)]
+        t, f = segment_time(dist, vel, acc)
+        n = max(1, int(math.ceil(t / period)))
+        for k in range(1, n + 1):
+            s = trapezoid(k / n, f)
+            poses.append(_clamp_pose(a + d * s for a, d in zip(prev, dist)))
+        poses.extend([_clamp_pose(wp)] * int(round(dwell / period)))
+        prev = tuple(wp)
+    return poses
+
+
+def catmull_rom(waypoints, samples=8):
+    """Dense path through the waypoints, samples points per segment"""
+    pts = [tuple(float(a) for a in wp) for wp in waypoints]
+    if len(pts) < 2:
+        return pts
+    ext = [pts[0]] + pts + [pts[-1]]
+    path = [pts[0]]
+    for i in range(1, len(ext) - 2):
+        p0, p1, p2, p3 = ext[i - 1], ext[i], ext[i + 1], ext[i + 2]
+        for k in range(1, samples + 1):
+            t = k / samples
+            t2 = t * t
+            t3 = t2 * t
+            path.append(tuple(
+                0.5 * (2 * b + (c - a) * t + (2 * a - 5 * b + 4 * c - d) * t2 + (3 * b - a - 3 * c + d) * t3)
+                for a, b, c, d in zip(p0, p1, p2, p3)))
+    return path
+
+
+def time_path(path, vel=JOINT_MAX_VEL, acc=JOINT_MAX_ACC):
+    """
+    Time of each path point under the joint limits
+
+    The speed along the path is a fraction r of the joint limit of the
+    slowest joint on each step; a forward and a backward pass cap how
+    fast r may change, starting and ending at rest.
+    """
+    # ds: time of each step at full speed, alpha: how fast r may change (1/s)
+    ds = [max(abs(b - a) / v for a, b, v in zip(p, q, vel)) for p, q in zip(path, path[1:])]
+    alpha = min(a / v for a, v in zip(acc, vel))
+    r = [1.0] * (len(path))
+    r[0] = r[-1] = 0.0
+    for i in range(1, len(path)):
+        r[i] = min(r[i], math.sqrt(r[i - 1] ** 2 + 2 * alpha * ds[i - 1]))
+    for i in range(len(path) - 2, -1, -1):
+        r[i] = min(r[i], math.sqrt(r[i + 1] ** 2 + 2 * alpha * ds[i]))
+    times = [0.0]
+    for i, d in enumerate(ds):
+        avg = (r[i] + r[i + 1]) / 2
+        times.append(times[-1] + (d / avg if avg > 0 else 0.0))
+    return times
+
+
+def resample(path, times, period):
+    """Linear interpolation of the timed path every period seconds"""
+    poses = []
+    n = int(math.ceil(times[-1] / period))
+    j = 0
+    for k in range(1, n + 1):
+        t = min(k * period, times[-1])
+        while j < len(times) - 2 and times[j + 1] < t:
+            j += 1
+        span = times[j + 1] - times[j]
+        u = (t - times[j]) / span if span > 0 else 1.0
+        poses.append(_clamp_pose(a + (b - a) * u for a, b in zip(path[j], path[j + 1])))
+    return poses
+
+
+def plan_smooth(waypoints, period, speed=1.0, samples=8, start=None):
+    """Blended path through the waypoints without stopping, one pose per period"""
+    pts = list(waypoints)
+    if start is not None:
+        pts.insert(0, tuple(start))
+    if len(pts) < 2:
+        return [_clamp_pose(p) for p in pts]
+    path = catmull_rom(pts, samples)
+    vel = [v * speed for v in JOINT_MAX_VEL]
+    acc = [a * speed * speed for a in JOINT_MAX_ACC]
+    return resample(path, time_path(path, vel, acc), period)
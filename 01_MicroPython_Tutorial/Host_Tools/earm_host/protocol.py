@@ -0,0 +1,182 @@
+"""
+Frame encoding and decoding, host copy of earm/serial_proto.py
+
+Frame:
+    0xA5, type, seq, len, payload[len], crc8 (poly 0x07 over type..payload)
+"""
+
+import struct
+from collections import namedtuple
+
+VERSION = 5
+SYNC = 0xA5
+MAX_PAYLOAD = 255
+
+# TCP port of network_control_eArm.py
+TCP_PORT = 5005
+# MicroPython ticks_ms() / ticks_us() wrap at this value
+TICKS_PERIOD = 1 << 30
+
+# Host -> device
+MSG_PING = 0x01
+MSG_SETPOINT = 0x02
+MSG_VELOCITY = 0x03
+MSG_TRAJ = 0x04
+MSG_TELEMETRY_REQ = 0x05
+MSG_STOP = 0x06
+MSG_STREAM_START = 0x07
+MSG_STREAM_END = 0x08
+MSG_TIME_SYNC = 0x09
+MSG_SETPOINT_AT = 0x0A
+MSG_SCRIPT_LOAD = 0x0B
+MSG_SCRIPT_RUN = 0x0C
+
+# Device -> host
+MSG_ACK = 0x80
+MSG_PONG = 0x81
+MSG_TELEMETRY = 0x85
+MSG_CREDIT = 0x86  # Unsolicited, seq 0
+MSG_TIME = 0x87
+
+# ACK status
+ST_OK = 0
+ST_BAD_LEN = 1
+ST_FULL = 2
+ST_UNKNOWN = 3
+ST_RANGE = 4
+ST_LATE = 5
+ST_INVALID = 6
+STATUS_NAMES = {ST_OK: "ok", ST_BAD_LEN: "bad length", ST_FULL: "queue full",
+                ST_UNKNOWN: "unknown message", ST_RANGE: "out of range",
+                ST_LATE: "already due", ST_INVALID: "invalid script"}
+
+# Control modes
+MODE_IDLE = 0
+MODE_SETPOINT = 1
+MODE_VELOCITY = 2
+MODE_TRAJ = 3
+MODE_SCRIPT = 4
+MODE_NAMES = {MODE_IDLE: "idle", MODE_SETPOINT: "setpoint",
+              MODE_VELOCITY: "velocity", MODE_TRAJ: "trajectory", MODE_SCRIPT: "script"}
+
+ACK_FMT = "<BH"
+PONG_FMT = "<BBHI"
+TELEMETRY_FMT = "<I4BBHHHHHI"
+CREDIT_FMT = "<BHHH"
+TIME_FMT = "<III"
+
+# Poses per TRAJ frame
+MAX_CHUNK = MAX_PAYLOAD // 4
+# Bytecode per SCRIPT_LOAD frame, after the offset
+SCRIPT_CHUNK = MAX_PAYLOAD - 2
+
+Ack = namedtuple("Ack", "status free")
+Pong = namedtuple("Pong", "version max_payload queue_size period_us")
+Telemetry = namedtuple("Telemetry", "ticks_ms angles mode queued overruns crc_errors underruns "
+                                     "late max_late_us")
+Credit = namedtuple("Credit", "last_seq free queued underruns")
+Time = namedtuple("Time", "rx_us tx_us ticks_ms")
+
+
+def _crc8_table():
+    table = []
+    for i in range(256):
+        c = i
+        for _ in range(8):
+            c = ((c << 1) ^ 0x07) & 0xFF if c & 0x80 else (c << 1) & 0xFF
+        table.append(c)
+    return bytes(table)
+
+
+CRC8 = _crc8_table()
+
+
+def crc8(data, crc=0):
+    for b in data:
+        crc = CRC8[crc ^ b]
+    return crc
+
+
+def encode(msg, seq, payload=b""):
+    """One complete frame"""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError("payload too long (%d bytes)" % len(payload))
+    body = bytes((msg, seq & 0xFF, len(payload))) + bytes(payload)
+    return bytes((SYNC,)) + body + bytes((crc8(body),))
+
+
+def setpoint_payload(angles):
+    return bytes(_angle(a) for a in angles)
+
+
+def velocity_payload(velocities):
+    return struct.pack("<4h", *(int(v) for v in velocities))
+
+
+def setpoint_at_payload(t_us, angles):
+    return struct.pack("<I", t_us % TICKS_PERIOD) + setpoint_payload(angles)
+
+
+def traj_payload(poses):
+    return b"".join(setpoint_payload(p) for p in poses)
+
+
+def script_load_payload(offset, code):
+    return struct.pack("<H", offset) + bytes(code)
+
+
+def _angle(a):
+    a = int(round(a))
+    if not 0 <= a <= 180:
+        raise ValueError("angle %d out of range 0-180" % a)
+    return a
+
+
+def decode_reply(msg, payload):
+    """Ack, Pong, Telemetry, Credit or Time for a device frame"""
+    if msg == MSG_ACK:
+        return Ack(*struct.unpack(ACK_FMT, payload))
+    if msg == MSG_PONG:
+        return Pong(*struct.unpack(PONG_FMT, payload))
+    if msg == MSG_TELEMETRY:
+        t, a, b, c, d, *rest = struct.unpack(TELEMETRY_FMT, payload)
+        return Telemetry(t, (a, b, c, d), *rest)
+    if msg == MSG_CREDIT:
+        return Credit(*struct.unpack(CREDIT_FMT, payload))
+    if msg == MSG_TIME:
+        return Time(*struct.unpack(TIME_FMT, payload))
+    raise ValueError("unknown reply type 0x%02x" % msg)
+
+
+class Decoder:
+    """Incremental frame decoder, feed() returns the complete frames"""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.crc_errors = 0
+
+    def feed(self, data):
+        """List of (msg, seq, payload) found after adding data"""
+        self.buf += data
+        frames = []
+        buf = self.buf
+        while True:
+            start = buf.find(bytes((SYNC,)))
+            if start < 0:
+                buf.clear()
+                break
+            del buf[:start]
+            if len(buf) < 4:
+                break
+            size = 5 + buf[3]
+            if len(buf) < size:
+                break
+            body = bytes(buf[1:size - 1])
+            if crc8(body) == buf[size - 1]:
+                frames.append((body[0], body[1], body[3:]))
+                del buf[:size]
+            else:
+                # Not a frame after all, resync on the next SYNC byte
+                self.crc_errors += 1
+                del buf[:1]
+        return frames
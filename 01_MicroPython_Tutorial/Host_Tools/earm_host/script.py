@@ -0,0 +1,23 @@
+"""
+Motion scripts from the PC
+
+The compiler is Example_Codes/earm/motion_script.py itself, so the PC
+and the board always agree on the bytecode. Scripts are compiled here,
+sent with ArmClient.load_script() and run on the board without the PC.
+"""
+
+import os
+import sys
+
+EXAMPLES = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                         "..", "..", "Example_Codes"))
+if EXAMPLES not in sys.path:
+    sys.path.append(EXAMPLES)
+
+from earm.motion_script import ScriptError, compile_script, disassemble  # noqa: E402,F401
+
+
+def compile_file(path):
+    """Bytecode of a script file"""
+    with open(path) as f:
+        return compile_script(f.read())
@@ -0,0 +1,122 @@
+"""
+Credit based trajectory streaming
+
+The board reports its free jitter buffer slots in every ACK and, while
+a stream plays, in unsolicited CREDIT frames. The streamer keeps as many
+poses in flight as those reports allow, without waiting for each ACK,
+so the link runs at full speed but can never overflow the board.
+
+    report (last_seq, free)  -> credit = free - poses sent after last_seq
+"""
+
+import time
+from collections import deque, namedtuple
+
+from earm_host import protocol as p
+from earm_host.client import ProtocolError
+
+StreamStats = namedtuple(
+    "StreamStats",
+    "poses chunks seconds play_seconds underruns credit_waits max_in_flight")
+
+
+class TrajectoryStreamer:
+    """Stream a planned trajectory into the board's jitter buffer"""
+
+    def __init__(self, client, chunk=16, prefill_s=0.25, stall_timeout=1.0):
+        """
+        Parameters:
+            client: Connected ArmClient
+            chunk: Poses per TRAJ frame
+            prefill_s: Seconds of poses the board buffers before playing,
+                       the longest link hiccup that causes no underrun
+            stall_timeout: Seconds without a credit before resyncing by telemetry
+        """
+        self.client = client
+        self.chunk = max(1, min(chunk, p.MAX_CHUNK))
+        self.prefill_s = prefill_s
+        self.stall_timeout = stall_timeout
+        self.in_flight = deque()  # (seq, poses) not yet covered by a report
+        self.free = 0  # Free slots in the last report
+
+    def _report(self, seq, free):
+        """A report covering every frame up to and including seq"""
+        seqs = [s for s, _ in self.in_flight]
+        if seq in seqs:
+            for _ in range(seqs.index(seq) + 1):
+                self.in_flight.popleft()
+        self.free = free
+
+    def _on_credit(self, credit):
+        self._report(credit.last_seq, credit.free)
+
+    def credit(self):
+        return self.free - sum(n for _, n in self.in_flight)
+
+    def _collect_acks(self):
+        for seq, _ in list(self.in_flight):
+            ack = self.client.take_reply(seq)
+            if ack is None:
+                continue
+            if ack.status != p.ST_OK:
+                raise ProtocolError("chunk rejected: " + p.STATUS_NAMES.get(ack.status, str(ack.status)))
+            self._report(seq, ack.free)
+
+    def _resync(self):
+        """Lost reports: telemetry is answered after every earlier frame"""
+        t = self.client.telemetry()
+        self.in_flight.clear()
+        self.free = self.client.info.queue_size - t.queued
+
+    def stream(self, poses, on_progress=None, start_t=None):
+        """
+        Send all poses, wait until they are played, return StreamStats
+
+        start_t: Board ticks_ms to start playing at, None = after prefill
+        """
+        client = self.client
+        info = client.ping()
+        period = info.period_us / 1e6
+        chunk = min(self.chunk, info.queue_size)
+        prefill = min(info.queue_size - chunk, max(chunk, int(self.prefill_s / period)))
+        underruns = client.telemetry().underruns
+        credit_waits = 0
+        max_in_flight = 0
+
+        client.on_credit = self._on_credit
+        try:
+            t0 = time.monotonic()
+            self.in_flight.clear()
+            self.free = client.stream_start(prefill, start_t).free
+            i = 0
+            last_progress = time.monotonic()
+            while i < len(poses):
+                client.poll(0)
+                self._collect_acks()
+                part = poses[i:i + chunk]
+                if self.credit() >= len(part):
+                    seq = client.send(p.MSG_TRAJ, p.traj_payload(part))
+                    self.in_flight.append((seq, len(part)))
+                    i += len(part)
+                    max_in_flight = max(max_in_flight, sum(n for _, n in self.in_flight))
+                    last_progress = time.monotonic()
+                    if on_progress:
+                        on_progress(i, len(poses))
+                    continue
+                credit_waits += 1
+                if not client.poll(period):
+                    if time.monotonic() - last_progress > self.stall_timeout:
+                        self._resync()
+                        last_progress = time.monotonic()
+            # Wait for the outstanding ACKs before ending the stream
+            deadline = time.monotonic() + self.stall_timeout
+            while self.in_flight and time.monotonic() < deadline:
+                client.poll(period)
+                self._collect_acks()
+            client.stream_end()
+            t = client.wait_idle(timeout=len(poses) * period + 5)
+        finally:
+            client.on_credit = None
+        t_end = time.monotonic()
+        return StreamStats(len(poses), -(-len(poses) // chunk), t_end - t0,
+                           len(poses) * period, t.underruns - underruns, credit_waits, max_in_flight)
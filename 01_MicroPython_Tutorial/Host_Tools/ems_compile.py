@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Motion script compiler
+
+Compiles an eArm motion script (see Example_Codes/earm/motion_script.py)
+to bytecode, prints the listing and writes a .ems file that can be
+copied to the board and loaded with earm.motion_script.load_script(),
+or sends it straight to a board and runs it.
+
+Usage:
+    python ems_compile.py pick.txt                      # writes pick.ems
+    python ems_compile.py pick.txt --run /dev/ttyACM0   # or --run 192.168.4.1
+"""
+
+import argparse
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+from earm_host.script import ScriptError, compile_file, disassemble  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="eArm motion script compiler")
+    parser.add_argument("script", help="script source file")
+    parser.add_argument("-o", "--output", help="bytecode file (default: script name with .ems)")
+    parser.add_argument("--run", metavar="PORT|HOST", help="load and run on a board instead")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no listing")
+    args = parser.parse_args()
+    try:
+        code = compile_file(args.script)
+    except ScriptError as e:
+        sys.exit("%s: %s" % (args.script, e))
+    if not args.quiet:
+        for offset, text in disassemble(code):
+            print("%5d  %s" % (offset, text))
+    print("%d bytes" % len(code))
+    if args.run:
+        from earm_host import ArmClient
+        if os.path.exists(args.run):
+            arm = ArmClient.open(args.run, start=True)
+        else:
+            arm = ArmClient.connect(args.run)
+        with arm:
+            arm.ping()
+            arm.run_script(code)
+            print(arm.wait_idle(timeout=3600))
+        return
+    output = args.output or os.path.splitext(args.script)[0] + ".ems"
+    with open(output, "wb") as f:
+        f.write(code)
+    print("wrote", output)
+
+
+if __name__ == "__main__":
+    main()
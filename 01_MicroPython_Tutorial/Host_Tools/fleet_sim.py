@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Simulated eArm fleet on localhost
+
+Starts N boards as separate processes, each running earm.serial_control
+behind earm.tcp_port on 127.0.0.1 (port 5005, 5006, ...) with its own
+skewed ticks_ms clock, then drives them with earm_host.Fleet: ping,
+setpoints, aggregated telemetry, a synchronized trajectory, a timed
+setpoint on all arms and reconnecting after a dropped connection.
+
+Every simulated board prints the host's monotonic time when a stream
+starts playing or a timed setpoint runs, which is how the checks
+measure the spread between the arms.
+
+Usage:
+    python fleet_sim.py                 # 3 boards, run the checks
+    python fleet_sim.py --boards 8
+    python fleet_sim.py --serve 4       # only run 4 boards, for trying Fleet by hand
+"""
+
+import argparse
+import os
+import queue
+import random
+import subprocess
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+BASE_PORT = 5005
+
+
+def board(port, skew_ms, rate_hz=100):
+    """Run one simulated board in this process (does not return)"""
+    sys.path.insert(0, os.path.join(HERE, "stubs"))
+    import cpython_compat
+    cpython_compat.install()
+    # Every board's ticks start somewhere else, like boards booted at different times
+    cpython_compat._t0 -= skew_ms / 1000
+
+    from earm.jitter_buffer import JB_PLAYING
+    from earm.serial_control import SerialControl
+    from earm.tcp_port import TcpPort
+
+    app = SerialControl(port=TcpPort(port, "127.0.0.1"), rate_hz=rate_hz)
+    jitter = app.jitter
+    step = jitter.step
+    playing = [False]
+
+    def report_start():
+        step()
+        now = jitter.state == JB_PLAYING
+        if now and not playing[0]:
+            print("started %d %.4f" % (port, time.monotonic()), flush=True)
+        playing[0] = now
+
+    jitter.step = report_start
+
+    schedule = app.schedule
+    run = schedule.run
+
+    def report_setpoint(deadline):
+        done = run(deadline)
+        if done:
+            print("setpoint %d %.4f" % (port, time.monotonic()), flush=True)
+        return done
+
+    schedule.run = report_setpoint
+    print("ready %d" % port, flush=True)
+    app.run()
+
+
+def _reader(stream, lines):
+    for line in stream:
+        lines.put(line.split())
+
+
+def start_boards(n, base_port=BASE_PORT):
+    """N board processes, returns (processes, queue of their output lines)"""
+    lines = queue.Queue()
+    procs = []
+    for i in range(n):
+        skew = random.randint(0, 500000)
+        proc = subprocess.Popen(
+            [sys.executable, __file__, "--board", str(base_port + i), "--skew", str(skew)],
+            stdout=subprocess.PIPE, text=True)
+        threading.Thread(target=_reader, args=(proc.stdout, lines), daemon=True).start()
+        procs.append(proc)
+    ready = 0
+    deadline = time.monotonic() + 10
+    while ready < n and time.monotonic() < deadline:
+        try:
+            if lines.get(timeout=0.5)[0] == "ready":
+                ready += 1
+        except queue.Empty:
+            pass
+    return procs, lines
+
+
+def _times(lines, kind, n, timeout=2.0):
+    """Monotonic times of the next n lines of one kind from the boards"""
+    times = []
+    deadline = time.monotonic() + timeout
+    while len(times) < n and time.monotonic() < deadline:
+        try:
+            line = lines.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if line[0] == kind:
+            times.append(float(line[2]))
+    return times
+
+
+def check(name, ok, detail=""):
+    print("%-40s %s %s" % (name, "ok" if ok else "FAILED", detail))
+    return ok
+
+
+def run_checks(n):
+    from earm_host import Fleet, planner
+    from earm_host import protocol as p
+
+    procs, lines = start_boards(n)
+    results = []
+    try:
+        fleet = Fleet(["127.0.0.1:%d" % (BASE_PORT + i) for i in range(n)])
+        pongs = fleet.ping()
+        results.append(check("ping %d boards" % n, len(pongs) == n and
+                             all(x.version == p.VERSION for x in pongs.values())))
+
+        fleet.setpoint((90, 60, 60, 90))
+        st = fleet.status()
+        results.append(check("setpoint + status", st.online == n and
+                             all(t.angles == (90, 60, 60, 90) for t in st.telemetry.values()),
+                             "%d online" % st.online))
+
+        offsets = fleet.sync_clocks()
+        spread = max(o for o, _ in offsets.values()) - min(o for o, _ in offsets.values())
+        results.append(check("clock offsets", len(offsets) == n,
+                             "skew spread %d ms, max rtt %d ms"
+                             % (spread, max(r for _, r in offsets.values()))))
+
+        period = pongs[fleet.names[0]].period_us / 1e6
+        poses = planner.plan_smooth([(90, 60, 60, 90), (130, 90, 80, 60), (90, 60, 60, 90)],
+                                    period, speed=0.5)
+        stats = fleet.stream(poses, lead=0.5)
+        starts = _times(lines, "started", n)
+        ok = len(stats) == n and len(starts) == n and all(s.underruns == 0 for s in stats.values())
+        detail = ""
+        if starts:
+            detail = "start spread %.1f ms" % ((max(starts) - min(starts)) * 1000)
+            ok = ok and max(starts) - min(starts) <= 2 * period + 0.005
+        results.append(check("synchronized stream", ok, detail))
+
+        at = time.monotonic() + 0.3
+        acks = fleet.setpoint_at((70, 80, 90, 100), delay=0.3)
+        times = _times(lines, "setpoint", n)
+        st = fleet.status()
+        ok = (len(acks) == n and len(times) == n and st.online == n and
+              all(t.angles == (70, 80, 90, 100) and t.late == 0 for t in st.telemetry.values()))
+        detail = ""
+        if times:
+            detail = "spread %.2f ms, %.2f ms after the requested time" % (
+                (max(times) - min(times)) * 1000, (max(times) - at) * 1000)
+            ok = ok and max(times) - min(times) < 0.002
+        results.append(check("timed setpoint on all arms", ok, detail))
+
+        # Drop one connection behind the fleet's back, the next call reconnects
+        name = fleet.names[-1]
+        fleet.clients[name].transport.sock.close()
+        fleet.telemetry()
+        st = fleet.status()
+        results.append(check("reconnect", st.online == n, "%d online" % st.online))
+        fleet.close()
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="simulated eArm fleet on localhost")
+    parser.add_argument("--boards", type=int, default=3, help="number of boards")
+    parser.add_argument("--serve", type=int, metavar="N", help="only run N boards")
+    parser.add_argument("--board", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--skew", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.board:
+        board(args.board, args.skew)
+    elif args.serve:
+        procs, lines = start_boards(args.serve)
+        print("Boards on 127.0.0.1:%d-%d" % (BASE_PORT, BASE_PORT + args.serve - 1))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            for proc in procs:
+                proc.terminate()
+    else:
+        sys.exit(0 if run_checks(args.boards) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+G-code sender for gcode_control_eArm.py
+
+Streams a G-code file to the board with character counting: lines are
+sent while the board's unanswered bytes stay within its receive window,
+each "ok" or "error:" answers the oldest line. Over HTTP the file is
+POSTed to /gcode in one request and the board reads it as fast as it
+runs it.
+
+--sim runs the board side (earm.gcode_control on CPython, with the
+stubs standing in for the hardware) on a pty and an HTTP port on
+localhost, streams a generated program of --lines short segments both
+ways and checks that it ran without errors and without stopping at the
+junctions.
+
+Usage:
+    python gcode_send.py part.gcode --port /dev/ttyACM0
+    python gcode_send.py part.gcode --tcp 192.168.1.51:23
+    python gcode_send.py part.gcode --url http://192.168.1.51/gcode
+    python gcode_send.py --sim --lines 5000
+"""
+
+import argparse
+import math
+import os
+import select
+import socket
+import sys
+import time
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+RX_WINDOW = 128  # earm.gcode_control.RX_WINDOW
+
+
+class Sender:
+    """Character counting G-code streamer over any byte transport"""
+
+    def __init__(self, read, write, window=RX_WINDOW):
+        """read(timeout) returns the bytes available, write(data) sends"""
+        self.read = read
+        self.write = write
+        self.window = window
+        self.buf = b""
+        self.errors = []
+        self.replies = []
+
+    def _answers(self, timeout):
+        """Complete answer lines received within timeout"""
+        self.buf += self.read(timeout)
+        *lines, self.buf = self.buf.split(b"\n")
+        return [line.strip().decode(errors="replace") for line in lines if line.strip()]
+
+    def stream(self, lines):
+        """Send every line, returns (lines sent, errors as (line no, reason))"""
+        pending = []  # (line no, bytes) sent and not answered
+        in_flight = 0
+        it = iter(enumerate(lines, 1))
+        nxt = next(it, None)
+        while nxt is not None or pending:
+            while nxt is not None:
+                no, text = nxt
+                text = text.split(";", 1)[0].strip()
+                if not text:
+                    nxt = next(it, None)
+                    continue
+                data = text.encode() + b"\n"
+                if pending and in_flight + len(data) > self.window:
+                    break
+                self.write(data)
+                pending.append((no, len(data)))
+                in_flight += len(data)
+                nxt = next(it, None)
+            for answer in self._answers(0.05 if pending else 0):
+                if answer == "ok" or answer.startswith("error"):
+                    no, size = pending.pop(0)
+                    in_flight -= size
+                    if answer.startswith("error"):
+                        self.errors.append((no, answer[6:]))
+                else:
+                    self.replies.append(answer)
+        return self.errors
+
+
+def serial_transport(path):
+    import serial
+    port = serial.Serial(path, 115200, timeout=0)
+
+    def read(timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            data = port.read(4096)
+            if data or time.monotonic() >= deadline:
+                return data
+            time.sleep(0.002)
+
+    return read, port.write
+
+
+def fd_transport(fd):
+    def read(timeout):
+        r, _, _ = select.select([fd], [], [], timeout)
+        return os.read(fd, 4096) if r else b""
+
+    def write(data):
+        while data:
+            data = data[os.write(fd, data):]
+
+    return read, write
+
+
+def tcp_transport(address):
+    host, _, port = address.partition(":")
+    sock = socket.create_connection((host, int(port or 23)), timeout=3)
+
+    def read(timeout):
+        r, _, _ = select.select([sock], [], [], timeout)
+        return sock.recv(4096) if r else b""
+
+    return read, sock.sendall
+
+
+def post(url, data, timeout=600):
+    """POST a program, returns the board's answer"""
+    req = urllib.request.Request(url, data=data, method="POST",
+                                 headers={"Content-Type": "text/plain"})
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return resp.read().decode()
+
+
+def demo_program(n):
+    """n one-degree G1 segments along a smooth closed curve of joints A and B"""
+    lines = ["G90", "G0 A90 B130", "G1 F6000"]
+    for k in range(1, n + 1):
+        t = 2 * math.pi * k / 360
+        lines.append("G1 A%.2f B%.2f" % (90 + 40 * math.sin(t), 100 + 30 * math.cos(t)))
+    lines += ["M5", "G4 P100", "M3", "M114"]
+    return lines
+
+
+def run_sim(n, http_port=8080):
+    sys.path.insert(0, os.path.join(HERE, "stubs"))
+    import threading
+    import tty
+    import cpython_compat
+    cpython_compat.install()
+    from pty_loopback import PtyPort
+    from earm.gcode_control import GcodeControl
+    from earm.gcode import MIN_SPEED, SEG_MOVE
+
+    board_fd, host_fd = os.openpty()
+    tty.setraw(host_fd)
+    app = GcodeControl(port=PtyPort(board_fd), http_port=http_port)
+    app.begin()
+    planner = app.planner
+    step = planner.step
+    slow = [0]
+
+    def watch(dt):
+        v = planner.v
+        step(dt)
+        # Slowing to a crawl before a junction that could be taken at speed
+        # means the look-ahead failed to blend
+        nxt = (planner.head + 1) % planner.size
+        if (planner.count > 1 and planner.kind[planner.head] == SEG_MOVE and v > MIN_SPEED
+                and planner.vjunction[nxt] > MIN_SPEED and planner.v <= MIN_SPEED):
+            slow[0] += 1
+
+    planner.step = watch
+    threading.Thread(target=app.loop.run, args=(app.tick,), daemon=True).start()
+
+    lines = demo_program(n)
+    results = []
+    sender = Sender(*fd_transport(host_fd))
+    t0 = time.monotonic()
+    errors = sender.stream(lines)
+    while planner.count:
+        time.sleep(0.01)
+    elapsed = time.monotonic() - t0
+    ok = not errors and slow[0] == 0 and sender.replies and sender.replies[-1].startswith("A:")
+    results.append(ok)
+    print("%-40s %s %d lines in %.2f s (%.0f lines/s), %d errors, %d crawling ticks, %s"
+          % ("serial stream", "ok" if ok else "FAILED", len(lines), elapsed,
+             len(lines) / elapsed, len(errors), slow[0], sender.replies[-1:]))
+
+    program = "\n".join(lines + ["G1 A500", "G7"]).encode()
+    t0 = time.monotonic()
+    answer = post("http://127.0.0.1:%d/gcode" % http_port, program)
+    elapsed = time.monotonic() - t0
+    ok = answer.startswith("ok %d" % len(lines)) and "errors 2" in answer and slow[0] == 0
+    results.append(ok)
+    print("%-40s %s %d bytes in %.2f s, %d crawling ticks: %s"
+          % ("HTTP POST", "ok" if ok else "FAILED", len(program), elapsed, slow[0],
+             " / ".join(answer.split("\n"))))
+    status = urllib.request.urlopen("http://127.0.0.1:%d/" % http_port, timeout=5).read().decode()
+    print("%-40s %s" % ("HTTP status", " / ".join(status.split("\n"))))
+    app.loop.stop()
+    print(app.loop.report())
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="stream G-code to the eArm")
+    parser.add_argument("file", nargs="?", help="G-code file")
+    parser.add_argument("--port", help="serial port")
+    parser.add_argument("--tcp", metavar="HOST[:PORT]", help="board on WiFi, port 23 by default")
+    parser.add_argument("--url", help="POST the file to this URL, e.g. http://192.168.4.1/gcode")
+    parser.add_argument("--sim", action="store_true", help="run against a simulated board")
+    parser.add_argument("--lines", type=int, default=2000, help="segments of the --sim program")
+    args = parser.parse_args()
+    if args.sim:
+        sys.exit(0 if run_sim(args.lines) else 1)
+    if not args.file:
+        parser.error("a G-code file is needed")
+    with open(args.file) as f:
+        lines = f.read().splitlines()
+    t0 = time.monotonic()
+    if args.url:
+        print(post(args.url, "\n".join(lines).encode()))
+    else:
+        if args.port:
+            transport = serial_transport(args.port)
+        elif args.tcp:
+            transport = tcp_transport(args.tcp)
+        else:
+            parser.error("one of --port, --tcp or --url is needed")
+        sender = Sender(*transport)
+        errors = sender.stream(lines)
+        for reply in sender.replies:
+            print(reply)
+        for no, reason in errors:
+            print("line %d: %s" % (no, reason))
+    print("%d lines in %.1f s" % (len(lines), time.monotonic() - t0))
+
+
+if __name__ == "__main__":
+    main()
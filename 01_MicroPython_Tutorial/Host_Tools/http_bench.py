@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Load and fuzz the eArm web servers
+
+Runs the accept loop of web_app.py or web_app_control_eArm.py
+(WebControl.run()) on CPython with the stubs, on a local port, or drives
+a board over WiFi (--url), and reports throughput, drop rate and
+latency for each phase:
+
+    load       concurrent clients sending the page's requests: telemetry
+               polls, hold-to-move jogs, buzzer and page loads
+    slowloris  the same load while other clients open connections and
+               send their request a byte at a time, or nothing at all
+    partial    requests split into several TCP segments with pauses
+    fuzz       malformed request lines, bad UTF-8, overlong heads and
+               random queries, each followed by a probe that the server
+               still answers
+
+A request is dropped when the connection is refused or reset, no
+complete response arrives within --timeout, or the status is not 200.
+For the local servers the earm.http counters and the errors caught by
+the server loop are reported as well.
+
+The local servers get a socket module whose bind() takes the port given
+here and whose sockets accept str like MicroPython's, so --examples can
+benchmark any checkout of Example_Codes, e.g. one from before a change.
+
+Usage:
+    python http_bench.py
+    python http_bench.py --server web_app --clients 16 --seconds 10
+    python http_bench.py --examples ../old/Example_Codes
+    python http_bench.py --url http://192.168.4.1 --clients 4
+"""
+
+import argparse
+import os
+import random
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SERVERS = ("web_app", "web_control")
+
+# Queries of the pages, "" is a page load; {t} is the page's session
+# token and {n} its command counter (web_control only)
+MIXES = {
+    "web_app": ["status_check=1"] * 4
+               + ["a_plus=1", "a_plus=0", "d_minus=1", "d_minus=0"] * 2
+               + ["buzzer=on", "buzzer=off", ""],
+    "web_control": ["tm=1&t={t}"] * 6
+                   + ["a_plus=1&n={n}&t={t}", "a_plus=0&n={n}&t={t}",
+                      "d_minus=1&n={n}&t={t}", "d_minus=0&n={n}&t={t}"]
+                   + ["buzzer=off&t={t}", ""],
+}
+
+PROBE = b"GET /?status_check=1 HTTP/1.1\r\nHost: earm\r\n\r\n"
+
+
+def setup(examples=None):
+    """Make earm importable, from examples if given"""
+    sys.path.insert(0, os.path.join(HERE, "stubs"))
+    import cpython_compat
+    cpython_compat.install()
+    if examples:
+        sys.path.insert(0, os.path.abspath(examples))
+
+
+class BoardSocket(socket.socket):
+    """CPython socket bound to the bench port, taking str like MicroPython's"""
+    port = 0
+
+    def bind(self, address):
+        super().bind(("127.0.0.1", self.port))
+
+    def accept(self):
+        fd, addr = self._accept()
+        sock = BoardSocket(self.family, self.type, self.proto, fileno=fd)
+        # Blocking like the accepted sockets of lwIP
+        sock.setblocking(True)
+        return sock, addr
+
+    def send(self, data, *args):
+        return super().send(data.encode() if isinstance(data, str) else data, *args)
+
+    def sendall(self, data, *args):
+        return super().sendall(data.encode() if isinstance(data, str) else data, *args)
+
+    def write(self, data):
+        self.sendall(data)
+        return len(data)
+
+
+class SocketModule:
+    """The socket module as the server sees it"""
+    socket = BoardSocket
+
+    def __getattr__(self, name):
+        return getattr(socket, name)
+
+
+class ServerErrors:
+    """Errors the server loop caught and logged as EV_SERVER_ERROR"""
+    def __init__(self):
+        self.errors = []
+        try:
+            from earm.log import log, EV_SERVER_ERROR
+        except ImportError:
+            return  # Checkout without earm.log, errors are printed
+        event = log.event
+
+        def logged(code, a=None, b=None):
+            if code == EV_SERVER_ERROR:
+                self.errors.append("%s: %s" % (type(a).__name__, a))
+            return event(code, a, b)
+        log.event = logged
+
+    def line(self):
+        if not self.errors:
+            return "none"
+        return "%d, first %s" % (len(self.errors), self.errors[0])
+
+
+def start_server(name, port, workdir):
+    """Run the accept loop of name in a thread, returns once it listens"""
+    try:
+        from earm.log import log
+        log.set_output(os.path.join(workdir, name + ".log"), 1 << 20)
+    except ImportError:
+        pass
+    if name == "web_app":
+        import web_app as module
+        run = module.main
+    else:
+        import earm.web_control as module
+        run = module.WebControl().run
+    module.setup_wifi = lambda: None
+    module.print = lambda *args, **kwargs: None
+    BoardSocket.port = port
+    module.socket = SocketModule()
+    threading.Thread(target=run, daemon=True).start()
+    deadline = time.monotonic() + 5
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), 1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def server_stats():
+    """The earm.http counters of the local server, None if it has none"""
+    try:
+        import earm.http
+        return earm.http.report()
+    except (ImportError, AttributeError):
+        return None
+
+
+def request(addr, data, timeout, pieces=1, pause=0.0, shut=False):
+    """
+    Send a request and read the response until the server closes
+
+    The request is sent in pieces with pause seconds between them, shut
+    closes the sending side after it, so that an incomplete request is
+    dropped at once instead of timing out. Returns (status, body, seconds), status None when no complete
+    response arrived.
+    """
+    t0 = time.perf_counter()
+    chunks = []
+    try:
+        with socket.create_connection(addr, timeout) as s:
+            s.settimeout(timeout)
+            step = max(1, -(-len(data) // pieces))
+            for i in range(0, len(data), step):
+                if i:
+                    time.sleep(pause)
+                s.sendall(data[i:i + step])
+            if shut:
+                s.shutdown(socket.SHUT_WR)
+            while True:
+                b = s.recv(4096)
+                if not b:
+                    break
+                chunks.append(b)
+    except OSError:
+        return None, b"", time.perf_counter() - t0
+    seconds = time.perf_counter() - t0
+    head, sep, body = b"".join(chunks).partition(b"\r\n\r\n")
+    first = head.split(b"\r\n", 1)[0].split(b" ")
+    if not sep or len(first) < 2 or not first[0].startswith(b"HTTP/1.") or not first[1].isdigit():
+        return None, body, seconds
+    return int(first[1]), body, seconds
+
+
+class Stats:
+    """Outcome and latency of the requests of a phase, shared by its clients"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = []
+        self.dropped = 0
+        self.t0 = time.perf_counter()
+        self.t1 = self.t0
+
+    def add(self, ok, seconds):
+        with self.lock:
+            if ok:
+                self.latency.append(seconds)
+            else:
+                self.dropped += 1
+            self.t1 = time.perf_counter()
+
+    def requests(self):
+        return len(self.latency) + self.dropped
+
+    def drop_rate(self):
+        return self.dropped / max(1, self.requests())
+
+    def passed(self, max_drop):
+        return self.requests() > 0 and self.drop_rate() <= max_drop
+
+    def line(self):
+        lat = sorted(self.latency)
+        n = len(lat)
+
+        def ms(p):
+            return 1000 * lat[min(n - 1, int(p * n))] if n else 0.0
+        return "%d requests, %.0f req/s, %.1f %% dropped, ms p50 %.1f p95 %.1f p99 %.1f max %.1f" % (
+            self.requests(), n / max(1e-9, self.t1 - self.t0), 100 * self.drop_rate(),
+            ms(0.5), ms(0.95), ms(0.99), 1000 * lat[-1] if n else 0.0)
+
+
+class Page:
+    """One browser page: a session token and the mix of requests it sends"""
+    def __init__(self, mix, rng):
+        self.mix = mix
+        self.rng = rng
+        self.token = ""
+        self.n = 0
+
+    def next(self):
+        query = self.rng.choice(self.mix)
+        if not query:
+            return b"GET / HTTP/1.1\r\nHost: earm\r\n\r\n", True
+        self.n += 1
+        query = query.replace("{t}", self.token).replace("{n}", str(self.n))
+        return ("GET /?%s HTTP/1.1\r\nHost: earm\r\n\r\n" % query).encode(), False
+
+    def loaded(self, body):
+        m = re.search(rb"var T='(\w*)'", body)
+        if m:
+            self.token = m.group(1).decode()
+            self.n = 0
+
+
+def run_clients(addr, mix, args, stats, seed, pieces=1, pause=0.0):
+    """args.clients pages sending requests back to back for args.seconds"""
+    stop = time.monotonic() + args.seconds
+
+    def client(k):
+        page = Page(mix, random.Random(seed + k))
+        status, body, seconds = request(addr, b"GET / HTTP/1.1\r\n\r\n", args.timeout)
+        stats.add(status == 200, seconds)
+        page.loaded(body)
+        while time.monotonic() < stop:
+            data, load = page.next()
+            status, body, seconds = request(addr, data, args.timeout, pieces, pause)
+            stats.add(status == 200, seconds)
+            if load and status == 200:
+                page.loaded(body)
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(args.clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def slow_client(addr, drip, stop, counts, silent):
+    """Keep a connection open with an unfinished request, reconnect when dropped"""
+    data = b"GET /?status_check=1 HTTP/1.1\r\nHost: earm\r\nX-Slow: " + b"a" * 4096
+    while not stop.is_set():
+        try:
+            with socket.create_connection(addr, 2) as s:
+                counts[0] += 1
+                s.settimeout(drip)
+                i = 0
+                while not stop.is_set():
+                    if not silent and i < len(data):
+                        s.send(data[i:i + 1])
+                        i += 1
+                    try:
+                        if not s.recv(4096):
+                            break  # Dropped by the server
+                    except socket.timeout:
+                        continue
+                counts[1] += 1 if not stop.is_set() else 0
+        except OSError:
+            counts[1] += 1
+            stop.wait(drip)
+
+
+def fuzz_cases(rng, count):
+    """Malformed requests: fixed cases first, then random mutations of page requests"""
+    cases = [
+        b"", b"\r\n\r\n", b"GET\r\n\r\n", b"GET /\r\n\r\n", b"GET  HTTP/1.1\r\n\r\n",
+        b"GET ? HTTP/1.1\r\n\r\n", b"GET /? HTTP/1.1\r\n\r\n", b"GET /?& HTTP/1.1\r\n\r\n",
+        b"GET /?= HTTP/1.1\r\n\r\n", b"GET /?=1 HTTP/1.1\r\n\r\n", b"GET /?a==b HTTP/1.1\r\n\r\n",
+        b"GET /?a_plus HTTP/1.1\r\n\r\n", b"GET /?a_plus=1?b_plus=1 HTTP/1.1\r\n\r\n",
+        b"GET /?%zz=%00 HTTP/1.1\r\n\r\n", b"GET /?tm=1&t= HTTP/1.1\r\n\r\n",
+        b"GET /?a_plus=1&n=abc HTTP/1.1\r\n\r\n", b"GET /?a_plus=1&n=-1 HTTP/1.1\r\n\r\n",
+        b"GET /?a_plus=1&n=99999999999999999999 HTTP/1.1\r\n\r\n",
+        b"GET /?a_plus=2 HTTP/1.1\r\n\r\n", b"GET /?buzzer=maybe HTTP/1.1\r\n\r\n",
+        b"GET /?play=../../boot HTTP/1.1\r\n\r\n", b"GET /?play= HTTP/1.1\r\n\r\n",
+        b"GET /?stop HTTP/1.1\r\n\r\n", b"GET /?take=1&t=x HTTP/1.1\r\n\r\n",
+        b"GET /?history=x HTTP/1.1\r\n\r\n", b"GET /?history=99 HTTP/1.1\r\n\r\n",
+        b"GET /?history=-1&fmt=csv HTTP/1.1\r\n\r\n",
+        b"GET /?adc_capture=x HTTP/1.1\r\n\r\n", b"GET /?adc_capture=1&burst=-5&period=x HTTP/1.1\r\n\r\n",
+        b"GET /?a_plus=1\r\n\r\n", b"GET /?a_plus=1 HTTP/1.1\n\n", b"GET /?a_plus=1 HTTP/1.1\r\n",
+        b"POST /?a_plus=0 HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello",
+        b"\xff\xfe\xfd GET / HTTP/1.1\r\n\r\n", b"GET /?a_plus=\xc3\x28 HTTP/1.1\r\n\r\n",
+        b"GET /?" + b"a" * 2000 + b" HTTP/1.1\r\n\r\n",
+        b"GET /?a_plus=0 HTTP/1.1\r\n" + b"X-Pad: " + b"p" * 1500 + b"\r\n\r\n",
+        b"\x00" * 64, bytes(range(256)),
+    ]
+    seeds = [("GET /?%s HTTP/1.1\r\nHost: earm\r\n\r\n" % q).encode()
+             for q in MIXES["web_app"] + MIXES["web_control"] if q]
+    while len(cases) < count:
+        data = bytearray(rng.choice(seeds))
+        for _ in range(rng.randint(1, 4)):
+            op = rng.randrange(4)
+            i = rng.randrange(len(data))
+            if op == 0:
+                data[i] = rng.randrange(256)
+            elif op == 1:
+                data.insert(i, rng.choice(b" ?&=%/\r\n\x00\xff"))
+            elif op == 2:
+                del data[i]
+            else:
+                data[i:i] = data[i:i + rng.randint(1, 40)] * rng.randint(1, 50)
+        cases.append(bytes(data))
+    return cases[:count]
+
+
+def fuzz(addr, args):
+    """Returns (statuses, silent closes, failed probes)"""
+    statuses = {}
+    silent = 0
+    failed = 0
+    for data in fuzz_cases(random.Random(args.seed), args.cases):
+        status, body, seconds = request(addr, data, args.timeout, shut=True)
+        if status is None:
+            silent += 1
+        else:
+            statuses[status] = statuses.get(status, 0) + 1
+        status, body, seconds = request(addr, PROBE, args.timeout)
+        if status != 200:
+            failed += 1
+    return statuses, silent, failed
+
+
+def bench(name, addr, args, errors=None):
+    """The four phases against one server, True when all of them passed"""
+    mix = MIXES[name]
+    ok = True
+
+    def report(phase, passed, text):
+        print("%-40s %s %s" % ("%s %s" % (name, phase), "ok" if passed else "FAILED", text))
+        return passed
+
+    stats = Stats()
+    run_clients(addr, mix, args, stats, 0)
+    ok &= report("load", stats.passed(args.max_drop), stats.line())
+
+    stop = threading.Event()
+    counts = [0, 0]  # Slow connections opened, dropped by the server
+    slow = [threading.Thread(target=slow_client, args=(addr, args.drip, stop, counts, k % 2 == 1))
+            for k in range(args.slow)]
+    for t in slow:
+        t.start()
+    time.sleep(0.2)
+    stats = Stats()
+    run_clients(addr, mix, args, stats, 100)
+    stop.set()
+    for t in slow:
+        t.join()
+    ok &= report("slowloris", stats.passed(args.max_drop),
+                 "%s; %d slow connections, %d dropped by the server" % (stats.line(), counts[0], counts[1]))
+
+    stats = Stats()
+    run_clients(addr, mix, args, stats, 200, pieces=3, pause=0.05)
+    ok &= report("partial", stats.passed(args.max_drop), stats.line())
+
+    statuses, silent, failed = fuzz(addr, args)
+    text = "%d cases: status %s, %d closed without response; %d probes failed" % (
+        args.cases, ", ".join("%d x %d" % (n, status) for status, n in sorted(statuses.items())), silent, failed)
+    passed = failed == 0
+    if errors is not None:
+        text += "; server errors %s" % errors.line()
+        passed = passed and not errors.errors
+    ok &= report("fuzz", passed, text)
+
+    stat_line = server_stats() if errors is not None else None
+    if stat_line:
+        print("%-40s %s" % ("%s server" % name, stat_line))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="load and fuzz the eArm web servers")
+    parser.add_argument("--server", choices=SERVERS + ("both",), default="both",
+                        help="web_app.py, WebControl (web_app_control_eArm.py) or both")
+    parser.add_argument("--url", help="a board to drive instead, e.g. http://192.168.4.1 (needs --server)")
+    parser.add_argument("--port", type=int, default=8480, help="local port, the second server gets the next one")
+    parser.add_argument("--examples", help="Example_Codes folder to run the servers from, e.g. an older checkout")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients")
+    parser.add_argument("--seconds", type=float, default=3, help="duration of the load, slowloris and partial phases")
+    parser.add_argument("--slow", type=int, default=8, help="slowloris connections, half of them send nothing")
+    parser.add_argument("--drip", type=float, default=0.1, help="seconds between the bytes of a slow client")
+    parser.add_argument("--cases", type=int, default=200, help="fuzz cases")
+    parser.add_argument("--timeout", type=float, default=3, help="seconds a client waits for its response")
+    parser.add_argument("--max-drop", type=float, default=0.01, help="drop rate a phase may have and pass")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    ok = True
+    if args.url:
+        if args.server == "both":
+            parser.error("--url needs --server web_app or web_control")
+        m = re.match(r"(?:http://)?([^:/]+)(?::(\d+))?", args.url)
+        addr = (m.group(1), int(m.group(2) or 80))
+        ok = bench(args.server, addr, args)
+    else:
+        setup(args.examples)
+        # History, programs and logs written by the servers stay out of the way
+        workdir = tempfile.mkdtemp(prefix="earm-http-")
+        os.chdir(workdir)
+        names = SERVERS if args.server == "both" else (args.server,)
+        errors = ServerErrors()
+        for k, name in enumerate(names):
+            errors.errors.clear()
+            start_server(name, args.port + k, workdir)
+            ok = bench(name, ("127.0.0.1", args.port + k), args, errors) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
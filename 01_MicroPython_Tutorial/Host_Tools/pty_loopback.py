@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Serial protocol test harness on a Linux pty
+
+Runs the device side (earm.serial_control on CPython, with the stubs
+standing in for the hardware) on one end of a pseudo terminal and the
+earm_host client on the other, then checks every message type, a
+streamed trajectory, credit based streaming through a link stall, clock
+sync and timed setpoints, a motion script run on the board, and
+recovery from a corrupted frame.
+
+Usage:
+    python pty_loopback.py            # run the checks
+    python pty_loopback.py --serve    # only run the fake board, print the pty path
+                                      # (for trying earm_host by hand)
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import tty
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "stubs"))
+sys.path.insert(0, HERE)
+
+import cpython_compat  # noqa: E402
+
+cpython_compat.install()
+
+from earm.serial_control import SerialControl  # noqa: E402
+from earm_host import ArmClient, ProtocolError, TrajectoryStreamer  # noqa: E402
+from earm_host import planner  # noqa: E402
+from earm_host import protocol as p  # noqa: E402
+from earm_host.client import FdTransport  # noqa: E402
+from earm_host.clock import host_us, ticks_diff  # noqa: E402
+
+
+class PtyPort:
+    """Non-blocking pty end with the machine.UART readinto()/write() interface"""
+
+    def __init__(self, fd):
+        self.fd = fd
+        os.set_blocking(fd, False)
+
+    def readinto(self, buf):
+        try:
+            data = os.read(self.fd, len(buf))
+        except BlockingIOError:
+            return None
+        buf[:len(data)] = data
+        return len(data)
+
+    def write(self, data):
+        data = bytes(data)
+        while data:
+            try:
+                data = data[os.write(self.fd, data):]
+            except BlockingIOError:
+                time.sleep(0.001)
+
+
+def start_board(rate_hz=100):
+    """Fake board on the master end of a new pty, returns (app, host fd, host pty path)"""
+    board_fd, host_fd = os.openpty()
+    tty.setraw(host_fd)
+    app = SerialControl(port=PtyPort(board_fd), rate_hz=rate_hz)
+    app.begin()
+    thread = threading.Thread(target=app.loop.run, args=(app.tick,), daemon=True)
+    thread.start()
+    return app, host_fd, os.ttyname(host_fd)
+
+
+def check(name, ok, detail=""):
+    print("%-40s %s %s" % (name, "ok" if ok else "FAILED", detail))
+    return ok
+
+
+def run_checks():
+    app, fd, path = start_board()
+    arm = ArmClient(FdTransport(fd))
+    results = []
+
+    pong = arm.ping()
+    results.append(check("ping", pong.version == p.VERSION, str(pong)))
+
+    arm.setpoint((10, 20, 30, 40))
+    t = arm.telemetry()
+    results.append(check("setpoint + telemetry", t.angles == (10, 20, 30, 40), str(t.angles)))
+
+    try:
+        arm.setpoint((10, 20, 30, 200))
+        results.append(check("out of range rejected", False))
+    except (ProtocolError, ValueError) as e:
+        results.append(check("out of range rejected", True, str(e)))
+    try:
+        arm._command(p.MSG_SETPOINT, bytes((1, 2, 3, 200)))
+        results.append(check("device range check", False))
+    except ProtocolError as e:
+        results.append(check("device range check", True, str(e)))
+
+    arm.velocity((100, 0, 0, 0))
+    time.sleep(0.2)
+    arm.velocity((100, 0, 0, 0))
+    time.sleep(0.2)
+    t = arm.telemetry()
+    results.append(check("velocity", 40 <= t.angles[0] - 10 <= 60, "A moved %d deg in 0.4 s" % (t.angles[0] - 10)))
+    time.sleep(0.4)
+    t = arm.telemetry()
+    results.append(check("velocity watchdog", t.mode == p.MODE_SETPOINT, p.MODE_NAMES[t.mode]))
+
+    # 3 s ramp of A and B, longer than the device queue
+    poses = [(90 + k // 10, 60 + k // 5, 60, 90) for k in range(300)]
+    t0 = time.monotonic()
+    arm.stream(poses)
+    t = arm.wait_idle()
+    elapsed = time.monotonic() - t0
+    results.append(check("trajectory stream", t.angles == poses[-1],
+                         "%d poses in %.2f s" % (len(poses), elapsed)))
+
+    # Planned path, streamed with credits; a 150 ms stall of the host is
+    # covered by the 250 ms prefill
+    period = pong.period_us / 1e6
+    waypoints = [(90, 60, 60, 90), (120, 90, 70, 60), (60, 100, 40, 120), (90, 60, 60, 90)]
+    poses = planner.plan_smooth(waypoints, period, speed=0.5, start=t.angles)
+    steps = max(max(abs(a - b) for a, b in zip(u, v)) for u, v in zip(poses, poses[1:]))
+    results.append(check("planner", poses[-1] == waypoints[-1] and steps <= 2,
+                         "%d poses, max step %d deg" % (len(poses), steps)))
+    streamer = TrajectoryStreamer(arm, prefill_s=0.25)
+
+    def stall(i, n):
+        if i == n // 2 - n // 2 % streamer.chunk:
+            time.sleep(0.15)
+
+    stats = streamer.stream(poses, on_progress=stall)
+    t = arm.telemetry()
+    results.append(check("credit stream with stall", t.angles == waypoints[-1] and stats.underruns == 0
+                         and stats.max_in_flight <= pong.queue_size,
+                         "%.2f s for %.2f s of poses, %d underruns, %d in flight max"
+                         % (stats.seconds, stats.play_seconds, stats.underruns, stats.max_in_flight)))
+
+    # NTP style sync against the board's clock, which here is this process's
+    # cpython_compat clock, so the true offset is known
+    clock = arm.sync_clock()
+    true_offset = cpython_compat.ticks_us() - host_us()
+    error = ticks_diff(clock.to_device(host_us()), (host_us() + true_offset) % p.TICKS_PERIOD)
+    results.append(check("clock sync", abs(error) < 1000,
+                         "error %d us, link delay %d us" % (error, clock.delay_us)))
+
+    # Timed setpoint: nothing moves before its time, then it runs on time
+    before = arm.telemetry().angles
+    ack = arm.setpoint_at((45, 45, 45, 45), time.monotonic() + 0.2)
+    early = arm.telemetry().angles
+    time.sleep(0.3)
+    t = arm.telemetry()
+    results.append(check("timed setpoint", ack.status == p.ST_OK and early == before
+                         and t.angles == (45, 45, 45, 45) and t.late == 0,
+                         "ran %d us late at worst" % t.max_late_us))
+    ack = arm.setpoint_at((50, 50, 50, 50), time.monotonic() - 0.1)
+    time.sleep(0.05)
+    t = arm.telemetry()
+    results.append(check("past setpoint runs at once", ack.status == p.ST_LATE
+                         and t.angles == (50, 50, 50, 50), p.STATUS_NAMES[ack.status]))
+
+    # Motion script: compiled here, run by the board's interpreter
+    script = """
+        speed 100
+        movej 90 90 90 90
+        loop 2
+            movel 100 _ _ _
+            movel 110 100 _ _
+            grip open
+            wait 50
+        end
+        move 80 _ _ _
+    """
+    size = arm.load_script(script)
+    t0 = time.monotonic()
+    arm.run_script()
+    mode = arm.telemetry().mode
+    t = arm.wait_idle()
+    results.append(check("motion script", mode == p.MODE_SCRIPT and t.mode == p.MODE_SETPOINT
+                         and t.angles == (80, 100, 90, 150),
+                         "%d bytes, ran %.2f s" % (size, time.monotonic() - t0)))
+    try:
+        arm._command(p.MSG_SCRIPT_LOAD, p.script_load_payload(0, b"nope"))
+        arm.run_script()
+        results.append(check("invalid script rejected", False))
+    except ProtocolError as e:
+        results.append(check("invalid script rejected", True, str(e)))
+
+    # Corrupted frame, then garbage: the link must recover
+    frame = bytearray(p.encode(p.MSG_PING, 77))
+    frame[-1] ^= 0xFF
+    arm.transport.write(bytes(frame) + b"\x00\xa5\x13garbage")
+    time.sleep(0.05)
+    arm.decoder = p.Decoder()
+    pong = arm.ping()
+    t = arm.telemetry()
+    results.append(check("resync after bad frame", pong.version == p.VERSION and t.crc_errors >= 1,
+                         "%d CRC errors counted" % t.crc_errors))
+
+    arm.stop()
+    app.loop.stop()
+    print(app.loop.report())
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="earm serial protocol pty harness")
+    parser.add_argument("--serve", action="store_true", help="only run the fake board")
+    args = parser.parse_args()
+    if args.serve:
+        app, fd, path = start_board()
+        print("Fake board on", path)
+        print("e.g.  ArmClient.open(%r).telemetry()" % path)
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+        return
+    sys.exit(0 if run_checks() else 1)
+
+
+if __name__ == "__main__":
+    main()
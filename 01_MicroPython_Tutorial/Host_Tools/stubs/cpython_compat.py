@@ -0,0 +1,57 @@
+"""
+Run earm code on CPython
+
+install() puts the fake machine, network and micropython modules in
+sys.modules and adds the MicroPython-only functions of time and gc that
+the earm package uses. Host tools call it before importing earm.
+"""
+
+import gc
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES = os.path.normpath(os.path.join(HERE, "..", "..", "Example_Codes"))
+
+TICKS_PERIOD = 1 << 30
+_t0 = time.monotonic()
+
+
+def ticks_ms():
+    return int((time.monotonic() - _t0) * 1000) % TICKS_PERIOD
+
+
+def ticks_us():
+    return int((time.monotonic() - _t0) * 1000000) % TICKS_PERIOD
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) % TICKS_PERIOD
+
+
+def ticks_diff(a, b):
+    d = (a - b) % TICKS_PERIOD
+    return d - TICKS_PERIOD if d >= TICKS_PERIOD // 2 else d
+
+
+def install():
+    """Make earm importable and runnable on CPython"""
+    sys.path[:0] = [HERE, EXAMPLES]
+    import fake_machine
+    import fake_network
+    import fake_micropython
+    sys.modules["machine"] = fake_machine
+    sys.modules["network"] = fake_network
+    sys.modules["micropython"] = fake_micropython
+
+    time.ticks_ms = ticks_ms
+    time.ticks_us = ticks_us
+    time.ticks_add = ticks_add
+    time.ticks_diff = ticks_diff
+    time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+    time.sleep_us = lambda us: time.sleep(us / 1000000)
+
+    gc.threshold = lambda *args: -1
+    gc.mem_alloc = lambda: 0
+    gc.mem_free = lambda: 1 << 20
@@ -0,0 +1,105 @@
+"""
+Stand-in for the machine module on the Unix MicroPython port and CPython
+
+Only covers what the earm package uses. Hardware writes are recorded on
+the objects so host tools can inspect them.
+"""
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, pin, mode=-1, pull=-1, value=None):
+        self.pin = pin
+        self._value = 1 if value is None else value
+        self.handler = None
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+    def irq(self, handler=None, trigger=0):
+        self.handler = handler
+
+
+class ADC:
+    ATTN_11DB = 3
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.raw = 2048
+
+    def atten(self, atten):
+        pass
+
+    def read(self):
+        return self.raw
+
+    def read_u16(self):
+        return self.raw << 4
+
+
+class PWM:
+    def __init__(self, pin, freq=50, duty=None, duty_u16=None):
+        self.pin = pin
+        self._freq = freq
+        self._duty = 0 if duty_u16 is None else duty_u16
+
+    def freq(self, f=None):
+        if f is None:
+            return self._freq
+        self._freq = f
+
+    def duty(self, d=None):
+        if d is None:
+            return self._duty >> 6
+        self._duty = d << 6
+
+    def duty_u16(self, d=None):
+        if d is None:
+            return self._duty
+        self._duty = d
+
+    def deinit(self):
+        pass
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, timer_id):
+        self.timer_id = timer_id
+        self.callback = None
+
+    def init(self, mode=0, period=0, callback=None):
+        self.callback = callback
+
+    def deinit(self):
+        self.callback = None
+
+
+class UART:
+    """Loops written bytes back to readinto(), enough for protocol tests"""
+
+    def __init__(self, uart_id, baudrate=115200, **kwargs):
+        self.uart_id = uart_id
+        self.baudrate = baudrate
+        self.rx = bytearray()
+
+    def write(self, data):
+        self.rx += data
+        return len(data)
+
+    def readinto(self, buf):
+        n = min(len(buf), len(self.rx))
+        if n == 0:
+            return None
+        buf[:n] = self.rx[:n]
+        del self.rx[:n]
+        return n
@@ -0,0 +1,23 @@
+"""
+Stand-in for the micropython module on CPython
+"""
+
+
+def const(value):
+    return value
+
+
+def heap_lock():
+    return 0
+
+
+def heap_unlock():
+    return 0
+
+
+def kbd_intr(char):
+    pass
+
+
+def schedule(func, arg):
+    func(arg)
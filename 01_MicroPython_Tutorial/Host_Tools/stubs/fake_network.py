@@ -0,0 +1,36 @@
+"""
+Stand-in for the network module on the Unix MicroPython port and CPython
+"""
+
+AP_IF = 1
+STA_IF = 0
+AUTH_OPEN = 0
+
+
+class WLAN:
+    def __init__(self, interface):
+        self.interface = interface
+        self._active = False
+
+    def active(self, state=None):
+        if state is None:
+            return self._active
+        self._active = state
+
+    def config(self, *args, **kwargs):
+        pass
+
+    def ifconfig(self, config=None):
+        if config is None:
+            return ("127.0.0.1", "255.0.0.0", "127.0.0.1", "127.0.0.1")
+        self._config = config
+
+    def connect(self, ssid, password=None):
+        self._connected = True
+
+    def isconnected(self):
+        return getattr(self, "_connected", False)
+
+
+def hostname(name=None):
+    return "earm"
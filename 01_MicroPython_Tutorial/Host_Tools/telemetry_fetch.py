@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Fetch the telemetry history of web_app_control_eArm.py
+
+Downloads one level of the board's earm.telemetry_store (binary, over
+HTTP), or reads a spill file copied from the board's flash, and prints a
+per-channel summary or writes CSV.
+
+    level 0   every sample (100 ms), the last 30 s
+    level 1   min / max / mean per second, the last 2 min
+    level 2   min / max / mean per minute, the last hour
+
+Usage:
+    python telemetry_fetch.py --url http://192.168.4.1 --level 1
+    python telemetry_fetch.py --url http://192.168.4.1 --level 0 --csv last30s.csv
+    mpremote fs cp :telemetry.bin . && python telemetry_fetch.py --spill telemetry.bin
+"""
+
+import argparse
+import csv
+import struct
+import sys
+import urllib.request
+
+MAGIC = b"ETSD"
+HEADER = "<4sBBBBHHI"
+CHANNELS = ("a", "b", "c", "d", "busy_us", "latency_us", "heap_free")
+SCALES = (1, 1, 1, 1, 1, 1, 16)
+
+
+def columns(channels, per):
+    names = CHANNELS[:channels]
+    if per == 1:
+        return list(names)
+    return [n + s for s in ("_min", "_max", "_mean") for n in names]
+
+
+def parse_dump(data):
+    """(level, period ms, column names, rows) of a write() dump, t_ms first in each row"""
+    magic, version, channels, level, per, count, period, age = struct.unpack_from(HEADER, data)
+    if magic != MAGIC:
+        raise ValueError("not a telemetry dump")
+    stride = channels * per
+    values = struct.unpack_from("<%dH" % (count * stride), data, struct.calcsize(HEADER))
+    rows = []
+    for r in range(count):
+        rec = values[r * stride:(r + 1) * stride]
+        t = -age - (count - 1 - r) * period
+        rows.append([t] + [v * SCALES[k % channels] for k, v in enumerate(rec)])
+    return level, period, columns(channels, per), rows
+
+
+def parse_spill(data, channels=len(CHANNELS)):
+    """(column names, rows) of a spill file, board ticks_ms first in each row"""
+    size = 4 + 6 * channels
+    rows = []
+    for pos in range(0, len(data) - size + 1, size):
+        t, = struct.unpack_from("<I", data, pos)
+        rec = struct.unpack_from("<%dH" % (3 * channels), data, pos + 4)
+        rows.append([t] + [v * SCALES[k % channels] for k, v in enumerate(rec)])
+    return columns(channels, 3), rows
+
+
+def summary(cols, rows):
+    """Lowest, highest and average of every column"""
+    print("%-18s %10s %10s %10s" % ("channel", "lowest", "highest", "average"))
+    for k, name in enumerate(cols):
+        values = [row[k + 1] for row in rows]
+        print("%-18s %10d %10d %10.1f" % (name, min(values), max(values), sum(values) / len(values)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="eArm telemetry history")
+    parser.add_argument("--url", help="board address, e.g. http://192.168.4.1")
+    parser.add_argument("--level", type=int, default=1, help="0 = samples, 1 = seconds, 2 = minutes")
+    parser.add_argument("--spill", help="read a spill file instead")
+    parser.add_argument("--csv", help="write the records to this CSV file")
+    args = parser.parse_args()
+    if args.spill:
+        with open(args.spill, "rb") as f:
+            cols, rows = parse_spill(f.read())
+        time_col = "ticks_ms"
+        print("%d records from %s" % (len(rows), args.spill))
+    elif args.url:
+        url = "%s/?history=%d" % (args.url.rstrip("/"), args.level)
+        data = urllib.request.urlopen(url, timeout=10).read()
+        level, period, cols, rows = parse_dump(data)
+        time_col = "t_ms"
+        print("level %d: %d records every %d ms" % (level, len(rows), period))
+    else:
+        parser.error("--url or --spill is needed")
+    if not rows:
+        sys.exit("no records yet")
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            w = csv.writer(f)
+            w.writerow([time_col] + cols)
+            w.writerows(rows)
+        print("wrote", args.csv)
+    else:
+        summary(cols, rows)
+
+
+if __name__ == "__main__":
+    main()
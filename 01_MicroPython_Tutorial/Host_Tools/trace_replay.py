@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Replay an eArm input trace on the PC
+
+Reads a trace recorded by joystick_control_eArm.py or
+web_app_control_eArm.py (TRACE = "trace.bin", copied off the board with
+mpremote) and feeds it through the same earm code on CPython, with the
+stubs standing in for the hardware and a virtual clock set from the
+trace:
+
+    joystick  the readings go through JoyStick (the fake ADCs return them),
+              the button events into the app's event queue, then tick()
+              runs and the servo angles are compared with the board's
+    web       every request goes through WebControl.serve(), the page
+              loads get the board's session tokens and the jog directions
+              handed to the servos are compared with the board's
+
+A replay that matches is a regression test of the firmware that
+recorded it, and the time it takes is a benchmark of the control path:
+--examples runs another checkout of Example_Codes against the same
+trace, --repeat takes the best of several runs.
+
+--demo records a scripted joystick and web session on the PC with the
+same recorder and replays both.
+
+Usage:
+    mpremote fs cp :trace.bin . && python trace_replay.py trace.bin
+    python trace_replay.py trace.bin --repeat 5 --examples ../old/Example_Codes
+    python trace_replay.py --demo
+"""
+
+import argparse
+import math
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def setup(examples=None):
+    """Make earm importable, from examples if given"""
+    sys.path.insert(0, os.path.join(HERE, "stubs"))
+    import cpython_compat
+    cpython_compat.install()
+    if examples:
+        sys.path.insert(0, os.path.abspath(examples))
+
+
+class Trace:
+    """Header fields and records of a trace file"""
+    def __init__(self, data):
+        from earm.trace import (MAGIC, HEADER, T_WAIT, T_TICK, T_BUTTON,
+                                T_REQUEST, T_SESSION, T_APPLY)
+        fields = struct.unpack_from(HEADER, data)
+        if fields[0] != MAGIC:
+            raise ValueError("not an eArm trace")
+        self.version, self.source, self.start = fields[1:4]
+        self.angles = fields[4:8]
+        self.profile = fields[8:21]
+        self.records = []  # (type, dt, ...) with full readings and angles
+        readings = [0] * 4
+        angles = list(self.angles)
+        pos = struct.calcsize(HEADER)
+        while pos < len(data):
+            kind = data[pos]
+            if kind == T_BUTTON:
+                self.records.append((kind, 0, data[pos + 1]))
+                pos += 2
+                continue
+            dt, = struct.unpack_from("<H", data, pos + 1)
+            pos += 3
+            if kind == T_WAIT:
+                self.records.append((kind, dt))
+            elif kind == T_TICK:
+                mask = data[pos]
+                pos += 1
+                for i in range(4):
+                    if mask & (1 << i):
+                        readings[i], = struct.unpack_from("<H", data, pos)
+                        pos += 2
+                for i in range(4):
+                    if mask & (16 << i):
+                        angles[i] = data[pos]
+                        pos += 1
+                self.records.append((kind, dt, tuple(readings), tuple(angles)))
+            elif kind == T_REQUEST or kind == T_SESSION:
+                slot, n = struct.unpack_from("<bB", data, pos)
+                text = data[pos + 2:pos + 2 + n].decode()
+                pos += 2 + n
+                self.records.append((kind, dt, slot, text))
+            elif kind == T_APPLY:
+                self.records.append((kind, dt, data[pos], data[pos + 1]))
+                pos += 2
+            else:
+                raise ValueError("unknown record type %d at offset %d" % (kind, pos - 3))
+
+
+class Result:
+    """Outcome of one replay"""
+    def __init__(self, name):
+        self.name = name
+        self.steps = 0  # Ticks or requests + applies
+        self.compared = 0
+        self.mismatches = 0
+        self.first = None  # Description of the first mismatch
+        self.busy = 0.0  # Seconds spent in the firmware code
+        self.span_ms = 0  # Virtual time covered
+
+    def mismatch(self, what):
+        self.mismatches += 1
+        if self.first is None:
+            self.first = "at %d ms: %s" % (self.span_ms, what)
+
+    def line(self):
+        per = self.busy * 1e6 / max(1, self.steps)
+        text = "%d steps over %.1f s, %d compared, %d mismatches, %.1f us/step (%.0f steps/s)" % (
+            self.steps, self.span_ms / 1000, self.compared, self.mismatches, per,
+            self.steps / self.busy if self.busy else 0)
+        if self.first:
+            text += "\n    first mismatch " + self.first
+        return text
+
+
+class FakeClient:
+    """Client socket for WebControl.serve(), keeping what was sent"""
+    def __init__(self):
+        self.sent = []
+
+    def settimeout(self, timeout):
+        pass
+
+    def send(self, data):
+        self.sent.append(data)
+        return len(data)
+
+    write = sendall = send
+
+    def close(self):
+        pass
+
+
+def replay_joystick(trace):
+    from earm.calibration import AXES
+    from earm.joystick_app import JoystickApp
+    from earm.trace import TickClock, install_clock, JOYSTICK_MODULES, T_WAIT, T_TICK, T_BUTTON
+
+    clock = TickClock()
+    clock.now = trace.start
+    install_clock(clock, JOYSTICK_MODULES)
+    app = JoystickApp()
+    app.begin()
+    # The board's calibration, not whatever joystick.json is lying around
+    for k, name in enumerate(AXES):
+        app.profile.axes[name] = list(trace.profile[3 * k:3 * k + 3])
+    app.profile.dead_zone = trace.profile[12]
+    app.maps = app.profile.tables()
+    for i in range(4):
+        app.arm.write_angle(i, trace.angles[i])
+    left, right = app.arm.JoyStickL, app.arm.JoyStickR
+    left.read_x()
+    right.read_x()  # Opens the ADCs
+    adcs = (left.adc_x, left.adc_y, right.adc_x, right.adc_y)
+
+    result = Result("joystick")
+    angles = app.arm.servo_current_angle
+    for rec in trace.records:
+        kind = rec[0]
+        if kind == T_BUTTON:
+            app.events.post(rec[2])
+            continue
+        clock.now = time.ticks_add(clock.now, rec[1])
+        result.span_ms += rec[1]
+        if kind != T_TICK:
+            continue
+        for i in range(4):
+            adcs[i].raw = rec[2][i]
+        t0 = time.perf_counter()
+        app.tick()
+        result.busy += time.perf_counter() - t0
+        result.steps += 1
+        result.compared += 1
+        if tuple(angles) != rec[3]:
+            result.mismatch("tick %d angles %s, the board had %s"
+                            % (result.steps, tuple(angles), rec[3]))
+    return result
+
+
+def replay_web(trace):
+    from earm.http import parse_request
+    from earm.servo import S_RUNNING
+    from earm.trace import (TickClock, install_clock, directions, WEB_MODULES,
+                            T_SESSION, T_REQUEST, T_APPLY, A_IDLE)
+    from earm.web_control import WebControl
+
+    clock = TickClock()
+    clock.now = trace.start
+    install_clock(clock, WEB_MODULES)
+    app = WebControl()
+    for servo, angle in zip(app.servos, trace.angles):
+        # No adjust thread, the replay compares the directions handed to it
+        servo.state[S_RUNNING] = 1
+        servo.set_angle(angle)
+    tokens = app.sessions.tokens
+
+    result = Result("web")
+    for rec in trace.records:
+        kind = rec[0]
+        clock.now = time.ticks_add(clock.now, rec[1])
+        result.span_ms += rec[1]
+        t0 = time.perf_counter()
+        if kind == T_SESSION:
+            before = list(tokens)
+            app.serve(FakeClient(), "GET / HTTP/1.1\r\n\r\n")
+            slot = next(i for i in range(len(tokens)) if tokens[i] != before[i])
+            # The page keeps using the token the board gave it
+            tokens[slot] = rec[3]
+        elif kind == T_REQUEST:
+            # The slot serve() will find the page's token in
+            token = parse_request("GET /?%s HTTP/1.1" % rec[3]).get("t")
+            slot = tokens.index(token) if token in tokens else -1
+            app.serve(FakeClient(), "GET /?%s HTTP/1.1\r\n\r\n" % rec[3])
+            app.answer_observers()
+        elif kind == T_APPLY:
+            app.apply_commands(bool(rec[2] & A_IDLE))
+        else:
+            continue
+        result.busy += time.perf_counter() - t0
+        result.steps += 1
+        if kind == T_APPLY:
+            result.compared += 1
+            got = directions(app.servos)
+            if got != rec[3]:
+                result.mismatch("directions %s, the board had %s" % (
+                    decode_directions(got), decode_directions(rec[3])))
+        elif slot != rec[2]:
+            result.compared += 1
+            result.mismatch("%s in session slot %d, the board had %d"
+                            % (rec[3] if kind == T_REQUEST else "page load", slot, rec[2]))
+        else:
+            result.compared += 1
+    return result
+
+
+def decode_directions(bits):
+    return [(0, 1, 0, -1)[(bits >> (2 * i)) & 3] for i in range(4)]
+
+
+def replay(data):
+    from earm.trace import SRC_JOYSTICK, SRC_WEB
+    trace = Trace(data)
+    if trace.source == SRC_JOYSTICK:
+        return replay_joystick(trace)
+    if trace.source == SRC_WEB:
+        return replay_web(trace)
+    raise ValueError("unknown trace source %d" % trace.source)
+
+
+class VirtualTime:
+    """ticks_ms() of the recording side of --demo"""
+    def __init__(self):
+        self.now = 1000
+        self.saved = time.ticks_ms
+        time.ticks_ms = lambda: self.now
+
+    def restore(self):
+        time.ticks_ms = self.saved
+
+
+def record_joystick_demo(path, ticks):
+    """Jog every joint, record three poses, play them and take over mid-way"""
+    from earm.buttons import BTN_L, BTN_R, EV_PRESS, EV_RELEASE
+    from earm.joystick_app import JoystickApp
+
+    rng = random.Random(1)
+    vt = VirtualTime()
+    app = JoystickApp(trace=path)
+    app.begin()
+    left, right = app.arm.JoyStickL, app.arm.JoyStickR
+    left.read_x()
+    right.read_x()
+    adcs = (left.adc_x, left.adc_y, right.adc_x, right.adc_y)
+    play_at = ticks // 2
+    for k in range(ticks):
+        # 200 Hz with now and then a late tick
+        vt.now += 5 + (rng.randint(1, 30) if rng.random() < 0.02 else 0)
+        phase = k / 200
+        for i in range(4):
+            swing = 1900 * math.sin(phase * (0.7 + 0.3 * i) + i) if k < play_at else 0
+            adcs[i].raw = max(0, min(4095, int(2048 + swing + rng.gauss(0, 12))))
+        if k < play_at and k % (play_at // 4) == play_at // 4 - 1:
+            app.events.post(BTN_L | EV_PRESS)
+            app.events.post(BTN_L | EV_RELEASE)  # Record a pose
+        elif k == play_at:
+            app.events.post(BTN_R | EV_PRESS)
+            app.events.post(BTN_R | EV_RELEASE)  # Play
+        elif play_at + 400 <= k < play_at + 500:
+            adcs[1].raw = 3900  # Take over with the left joystick for 0.5 s
+        app.tick()
+    app.trace.flush()
+    vt.restore()
+    return app.trace.report()
+
+
+def record_web_demo(path, seconds):
+    """Two pages: one jogs, the other watches, then takes over once the first goes quiet"""
+    from earm.servo import S_RUNNING
+    from earm.web_control import WebControl
+
+    rng = random.Random(2)
+    vt = VirtualTime()
+    app = WebControl(trace=path)
+    for servo, angle in zip(app.servos, (90, 120, 60, 90)):
+        servo.state[S_RUNNING] = 1
+        servo.set_angle(angle)
+    app.start_trace()
+
+    def get(query):
+        app.serve(FakeClient(), "GET /?%s HTTP/1.1\r\nHost: earm\r\n\r\n" % query)
+
+    def page():
+        before = list(app.sessions.tokens)
+        app.serve(FakeClient(), "GET / HTTP/1.1\r\nHost: earm\r\n\r\n")
+        return next(t for t, b in zip(app.sessions.tokens, before) if t != b)
+
+    a = page()
+    b = page()
+    n = {a: 0, b: 0}
+    keys = ("a_minus", "b_plus", "c_minus", "d_plus")
+    held = None
+    quiet_from = seconds * 600  # Page a stops sending 60 % into the session
+    for k in range(seconds * 10):
+        vt.now += 100
+        ms = vt.now
+        burst = False
+        if k % 5 == 0:
+            # Telemetry polls, they do not renew the controller's lease
+            if ms < quiet_from:
+                get("tm=1&t=" + a)
+            get("tm=1&t=" + b)
+            burst = True
+        token = a if ms < quiet_from else b
+        if k % 25 == 0:
+            if held is not None:
+                n[token] += 1
+                get("%s=0&n=%d&t=%s" % (held, n[token], token))
+            held = keys[rng.randrange(4)]
+            n[token] += 1
+            get("%s=1&n=%d&t=%s" % (held, n[token], token))
+            burst = True
+        elif held is not None and k % 3 == 0:
+            # Hold repeat, now and then lost on the way
+            n[token] += 1
+            if rng.random() > 0.1:
+                get("%s=1&n=%d&t=%s" % (held, n[token], token))
+                burst = True
+        if k % 40 == 7:
+            get("buzzer=%s&t=%s" % ("on" if k % 80 == 7 else "off", b))
+            burst = True
+        if burst:
+            app.apply_commands(False)
+        app.apply_commands(True)
+    app.trace.flush()
+    vt.restore()
+    return app.trace.report()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="replay an eArm input trace")
+    parser.add_argument("trace", nargs="*", help="trace file(s)")
+    parser.add_argument("--repeat", type=int, default=1, help="replays per trace, the fastest is reported")
+    parser.add_argument("--examples", help="Example_Codes folder to replay with, e.g. an older checkout")
+    parser.add_argument("--demo", action="store_true", help="record a scripted session and replay it")
+    parser.add_argument("--ticks", type=int, default=6000, help="control ticks of the --demo joystick session")
+    args = parser.parse_args()
+    setup(args.examples)
+    workdir = tempfile.mkdtemp(prefix="earm-replay-")
+    files = [os.path.abspath(p) for p in args.trace]
+    # Programs and profiles saved during a replay stay out of the way
+    os.chdir(workdir)
+    if args.demo:
+        files = [os.path.join(workdir, "joystick.trace"), os.path.join(workdir, "web.trace")]
+        print("%-40s %s" % ("recorded joystick session", record_joystick_demo(files[0], args.ticks)))
+        print("%-40s %s" % ("recorded web session", record_web_demo(files[1], args.ticks // 200)))
+    if not files:
+        parser.error("a trace file or --demo is needed")
+    ok = True
+    for path in files:
+        with open(path, "rb") as f:
+            data = f.read()
+        best = None
+        for _ in range(args.repeat):
+            result = replay(data)
+            if best is None or result.busy < best.busy:
+                best = result
+        ok = ok and best.mismatches == 0 and best.compared > 0
+        print("%-40s %s %s" % ("%s %s" % (best.name, os.path.basename(path)),
+                               "ok" if best.mismatches == 0 else "DIVERGED", best.line()))
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()